@@ -1,8 +1,19 @@
 import os
 import sys
 import csv
+from pathlib import Path
 from bs4 import BeautifulSoup
 
+
+# 共用的模块加载函数（8-流程调度/python/模块加载.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+
+profiling = load_module('8-流程调度/python/3-性能记录.py')
+
 def parse_fastqc_html(html_file):
     """解析 FastQC HTML 文件，返回关键参数字典"""
     with open(html_file, "r", encoding="utf-8") as f:
@@ -35,9 +46,12 @@ def parse_fastqc_html(html_file):
     return result
 
 
-def batch_parse_to_csv(html_files, output_csv):
-    """批量解析 FastQC HTML 并输出为 CSV"""
-    all_results = [parse_fastqc_html(f) for f in html_files]
+def batch_parse_to_csv(html_files, output_csv, prof=None):
+    """批量解析 FastQC HTML 并输出为 CSV（设置环境变量 AB_PROFILE 时记录 parse / write 耗时）"""
+    prof = prof or profiling.Profiler('1-FASTQ质控信息提取.py')
+    with prof.phase('parse') as ph:
+        all_results = [parse_fastqc_html(f) for f in html_files]
+        ph.items = len(all_results)
 
     # 获取所有可能的列
     keys = set()
@@ -46,10 +60,11 @@ def batch_parse_to_csv(html_files, output_csv):
     keys = ["sample"] + sorted(k for k in keys if k != "sample")
 
     # 写 CSV
-    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+    with prof.phase('write') as ph, open(output_csv, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=keys)
         writer.writeheader()
         writer.writerows(all_results)
+        ph.items = len(all_results)
 
 
 if __name__ == "__main__":
@@ -60,5 +75,6 @@ if __name__ == "__main__":
     output_csv = sys.argv[1]
     html_files = sys.argv[2:]
 
-    batch_parse_to_csv(html_files, output_csv)
+    with profiling.Profiler('1-FASTQ质控信息提取.py') as prof:
+        batch_parse_to_csv(html_files, output_csv, prof)
     print(f"结果已保存到 {output_csv}")
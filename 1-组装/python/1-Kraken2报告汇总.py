@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+汇总 3-Kraken2.sh 的 <样本>_kraken_report.txt，做整个队列的污染筛查
+
+- 报告用 ProcessPoolExecutor 并行读取；兼容 --report-minimizer-data 多出的两列（rank / taxid / 名称总在最后三列）
+- 取种水平（rank 为 S）的 clade reads，除以该样本的总 reads（未分类 + root），得到物种占比
+- 物种编码为整数，输出与 scipy.sparse.save_npz 兼容的压缩稀疏矩阵 Kraken_species_matrix.npz（样本 × 物种占比），
+  行列标签保存在同一文件的 samples / species / taxids 数组中：
+    m = scipy.sparse.load_npz(path)
+    labels = np.load(path); labels['samples'], labels['species']
+- Kraken_screening.tsv：每个样本一行，总 reads、未分类比例、目标物种（默认 A. baumannii，taxid 470）比例、
+  占比最高的其他物种，以及是否低于阈值（status 为 FAIL）
+
+用法:
+  python3 1-Kraken2报告汇总.py /data_raid/7_luolintao/1_Baoman/3-Kraken [-o 汇总目录] [-j 8] [--min-fraction 0.8]
+"""
+
+import os
+import sys
+import csv
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# 共用的 CSR 稀疏矩阵写出（8-流程调度/python/稀疏矩阵.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 稀疏矩阵 import save_sparse
+
+SUFFIX = '_kraken_report.txt'
+TARGET_TAXID = '470'  # Acinetobacter baumannii
+SCREEN_COLUMNS = ['sample', 'total_reads', 'unclassified_fraction', 'target_fraction',
+                  'top_contaminant', 'top_contaminant_taxid', 'top_contaminant_fraction', 'status']
+
+
+def sample_name(path):
+    name = Path(path).name
+    return name[:-len(SUFFIX)] if name.endswith(SUFFIX) else Path(path).stem
+
+
+def parse_report(path):
+    """
+    读取一个 Kraken2 报告，返回 (样本名, 总 reads, 未分类 reads, {taxid: (物种名, clade reads)})
+
+    总 reads 取未分类（U）与 root（taxid 1）的 clade reads 之和
+    """
+    unclassified = root = 0
+    species = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 6:
+                continue
+            rank, taxid, name = fields[-3].strip(), fields[-2].strip(), fields[-1].strip()
+            clade_reads = int(fields[1])
+            if rank == 'U':
+                unclassified = clade_reads
+            elif taxid == '1':
+                root = clade_reads
+            elif rank == 'S':
+                species[taxid] = (name, clade_reads)
+    return sample_name(path), unclassified + root, unclassified, species
+
+
+def screen(report, target_taxid, min_fraction):
+    """单个样本的筛查结果行"""
+    sample, total, unclassified, species = report
+    fractions = {taxid: reads / total if total else 0.0 for taxid, (_, reads) in species.items()}
+    target = fractions.get(target_taxid, 0.0)
+    others = [taxid for taxid in fractions if taxid != target_taxid]
+    top = max(others, key=fractions.get) if others else None
+    return {
+        'sample': sample,
+        'total_reads': total,
+        'unclassified_fraction': f"{unclassified / total if total else 0.0:.4f}",
+        'target_fraction': f"{target:.4f}",
+        'top_contaminant': species[top][0] if top else '',
+        'top_contaminant_taxid': top or '',
+        'top_contaminant_fraction': f"{fractions[top]:.4f}" if top else '',
+        'status': 'PASS' if total and target >= min_fraction else 'FAIL',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行汇总 Kraken2 报告：样本 × 物种占比矩阵和污染筛查表")
+    parser.add_argument('input_dir', help='3-Kraken2.sh 的输出目录（<样本>_kraken_report.txt）')
+    parser.add_argument('-o', '--output', help='输出目录（默认：<input_dir>/汇总）')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='并行进程数（默认：CPU 核数）')
+    parser.add_argument('--target-taxid', default=TARGET_TAXID, help=f'目标物种 taxid（默认：{TARGET_TAXID}，A. baumannii）')
+    parser.add_argument('--min-fraction', type=float, default=0.8,
+                        help='目标物种占总 reads 的最低比例，低于此值标记为 FAIL（默认：0.8）')
+    parser.add_argument('--min-species-fraction', type=float, default=0.0001,
+                        help='矩阵只保留占比不低于此值的物种（默认：0.0001）')
+    args = parser.parse_args()
+
+    input_dir = Path(args.input_dir)
+    if not input_dir.is_dir():
+        print(f"错误：输入目录不存在：{input_dir}")
+        sys.exit(1)
+    out_dir = Path(args.output) if args.output else input_dir / '汇总'
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    files = sorted(input_dir.glob(f"*{SUFFIX}"))
+    if not files:
+        print(f"[WARN] {input_dir} 下没有 *{SUFFIX}")
+        sys.exit(1)
+
+    reports, failed = [], []
+    workers = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+        futures = {pool.submit(parse_report, str(p)): p for p in files}
+        for fut in as_completed(futures):
+            try:
+                reports.append(fut.result())
+            except (OSError, ValueError) as e:
+                print(f"[ERROR] {futures[fut]}：{e}")
+                failed.append(sample_name(futures[fut]))
+    reports.sort(key=lambda r: r[0])
+    samples = [r[0] for r in reports]
+    print(f"[INFO] 读取报告 {len(reports)} 个")
+
+    # 样本 × 物种占比
+    names, columns, rows, cols, values = {}, {}, [], [], []
+    for i, (_, total, _, species) in enumerate(reports):
+        for taxid, (name, reads) in species.items():
+            fraction = reads / total if total else 0.0
+            if reads and fraction >= args.min_species_fraction:
+                names.setdefault(taxid, name)
+                rows.append(i)
+                cols.append(columns.setdefault(taxid, len(columns)))
+                values.append(fraction)
+    taxids = list(columns)
+    save_sparse(out_dir / 'Kraken_species_matrix.npz', np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64),
+                np.array(values, dtype=np.float32), (len(samples), len(taxids)),
+                samples=np.array(samples, dtype=str), species=np.array([names[t] for t in taxids], dtype=str),
+                taxids=np.array(taxids, dtype=str))
+
+    table = [screen(r, args.target_taxid, args.min_fraction) for r in reports]
+    tmp = out_dir / 'Kraken_screening.tsv.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SCREEN_COLUMNS, delimiter='\t')
+        writer.writeheader()
+        writer.writerows(table)
+    os.replace(tmp, out_dir / 'Kraken_screening.tsv')
+
+    flagged = [row for row in table if row['status'] == 'FAIL']
+    print(f"[INFO] 矩阵 {len(samples)} 样本 × {len(taxids)} 物种；结果目录：{out_dir}")
+    if flagged:
+        print(f"[WARN] {len(flagged)} 个样本目标物种（taxid {args.target_taxid}）占比低于 {args.min_fraction}：")
+        for row in flagged:
+            print(f"  {row['sample']}\t{row['target_fraction']}\t{row['top_contaminant']} {row['top_contaminant_fraction']}")
+    else:
+        print(f"[INFO] 全部样本目标物种占比不低于 {args.min_fraction}")
+    if failed:
+        print(f"[ERROR] {len(failed)} 个报告读取失败：{', '.join(failed[:10])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式汇总 3-Kraken2.sh 的逐条分类结果（<样本>_kraken_output.txt），提取污染 reads 的 ID
+
+逐条结果与测序数据一样大，这里不整体读入：
+- 以大块二进制（默认 64 MB）读取，每块在最后一个换行处截断，剩余部分并入下一块
+- 块内用 NumPy 定位换行符和制表符，向量化解析第 3 列 taxid（兼容 --use-names 的 "名称 (taxid N)"），
+  再用 bincount 累加每个 taxid 的 reads 数；内存只与块大小和最大 taxid 有关
+- 根据同名的 <样本>_kraken_report.txt 中的分类层级，把 taxid 分为：
+    target       目标物种（默认 A. baumannii，taxid 470）及其下级
+    ancestor     目标物种的上级（属、科……root），只能说明分类不够精确，不算污染
+    contaminant  其余已分类的 reads
+  也可用 --contaminant-taxids 只把指定分类（含下级）视为污染
+- 污染 reads 的 ID 写到 <样本>_contaminant_reads.txt（每行一个），可直接用于 seqkit grep -v -f 过滤
+- 每个样本的 taxid 计数写到 <样本>_read_taxa.tsv，整个队列的汇总写到 Kraken_read_summary.tsv
+
+用法:
+  python3 2-Kraken2逐条结果汇总.py /data_raid/7_luolintao/1_Baoman/3-Kraken [-o 汇总目录] [-j 4]
+  python3 2-Kraken2逐条结果汇总.py ... --contaminant-taxids 562 573   # 只提取大肠杆菌、肺炎克雷伯菌的 reads
+"""
+
+import os
+import sys
+import csv
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+SUFFIX = '_kraken_output.txt'
+REPORT_SUFFIX = '_kraken_report.txt'
+TARGET_TAXID = 470  # Acinetobacter baumannii
+CHUNK_SIZE = 64 << 20
+MAX_TAXID_DIGITS = 10
+
+SUMMARY_COLUMNS = ['sample', 'total_reads', 'unclassified', 'target', 'ancestor', 'contaminant',
+                   'contaminant_fraction']
+
+
+def sample_name(path):
+    name = Path(path).name
+    return name[:-len(SUFFIX)] if name.endswith(SUFFIX) else Path(path).stem
+
+
+def read_taxonomy(report):
+    """
+    由 Kraken2 报告的缩进还原分类层级，返回 ({taxid: 名称}, {taxid: 上级 taxid})
+
+    报告按深度优先顺序列出分类，名称前每两个空格为一级
+    """
+    names, parent, stack = {}, {}, []
+    with open(report, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 6:
+                continue
+            taxid, raw_name = int(fields[-2]), fields[-1]
+            name = raw_name.lstrip(' ')
+            depth = (len(raw_name) - len(name)) // 2
+            names[taxid] = name
+            if taxid == 0:
+                continue
+            del stack[depth:]
+            parent[taxid] = stack[-1] if stack else 0
+            stack.append(taxid)
+    return names, parent
+
+
+def subtree(roots, parent):
+    """roots 及其全部下级 taxid"""
+    roots = set(roots)
+    result = set()
+    for taxid in parent:
+        node = taxid
+        while node:
+            if node in roots:
+                result.add(taxid)
+                break
+            node = parent.get(node, 0)
+    return result | roots
+
+
+def ancestors(taxid, parent):
+    result = set()
+    node = parent.get(taxid, 0)
+    while node:
+        result.add(node)
+        node = parent.get(node, 0)
+    return result
+
+
+def parse_chunk(buf):
+    """
+    解析一块完整行，返回 (taxid 数组, read ID 起始位置, read ID 结束位置)
+
+    每行格式：C/U <tab> read ID <tab> taxid <tab> 长度 <tab> k-mer 映射
+    """
+    arr = np.frombuffer(buf, dtype=np.uint8)
+    newlines = np.flatnonzero(arr == 10)
+    starts = np.concatenate(([0], newlines[:-1] + 1))
+    keep = newlines > starts  # 跳过空行
+    starts, ends = starts[keep], newlines[keep]
+    tabs = np.flatnonzero(arr == 9)
+    first = np.searchsorted(tabs, starts)
+    # 每行至少 3 个制表符；末尾补哨兵以免越界
+    tabs = np.concatenate((tabs, np.full(3, len(arr), dtype=tabs.dtype)))
+    tab1, tab2, tab3 = tabs[first], tabs[first + 1], tabs[first + 2]
+    if np.any(tab3 > ends):
+        bad = int(np.argmax(tab3 > ends))
+        raise ValueError(f"格式错误的行：{bytes(arr[starts[bad]:ends[bad]])[:80]!r}")
+
+    # taxid 字段：tab2+1 .. tab3；--use-names 时为 "名称 (taxid N)"，数字在右括号之前
+    field_end = tab3 - (arr[tab3 - 1] == ord(')'))
+    taxids = np.zeros(len(starts), dtype=np.int64)
+    valid = np.ones(len(starts), dtype=bool)
+    scale = 1
+    for k in range(MAX_TAXID_DIGITS):
+        pos = field_end - 1 - k
+        digit = arr[np.maximum(pos, 0)].astype(np.int64) - ord('0')
+        valid &= (pos > tab2) & (digit >= 0) & (digit <= 9)
+        if not valid.any():
+            break
+        taxids += np.where(valid, digit * scale, 0)
+        scale *= 10
+    return taxids, tab1 + 1, tab2
+
+
+def summarize_output(path, report, target_taxid, contaminant_taxids, out_dir, chunk_size=CHUNK_SIZE):
+    """流式处理一个样本的逐条结果，返回汇总行"""
+    sample = sample_name(path)
+    names, parent = read_taxonomy(report) if report and os.path.isfile(report) else ({}, {})
+    # 按 taxid 索引的污染标记，随最大 taxid 增长
+    if contaminant_taxids:
+        listed, invert = np.array(sorted(subtree(contaminant_taxids, parent)), dtype=np.int64), False
+    else:
+        excluded = subtree([target_taxid], parent) | ancestors(target_taxid, parent) | {0}
+        listed, invert = np.array(sorted(excluded), dtype=np.int64), True
+
+    counts = np.zeros(0, dtype=np.int64)
+    flags = np.zeros(0, dtype=bool)
+    ids_path = Path(out_dir) / f"{sample}_contaminant_reads.txt"
+    tmp = ids_path.with_name(ids_path.name + '.tmp')
+    n_contaminant = 0
+    with open(path, 'rb') as f, open(tmp, 'wb') as ids_out:
+        leftover = b''
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                buf, leftover = leftover, b''
+                if buf and not buf.endswith(b'\n'):
+                    buf += b'\n'
+            else:
+                buf = leftover + block
+                cut = buf.rfind(b'\n') + 1
+                buf, leftover = buf[:cut], buf[cut:]
+            if buf:
+                taxids, id_starts, id_ends = parse_chunk(buf)
+                if len(taxids):
+                    top = int(taxids.max()) + 1
+                    if top > len(counts):
+                        counts = np.concatenate((counts, np.zeros(top - len(counts), dtype=np.int64)))
+                        flags = np.concatenate((flags, np.isin(np.arange(len(flags), top), listed, invert=invert)))
+                    counts += np.bincount(taxids, minlength=len(counts))
+                    hit = np.flatnonzero(flags[taxids])
+                    if len(hit):
+                        ids_out.write(b''.join(buf[s:e] + b'\n' for s, e in zip(id_starts[hit].tolist(),
+                                                                                id_ends[hit].tolist())))
+                        n_contaminant += len(hit)
+            if not block:
+                break
+    os.replace(tmp, ids_path)
+
+    observed = np.flatnonzero(counts)
+    target_set = subtree([target_taxid], parent)
+    ancestor_set = ancestors(target_taxid, parent)
+    rows = []
+    for t in observed.tolist():
+        category = ('unclassified' if t == 0 else 'target' if t in target_set else
+                    'ancestor' if t in ancestor_set else 'contaminant' if flags[t] else 'other')
+        rows.append((t, names.get(t, ''), int(counts[t]), category))
+    rows.sort(key=lambda r: -r[2])
+    taxa_path = Path(out_dir) / f"{sample}_read_taxa.tsv"
+    with open(taxa_path.with_name(taxa_path.name + '.tmp'), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerow(['taxid', 'name', 'reads', 'category'])
+        writer.writerows(rows)
+    os.replace(taxa_path.with_name(taxa_path.name + '.tmp'), taxa_path)
+
+    total = int(counts.sum())
+    by_category = {c: sum(r[2] for r in rows if r[3] == c) for c in ('unclassified', 'target', 'ancestor')}
+    return {
+        'sample': sample,
+        'total_reads': total,
+        **by_category,
+        'contaminant': n_contaminant,
+        'contaminant_fraction': f"{n_contaminant / total if total else 0.0:.4f}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式汇总 Kraken2 逐条分类结果，提取污染 reads 的 ID")
+    parser.add_argument('input', help='3-Kraken2.sh 的输出目录（<样本>_kraken_output.txt）或单个文件')
+    parser.add_argument('-o', '--output', help='输出目录（默认：<输入目录>/汇总）')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='并行进程数（默认：CPU 核数；每个进程占用约 2 倍块大小的内存）')
+    parser.add_argument('--target-taxid', type=int, default=TARGET_TAXID,
+                        help=f'目标物种 taxid（默认：{TARGET_TAXID}，A. baumannii）')
+    parser.add_argument('--contaminant-taxids', nargs='+', type=int,
+                        help='只把这些分类（含下级）视为污染；默认为目标物种及其上级以外的全部已分类 reads')
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_SIZE >> 20, help='每次读取的块大小（MB，默认：64）')
+    args = parser.parse_args()
+    if args.chunk_mb < 1:
+        parser.error(f"--chunk-mb 必须为正整数：{args.chunk_mb}")
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"错误：输入不存在：{input_path}")
+        sys.exit(1)
+    files = [input_path] if input_path.is_file() else sorted(input_path.glob(f"*{SUFFIX}"))
+    if not files:
+        print(f"[WARN] {input_path} 下没有 *{SUFFIX}")
+        sys.exit(1)
+    base_dir = input_path.parent if input_path.is_file() else input_path
+    out_dir = Path(args.output) if args.output else base_dir / '汇总'
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    reports = {p: p.with_name(sample_name(p) + REPORT_SUFFIX) for p in files}
+    missing = [sample_name(p) for p, r in reports.items() if not r.exists()]
+    if missing and not args.contaminant_taxids:
+        print(f"[WARN] {len(missing)} 个样本没有 Kraken2 报告，无法区分目标物种的上级分类，"
+              f"这些样本中目标物种以外的已分类 reads 都按污染统计：{', '.join(missing[:5])}")
+
+    rows, failed = [], []
+    workers = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+        futures = {pool.submit(summarize_output, str(p), str(reports[p]), args.target_taxid,
+                               args.contaminant_taxids, str(out_dir), args.chunk_mb << 20): p for p in files}
+        for fut in as_completed(futures):
+            try:
+                rows.append(fut.result())
+            except (OSError, ValueError) as e:
+                print(f"[ERROR] {futures[fut]}：{e}")
+                failed.append(sample_name(futures[fut]))
+    rows.sort(key=lambda r: r['sample'])
+
+    summary = out_dir / 'Kraken_read_summary.tsv'
+    with open(f"{summary}.tmp", 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, delimiter='\t')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(f"{summary}.tmp", summary)
+
+    for row in rows:
+        print(f"  {row['sample']}\treads {row['total_reads']}\t污染 {row['contaminant']} ({row['contaminant_fraction']})")
+    print(f"[INFO] 汇总表：{summary}；污染 reads ID：{out_dir}/<样本>_contaminant_reads.txt")
+    if failed:
+        print(f"[ERROR] {len(failed)} 个样本处理失败：{', '.join(failed[:10])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比较每个样本的多种组装结果，自动选出最佳组装
+
+output/all_methods_comparison/methods_comparison.csv 原来是把 2-EToKi新版.sh、Arc/策略A.sh、Arc/策略B.sh 等
+脚本的结果手工整理出来的。这里对整个队列自动完成：
+- 在每个样本目录（<样本>_Assembly/ 或 <样本>/）下按 METHODS 查找各方法的组装结果，可用 --method 追加或覆盖；
+  4-contig过滤.py 的结果作为 coverage_filtered 方法参与比较
+- 用 ProcessPoolExecutor 并行统计全部样本全部方法：Contigs 数量、基因组大小、最长 contig、N50、L50、NG50
+- 按 markdown/组装优化分析.md 的质量评估标准给出状态（优秀 / 可接受 / 较差 / 失败），
+  每个样本按 状态 > NG50 > Contigs 数量 排名，第 1 名复制为 <输出目录>/<样本>/BEST_assembly_contigs.fasta
+  注意：原 methods_comparison.csv 的状态是同一样本内各方法相对比较后手工标注的，
+  strategyB（289 个 contigs，N50 84 kb，最长 233 kb）标为优秀；按评估标准的绝对阈值它只算较差，
+  但在该样本中仍排名第 1。这里保留文档中的阈值，不为迎合原表而放宽
+- 输出：
+    <输出目录>/<样本>/methods_comparison.csv   与原表相同的列，外加 N50 / L50 / NG50 / 排名
+    <输出目录>/methods_comparison.csv          整个队列的长表（多一列样本名）
+
+用法:
+  python3 3-组装方法比较.py /data_raid/7_luolintao/1_Baoman/1-Assemble -o /data_raid/7_luolintao/1_Baoman/1-Assemble/比较 [-j 8]
+  python3 3-组装方法比较.py ... --method megahit_k141=megahit_k141/final.contigs.fa
+"""
+
+import os
+import sys
+import csv
+import shutil
+import argparse
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# 方法名 -> 候选路径（相对样本目录，{sample} 替换为样本名；依次查找，取第一个存在的）
+METHODS = OrderedDict([
+    ('EToKi', ['etoki_assembly/{sample}_assembly/etoki.mapping.reference.fasta', '../{sample}.fasta']),
+    ('SPAdes_isolate_原始', ['etoki_assembly/{sample}_assembly/spades/contigs.fasta']),
+    ('strategyA_strict', ['strategyA_strict/contigs.fasta']),
+    ('strategyB_coverage', ['strategyB_coverage/contigs.fasta']),
+    ('strategyC_megahit', ['strategyC_megahit/final.contigs.fa']),
+    ('coverage_filtered', ['coverage_filtered/contigs.fasta']),  # 4-contig过滤.py
+])
+SAMPLE_DIR_SUFFIX = '_Assembly'
+BEST_NAME = 'BEST_assembly_contigs.fasta'
+OUTPUT_DIRNAME = 'all_methods_comparison'
+
+# 质量评估标准（markdown/组装优化分析.md）；基因组大小偏离预期过多时直接判为失败
+GENOME_SIZE = 3_900_000
+SIZE_RANGE = (3_500_000, 4_500_000)
+FAIL_RATIO = (0.7, 1.4)
+GRADES = [  # (状态, Contigs 数量 <, N50 >, 最长 contig >)
+    ('优秀', 50, 200_000, 500_000),
+    ('可接受', 200, 50_000, 100_000),
+]
+STATUS_ORDER = {'优秀': 0, '可接受': 1, '较差': 2, '失败': 3}
+
+COLUMNS = ['方法', 'Contigs数量', '基因组大小(bp)', '最长Contig(bp)', 'N50(bp)', 'L50', 'NG50(bp)', '状态', '排名']
+
+
+def contig_lengths(path, min_length=0):
+    """流式读取 FASTA，返回各序列长度（不保存序列）"""
+    lengths, current = [], None
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'>'):
+                if current is not None:
+                    lengths.append(current)
+                current = 0
+            elif current is not None:
+                current += len(line.rstrip(b'\r\n'))
+    if current is not None:
+        lengths.append(current)
+    lengths = np.array(lengths, dtype=np.int64)
+    return lengths[lengths >= min_length] if min_length else lengths
+
+
+def nx_stats(lengths, genome_size):
+    """N50 / L50（以组装总长为基准）与 NG50（以预期基因组大小为基准；组装总长不足一半时为 0）"""
+    ordered = np.sort(lengths)[::-1]
+    cumulative = np.cumsum(ordered)
+    total = int(cumulative[-1])
+    i = int(np.searchsorted(cumulative, total / 2))
+    g = int(np.searchsorted(cumulative, genome_size / 2))
+    ng50 = int(ordered[g]) if g < len(ordered) else 0
+    return int(ordered[i]), i + 1, ng50
+
+
+def grade(n_contigs, total, n50, longest, genome_size):
+    """同时满足 Contigs 数量、N50、最长 contig 和基因组大小四项标准才评为该等级"""
+    if not FAIL_RATIO[0] * genome_size <= total <= FAIL_RATIO[1] * genome_size:
+        return '失败'
+    if SIZE_RANGE[0] <= total <= SIZE_RANGE[1]:
+        for status, max_contigs, min_n50, min_longest in GRADES:
+            if n_contigs < max_contigs and n50 > min_n50 and longest > min_longest:
+                return status
+    return '较差'
+
+
+def assembly_stats(method, path, genome_size, min_length=0):
+    """一种组装的统计行；文件不存在或为空时状态为失败"""
+    row = {'方法': method, 'path': str(path) if path else ''}
+    lengths = contig_lengths(path, min_length) if path else np.zeros(0, dtype=np.int64)
+    if not len(lengths):
+        row.update({'Contigs数量': 'FAILED', '基因组大小(bp)': '-', '最长Contig(bp)': '-', 'N50(bp)': '-',
+                    'L50': '-', 'NG50(bp)': '-', '状态': '失败'})
+        return row
+    total, longest = int(lengths.sum()), int(lengths.max())
+    n50, l50, ng50 = nx_stats(lengths, genome_size)
+    row.update({'Contigs数量': len(lengths), '基因组大小(bp)': total, '最长Contig(bp)': longest,
+                'N50(bp)': n50, 'L50': l50, 'NG50(bp)': ng50,
+                '状态': grade(len(lengths), total, n50, longest, genome_size)})
+    return row
+
+
+def find_assembly(sample_dir, sample, patterns):
+    for pattern in patterns:
+        path = (sample_dir / pattern.format(sample=sample)).resolve()
+        if path.is_file():
+            return path
+    return None
+
+
+def rank(rows):
+    """按 状态 > NG50（大者优先）> Contigs 数量（少者优先）排名；失败的不参与排名"""
+    ok = [r for r in rows if r['状态'] != '失败']
+    ok.sort(key=lambda r: (STATUS_ORDER[r['状态']], -r['NG50(bp)'], r['Contigs数量']))
+    for i, r in enumerate(ok, 1):
+        r['排名'] = i
+    for r in rows:
+        r.setdefault('排名', '-')
+    return ok[0] if ok else None
+
+
+def compare_sample(sample, sample_dir, methods, out_dir, genome_size, min_length):
+    """统计一个样本的全部方法，写出该样本的比较表和最佳组装，返回 (样本名, 各方法统计行, 最佳方法)"""
+    sample_dir = Path(sample_dir)
+    rows = [assembly_stats(method, find_assembly(sample_dir, sample, patterns), genome_size, min_length)
+            for method, patterns in methods.items()]
+    best = rank(rows)
+
+    target = Path(out_dir) / sample
+    target.mkdir(parents=True, exist_ok=True)
+    tmp = target / 'methods_comparison.csv.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, target / 'methods_comparison.csv')
+    if best is not None:
+        tmp = target / f".{BEST_NAME}.tmp"
+        shutil.copyfile(best['path'], tmp)
+        os.replace(tmp, target / BEST_NAME)
+    return sample, rows, best['方法'] if best else None
+
+
+def discover_samples(input_dir, samples=None):
+    """{样本名: 样本目录}；目录名去掉 _Assembly 后缀即样本名（跳过默认输出目录）"""
+    found = {}
+    for d in sorted(p for p in Path(input_dir).iterdir() if p.is_dir() and p.name != OUTPUT_DIRNAME):
+        name = d.name[:-len(SAMPLE_DIR_SUFFIX)] if d.name.endswith(SAMPLE_DIR_SUFFIX) else d.name
+        if samples is None or name in samples:
+            found[name] = d
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行比较每个样本的多种组装结果（N50 / L50 / NG50），自动选出最佳组装")
+    parser.add_argument('input_dir', help='组装输出目录（每个样本一个 <样本>_Assembly/ 或 <样本>/ 子目录）')
+    parser.add_argument('-o', '--output', help=f'输出目录（默认：<input_dir>/{OUTPUT_DIRNAME}）')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='并行进程数（默认：CPU 核数）')
+    parser.add_argument('-s', '--samples', nargs='+', help='只比较这些样本')
+    parser.add_argument('--method', action='append', default=[], metavar='名称=路径',
+                        help='追加或覆盖一种方法的组装路径（相对样本目录，可用 {sample}），可重复')
+    parser.add_argument('--genome-size', type=int, default=GENOME_SIZE, help=f'预期基因组大小（默认：{GENOME_SIZE}）')
+    parser.add_argument('--min-length', type=int, default=0, help='只统计不短于此长度的 contig（默认：全部）')
+    args = parser.parse_args()
+
+    input_dir = Path(args.input_dir)
+    if not input_dir.is_dir():
+        print(f"错误：输入目录不存在：{input_dir}")
+        sys.exit(1)
+    methods = OrderedDict(METHODS)
+    for spec in args.method:
+        name, sep, pattern = spec.partition('=')
+        if not sep or not name or not pattern:
+            print(f"错误：--method 格式应为 名称=路径：{spec}")
+            sys.exit(1)
+        methods[name] = [pattern]
+    out_dir = Path(args.output) if args.output else input_dir / OUTPUT_DIRNAME
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    samples = discover_samples(input_dir, set(args.samples) if args.samples else None)
+    samples.pop(out_dir.name, None)
+    if not samples:
+        print(f"[WARN] {input_dir} 下没有样本目录")
+        sys.exit(1)
+
+    results, failed = {}, []
+    workers = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=min(workers, len(samples))) as pool:
+        futures = {pool.submit(compare_sample, s, str(d), methods, str(out_dir), args.genome_size, args.min_length): s
+                   for s, d in samples.items()}
+        for fut in as_completed(futures):
+            try:
+                sample, rows, best = fut.result()
+            except OSError as e:
+                print(f"[ERROR] {futures[fut]}：{e}")
+                failed.append(futures[fut])
+                continue
+            results[sample] = (rows, best)
+
+    cohort = out_dir / 'methods_comparison.csv'
+    with open(f"{cohort}.tmp", 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['样本', *COLUMNS], extrasaction='ignore')
+        writer.writeheader()
+        for sample in sorted(results):
+            writer.writerows({'样本': sample, **row} for row in results[sample][0])
+    os.replace(f"{cohort}.tmp", cohort)
+
+    no_best = sorted(s for s, (_, best) in results.items() if best is None)
+    for sample in sorted(results):
+        rows, best = results[sample]
+        if best:
+            row = next(r for r in rows if r['方法'] == best)
+            print(f"  {sample}\t{best}\t{row['Contigs数量']} contigs\tN50 {row['N50(bp)']}\t{row['状态']}")
+    print(f"[INFO] 样本 {len(results)} 个，方法 {len(methods)} 种；汇总表：{cohort}")
+    if no_best:
+        print(f"[WARN] {len(no_best)} 个样本没有可用的组装：{', '.join(no_best[:10])}")
+    if failed:
+        print(f"[ERROR] {len(failed)} 个样本处理失败：{', '.join(failed[:10])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按长度和覆盖度过滤 SPAdes 组装结果（contigs.fasta / scaffolds.fasta）
+
+策略B（SPAdes --cov-cutoff 15）在 methods_comparison.csv 中效果最好（289 个 contigs，原始 5,268 个），
+但过滤只能在组装时通过 SPAdes 参数完成。这里对已有组装直接过滤：
+- 一次读入整个文件（细菌基因组只有几 MB），用正则一次找出全部序列头，
+  从 SPAdes 序列头 NODE_<编号>_length_<长度>_cov_<覆盖度> 取长度和覆盖度，不逐行解析序列
+- 长度阈值 --min-length；覆盖度阈值 --min-cov，或 --auto-cov：按 contig 长度加权的 log2 覆盖度直方图
+  估计众数（基因组的主要覆盖度），阈值取众数 × --cov-fraction（默认 0.3；策略B 的 15x 约为众数 46x 的 0.33）
+- 保留的序列按原顺序原样写出（原子写入）
+
+两种用法：
+  单个文件：
+    python3 4-contig过滤.py -i strategyA_strict/contigs.fasta -o filtered.fasta --auto-cov
+  整个队列（样本目录与 3-组装方法比较.py 相同，结果写到 <样本目录>/coverage_filtered/contigs.fasta，
+  3-组装方法比较.py 会把它作为 coverage_filtered 方法参与比较）：
+    python3 4-contig过滤.py -d /data_raid/7_luolintao/1_Baoman/1-Assemble --auto-cov [-j 8]
+"""
+
+import os
+import re
+import sys
+import csv
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+HEADER_RE = re.compile(rb'^>(\S*)[^\n]*\n', re.M)
+SPADES_RE = re.compile(rb'_length_(\d+)_cov_([\d.]+)')
+
+# 队列模式：在样本目录下依次查找的输入（取第一个存在的）和输出
+SOURCES = ['etoki_assembly/{sample}_assembly/spades/contigs.fasta', 'strategyA_strict/contigs.fasta']
+DEST = 'coverage_filtered/contigs.fasta'
+
+# 估计覆盖度众数时只用较长的 contig（短 contig 多为重复序列，覆盖度偏高）
+MODE_MIN_LENGTH = 1000
+MODE_BIN_WIDTH = 0.1  # log2 覆盖度
+SUMMARY_COLUMNS = ['sample', 'input', 'contigs', 'kept', 'input_bp', 'kept_bp', 'cov_mode', 'min_cov', 'min_length']
+
+
+# 共用的模块加载函数（8-流程调度/python/模块加载.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+
+COMPARISON_SCRIPT = Path(__file__).with_name('3-组装方法比较.py')
+
+
+def scan(data):
+    """
+    找出全部序列，返回 (起始偏移, 长度, 覆盖度) 三个数组；序列 i 占 data[start[i]:start[i + 1]]
+
+    序列头不是 SPAdes 格式时长度按实际碱基数计算，覆盖度记为 NaN
+    """
+    starts, lengths, covs = [], [], []
+    headers = list(HEADER_RE.finditer(data))
+    for i, m in enumerate(headers):
+        starts.append(m.start())
+        spades = SPADES_RE.search(m.group(1))
+        if spades:
+            lengths.append(int(spades.group(1)))
+            covs.append(float(spades.group(2)))
+        else:
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(data)
+            body = data[m.end():end]
+            lengths.append(len(body) - body.count(b'\n') - body.count(b'\r'))
+            covs.append(np.nan)
+    return np.array(starts, dtype=np.int64), np.array(lengths, dtype=np.int64), np.array(covs, dtype=np.float64)
+
+
+def coverage_mode(lengths, covs, min_length=MODE_MIN_LENGTH):
+    """按长度加权的 log2 覆盖度直方图的众数；没有可用 contig 时返回 NaN"""
+    use = (lengths >= min_length) & (covs > 0)
+    if not use.any():
+        use = covs > 0
+    if not use.any():
+        return float('nan')
+    log_cov = np.log2(covs[use])
+    lo = np.floor(log_cov.min() / MODE_BIN_WIDTH) * MODE_BIN_WIDTH
+    bins = np.arange(lo, log_cov.max() + 2 * MODE_BIN_WIDTH, MODE_BIN_WIDTH)
+    hist, edges = np.histogram(log_cov, bins=bins, weights=lengths[use])
+    peak = int(np.argmax(hist))
+    return float(2 ** ((edges[peak] + edges[peak + 1]) / 2))
+
+
+def filter_fasta(src, dest, min_length=0, min_cov=0.0, auto_cov=False, cov_fraction=0.3):
+    """过滤一个组装文件，返回统计 dict"""
+    with open(src, 'rb') as f:
+        data = f.read()
+    starts, lengths, covs = scan(data)
+    mode = coverage_mode(lengths, covs) if auto_cov else float('nan')
+    threshold = max(min_cov, mode * cov_fraction) if auto_cov and not np.isnan(mode) else min_cov
+    # 没有覆盖度信息的序列只按长度过滤
+    keep = (lengths >= min_length) & (np.isnan(covs) | (covs >= threshold))
+
+    ends = np.append(starts[1:], len(data))
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.tmp")
+    with open(tmp, 'wb') as out:
+        for s, e in zip(starts[keep].tolist(), ends[keep].tolist()):
+            chunk = data[s:e]
+            out.write(chunk if chunk.endswith(b'\n') else chunk + b'\n')
+    os.replace(tmp, dest)
+    return {
+        'input': str(src),
+        'contigs': len(lengths),
+        'kept': int(keep.sum()),
+        'input_bp': int(lengths.sum()),
+        'kept_bp': int(lengths[keep].sum()),
+        'cov_mode': '' if np.isnan(mode) else f"{mode:.1f}",
+        'min_cov': f"{threshold:.1f}",
+        'min_length': min_length,
+    }
+
+
+def filter_sample(sample, sample_dir, sources, dest, **kwargs):
+    comparison = load_module(COMPARISON_SCRIPT)
+    src = comparison.find_assembly(Path(sample_dir), sample, sources)
+    if src is None:
+        return {'sample': sample, 'input': ''}
+    return {'sample': sample, **filter_fasta(src, Path(sample_dir) / dest.format(sample=sample), **kwargs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按长度和覆盖度过滤 SPAdes 组装（单个文件或整个队列）")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('-i', '--input', help='单个 SPAdes contigs.fasta / scaffolds.fasta')
+    source.add_argument('-d', '--assemble-dir', help='队列模式：组装输出目录（每个样本一个 <样本>_Assembly/ 或 <样本>/ 子目录）')
+    parser.add_argument('-o', '--output', help='单个文件模式：输出 FASTA；队列模式：汇总表（默认：<assemble_dir>/contig_filter_summary.tsv）')
+    parser.add_argument('--min-length', type=int, default=500, help='最短 contig 长度（默认：500）')
+    parser.add_argument('--min-cov', type=float, default=0.0, help='最低覆盖度（默认：0，不过滤）')
+    parser.add_argument('--auto-cov', action='store_true', help='按覆盖度众数 × --cov-fraction 自动确定最低覆盖度（不低于 --min-cov）')
+    parser.add_argument('--cov-fraction', type=float, default=0.3, help='自动阈值占覆盖度众数的比例（默认：0.3）')
+    parser.add_argument('--source', action='append', metavar='路径',
+                        help=f'队列模式：样本目录下的输入（可用 {{sample}}，可重复，取第一个存在的；默认：{", ".join(SOURCES)}）')
+    parser.add_argument('--dest', default=DEST, help=f'队列模式：样本目录下的输出（默认：{DEST}）')
+    parser.add_argument('-s', '--samples', nargs='+', help='队列模式：只处理这些样本')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='队列模式：并行进程数（默认：CPU 核数）')
+    args = parser.parse_args()
+    options = dict(min_length=args.min_length, min_cov=args.min_cov, auto_cov=args.auto_cov,
+                   cov_fraction=args.cov_fraction)
+
+    if args.input:
+        if not args.output:
+            print("错误：单个文件模式需要 -o 输出文件")
+            sys.exit(1)
+        if not os.path.isfile(args.input):
+            print(f"错误：输入文件不存在：{args.input}")
+            sys.exit(1)
+        stats = filter_fasta(args.input, args.output, **options)
+        print(f"[INFO] 保留 {stats['kept']}/{stats['contigs']} 个 contig，{stats['kept_bp']}/{stats['input_bp']} bp；"
+              f"覆盖度众数 {stats['cov_mode'] or '-'}，阈值 {stats['min_cov']}x，长度 ≥ {args.min_length}")
+        print(f"[INFO] 已写出：{args.output}")
+        return
+
+    assemble_dir = Path(args.assemble_dir)
+    if not assemble_dir.is_dir():
+        print(f"错误：组装目录不存在：{assemble_dir}")
+        sys.exit(1)
+    samples = load_module(COMPARISON_SCRIPT).discover_samples(assemble_dir, set(args.samples) if args.samples else None)
+    if not samples:
+        print(f"[WARN] {assemble_dir} 下没有样本目录")
+        sys.exit(1)
+
+    rows, failed = [], []
+    workers = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=min(workers, len(samples))) as pool:
+        futures = {pool.submit(filter_sample, s, str(d), args.source or SOURCES, args.dest, **options): s
+                   for s, d in samples.items()}
+        for fut in as_completed(futures):
+            try:
+                rows.append(fut.result())
+            except OSError as e:
+                print(f"[ERROR] {futures[fut]}：{e}")
+                failed.append(futures[fut])
+    rows.sort(key=lambda r: r['sample'])
+
+    missing = [r['sample'] for r in rows if not r['input']]
+    done = [r for r in rows if r['input']]
+    summary = Path(args.output) if args.output else assemble_dir / 'contig_filter_summary.tsv'
+    with open(f"{summary}.tmp", 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, delimiter='\t')
+        writer.writeheader()
+        writer.writerows(done)
+    os.replace(f"{summary}.tmp", summary)
+
+    for r in done:
+        print(f"  {r['sample']}\t{r['kept']}/{r['contigs']} contigs\t{r['kept_bp']} bp\t阈值 {r['min_cov']}x")
+    print(f"[INFO] 过滤 {len(done)} 个样本；汇总表：{summary}")
+    if missing:
+        print(f"[WARN] {len(missing)} 个样本没有找到 SPAdes 组装：{', '.join(missing[:10])}")
+    if failed:
+        print(f"[ERROR] {len(failed)} 个样本处理失败：{', '.join(failed[:10])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重命名组装结果中的 contig：>样本名_1、>样本名_2 ……（与 3-contig-rename.sh 的 awk 规则相同）
+
+原来的 3-contig-rename.sh / 4-注释/1-prokka/script/1-contig-rename.sh 逐个文件先 awk 改序列头，
+再 sed -i 去掉 CRLF（又完整重写一遍），再 mv / chmod / touch。这里：
+- 每个文件只按块（默认 8 MB）二进制读一遍：块内 CRLF 换成 LF，用正则一次替换全部序列头，编号跨块连续
+- 先写到输出目录中的临时文件，再 os.replace，保留原文件的权限和时间戳（与原脚本相同）
+- 多个文件用 ProcessPoolExecutor 并行处理
+- 输出 新 ID → 原序列头 的对应表（默认 <输出目录>/contig_id_map.tsv），下游结果可以追溯到 SPAdes 的 NODE 名称；
+  已有的对应表按样本合并，原地重跑不会用恒等映射覆盖原 NODE 名称
+
+用法:
+  python3 5-contig重命名.py /mnt/d/1-ABaumannii/Assemble -o /mnt/d/1-ABaumannii/Assemble_rename [-j 8]
+  python3 5-contig重命名.py /mnt/d/1-鲍曼菌/组装完成 --ext fasta fa fna        # 不给 -o 时原地改写
+  python3 5-contig重命名.py /mnt/d/1-ABaumannii/Assemble/ERR1946991.fasta -o /mnt/d/1-ABaumannii/Assemble_rename
+"""
+
+import os
+import re
+import sys
+import csv
+import shutil
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+HEADER_RE = re.compile(rb'^>([^\n]*)', re.M)
+CHUNK_SIZE = 8 << 20
+MAP_NAME = 'contig_id_map.tsv'
+MAP_COLUMNS = ['sample', 'new_id', 'old_id', 'old_header']
+
+
+def rename_file(src, dest, chunk_size=CHUNK_SIZE):
+    """重命名一个文件的序列头，返回 (样本名, [(新 ID, 原 ID, 原序列头)])"""
+    src, dest = Path(src), Path(dest)
+    base = src.stem
+    prefix = base.encode() + b'_'
+    mapping = []
+
+    def replace(match):
+        old = match.group(1)
+        new = prefix + str(len(mapping) + 1).encode()
+        mapping.append((new.decode(), old.split(None, 1)[0].decode(errors='replace') if old.strip() else '',
+                        old.decode(errors='replace')))
+        return b'>' + new
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        with open(src, 'rb') as fin, open(tmp, 'wb', buffering=chunk_size) as fout:
+            leftover = b''
+            while True:
+                block = fin.read(chunk_size)
+                buf = leftover + block
+                if block:
+                    # 只处理到最后一个换行，保证序列头和 CRLF 不被块边界截断
+                    cut = buf.rfind(b'\n') + 1
+                    buf, leftover = buf[:cut], buf[cut:]
+                elif buf and not buf.endswith(b'\n'):
+                    # 与 awk 相同：最后一行补上换行
+                    buf = buf.rstrip(b'\r') + b'\n'
+                buf = buf.replace(b'\r\n', b'\n')
+                fout.write(HEADER_RE.sub(replace, buf))
+                if not block:
+                    break
+        shutil.copymode(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    st = os.stat(src)
+    os.utime(dest, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return base, mapping
+
+
+def read_map(path):
+    """读取已有的 ID 对应表，返回 {样本名: [(新 ID, 原 ID, 原序列头)]}；文件不存在时为空"""
+    path = Path(path)
+    existing = {}
+    if not path.exists():
+        return existing
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader, None)
+        if header != MAP_COLUMNS:
+            print(f"错误：ID 对应表表头不符：{path}（应为 {' '.join(MAP_COLUMNS)}）")
+            sys.exit(1)
+        for sample, *row in reader:
+            existing.setdefault(sample, []).append(tuple(row))
+    return existing
+
+
+def write_map(path, results):
+    """
+    把本次处理的样本合并进 ID 对应表：其他样本的行保持不变，本次处理的样本整体替换
+
+    原地重跑时序列头已是 <样本名>_<序号>，得到的是 新 ID = 原 ID 的恒等映射，
+    这类行保留表中已有的记录（原 SPAdes NODE 名称），不覆盖
+    """
+    path = Path(path)
+    merged = read_map(path)
+    for sample, mapping in results.items():
+        old_rows = {row[0]: row for row in merged.get(sample, [])}
+        # row = (新 ID, 原 ID, 原序列头)
+        merged[sample] = [old_rows.get(row[0], row) if row[0] == row[1] else row for row in mapping]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerow(MAP_COLUMNS)
+        for sample in sorted(merged):
+            writer.writerows((sample, *row) for row in merged[sample])
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行重命名组装 contig 为 <样本名>_<序号>，去掉 CRLF，输出 ID 对应表")
+    parser.add_argument('input', help='组装目录（非递归）或单个 FASTA')
+    parser.add_argument('-o', '--output', help='输出目录（默认：原地改写）')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='并行进程数（默认：CPU 核数）')
+    parser.add_argument('--ext', nargs='+', default=['fasta'], help='目录模式下处理的扩展名（默认：fasta）')
+    parser.add_argument('--map', help=f'ID 对应表（默认：<输出目录>/{MAP_NAME}）')
+    args = parser.parse_args()
+
+    src = Path(args.input)
+    if src.is_file():
+        files = [src]
+        out_dir = Path(args.output) if args.output else src.parent
+    elif src.is_dir():
+        exts = {f".{e.lstrip('.')}" for e in args.ext}
+        files = sorted(p for p in src.iterdir() if p.is_file() and p.suffix in exts)
+        out_dir = Path(args.output) if args.output else src
+    else:
+        print(f"错误：输入不存在：{src}")
+        sys.exit(1)
+    if not files:
+        print(f"未找到任何 {'/'.join(args.ext)} 文件（目录：{src}）")
+        sys.exit(0)
+    if out_dir.resolve() == (src if src.is_dir() else src.parent).resolve():
+        print("[WARN] 原地改写：原序列头只保存在 ID 对应表中")
+
+    results, failed = {}, []
+    workers = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+        futures = {pool.submit(rename_file, str(p), str(out_dir / p.name)): p for p in files}
+        for fut in as_completed(futures):
+            try:
+                sample, mapping = fut.result()
+            except OSError as e:
+                print(f"[ERROR] {futures[fut]}：{e}")
+                failed.append(futures[fut].name)
+                continue
+            results[sample] = mapping
+            print(f"已写出: {out_dir / futures[fut].name} -> 重命名序列: {len(mapping)}")
+
+    map_path = Path(args.map) if args.map else out_dir / MAP_NAME
+    write_map(map_path, results)
+    print(f"完成。共处理文件: {len(results)}, 重命名序列总计: {sum(len(m) for m in results.values())}")
+    print(f"[INFO] ID 对应表：{map_path}")
+    if failed:
+        print(f"[ERROR] {len(failed)} 个文件处理失败：{', '.join(failed[:10])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
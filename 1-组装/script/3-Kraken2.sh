@@ -1,10 +1,48 @@
 #!/bin/bash
+# Kraken2 物种鉴定（批量）：对 FASTQ_DIR 下所有 <样本>_1.fastq.gz / <样本>_2.fastq.gz 运行 kraken2，
+# 已有报告的样本跳过；全部完成后用 1-Kraken2报告汇总.py 生成物种占比矩阵和污染筛查表，
+# 再用 2-Kraken2逐条结果汇总.py 流式统计逐条结果并提取污染 reads 的 ID
+# 只跑单个样本：bash 3-Kraken2.sh ERR1946991
+
 DB_PATH="/home/luolintao/miniconda3/envs/etoki/share/etoki-1.2.3/externals/minikraken2/minikraken2_v2_8GB_201904_UPDATE"
+FASTQ_DIR="/data_raid/7_luolintao/1_Baoman/2-Sequence/FASTQ"
+OUTPUT_DIR="/data_raid/7_luolintao/1_Baoman/3-Kraken"
+PYTHON_DIR="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/1-组装/python"
+THREADS=8
+MIN_FRACTION=0.8
+
+mkdir -p "${OUTPUT_DIR}"
+
+if [ $# -gt 0 ]; then
+  SAMPLES=("$@")
+else
+  mapfile -t SAMPLES < <(find "${FASTQ_DIR}" -maxdepth 1 -name "*_1.fastq.gz" -printf "%f\n" | sed 's/_1\.fastq\.gz$//' | sort)
+fi
+
+if [ "${#SAMPLES[@]}" -eq 0 ]; then
+  echo "错误：${FASTQ_DIR} 下没有 *_1.fastq.gz"
+  exit 1
+fi
+
+echo "样本数：${#SAMPLES[@]}"
+for sample in "${SAMPLES[@]}"; do
+  report="${OUTPUT_DIR}/${sample}_kraken_report.txt"
+  if [ -s "${report}" ]; then
+    echo "[跳过] ${sample}：报告已存在"
+    continue
+  fi
+  echo "[运行] ${sample}"
+  # 先写临时文件，中断时不会留下不完整的报告
+  kraken2 \
+    --db "${DB_PATH}" \
+    --paired "${FASTQ_DIR}/${sample}_1.fastq.gz" \
+      "${FASTQ_DIR}/${sample}_2.fastq.gz" \
+    --threads "${THREADS}" \
+    --report "${report}.tmp" \
+    --output "${OUTPUT_DIR}/${sample}_kraken_output.txt" \
+    && mv -f "${report}.tmp" "${report}" \
+    || echo "[失败] ${sample}"
+done
 
-kraken2 \
-  --db "${DB_PATH}" \
-  --paired /data_raid/7_luolintao/1_Baoman/2-Sequence/FASTQ/ERR1946991_1.fastq.gz \
-    /data_raid/7_luolintao/1_Baoman/2-Sequence/FASTQ/ERR1946991_2.fastq.gz \
-  --threads 8 \
-  --report /data_raid/7_luolintao/1_Baoman/3-Kraken/ERR1946991_kraken_report.txt \
-  --output /data_raid/7_luolintao/1_Baoman/3-Kraken/ERR1946991_kraken_output.txt
+python3 "${PYTHON_DIR}/1-Kraken2报告汇总.py" "${OUTPUT_DIR}" -o "${OUTPUT_DIR}/汇总" -j "${THREADS}" --min-fraction "${MIN_FRACTION}"
+python3 "${PYTHON_DIR}/2-Kraken2逐条结果汇总.py" "${OUTPUT_DIR}" -o "${OUTPUT_DIR}/汇总" -j 4
@@ -0,0 +1,12 @@
+#!/bin/bash
+# 比较每个样本的各组装方法（EToKi / SPAdes / 策略A / 策略B / 策略C），生成 methods_comparison.csv，
+# 并把每个样本排名第 1 的组装复制为 <样本>/BEST_assembly_contigs.fasta
+
+ASSEMBLE_DIR="/data_raid/7_luolintao/1_Baoman/1-Assemble"
+OUT_DIR="/data_raid/7_luolintao/1_Baoman/1-Assemble/all_methods_comparison"
+PYTHON_SCRIPT="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/1-组装/python/3-组装方法比较.py"
+
+python3 "$PYTHON_SCRIPT" \
+    "$ASSEMBLE_DIR" \
+    -o "$OUT_DIR" \
+    -j 8
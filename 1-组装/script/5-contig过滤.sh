@@ -0,0 +1,14 @@
+#!/bin/bash
+# 按长度和覆盖度过滤每个样本的 SPAdes 组装（相当于组装后再做一次策略B 的 --cov-cutoff），
+# 结果写到 <样本>_Assembly/coverage_filtered/contigs.fasta，再运行 4-组装方法比较.sh 即参与比较
+# 覆盖度阈值按每个样本的覆盖度众数 × 0.3 自动确定
+
+ASSEMBLE_DIR="/data_raid/7_luolintao/1_Baoman/1-Assemble"
+PYTHON_SCRIPT="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/1-组装/python/4-contig过滤.py"
+
+python3 "$PYTHON_SCRIPT" \
+    -d "$ASSEMBLE_DIR" \
+    --auto-cov \
+    --cov-fraction 0.3 \
+    --min-length 500 \
+    -j 8
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fastANI 结果整理：解析 OUT.TXT、按文件内容哈希缓存两两结果、组装队列 ANI 矩阵
+
+fastANI 输出（无表头，制表符分隔）：
+  query  reference  ANI  比对上的片段数  query总片段数
+
+子命令：
+  ingest  解析一个或多个 fastANI 输出（可以是分片运行的结果），写入缓存，
+          并可输出本次结果的带类型表（--pairs）
+  plan    根据基因组列表（list.txt）检查缓存，只为尚未计算的组合生成 fastANI 分片
+          （每个分片一对 --ql / --rl 列表文件），重复运行时只计算新组合
+  matrix  从缓存组装 all-vs-all ANI 矩阵（双向取平均）及以样本名为键的两两结果长表，
+          并按 95% 物种阈值标记样本；MinHash 预筛跳过的组合可用 --mash 以 Mash 估计值补齐
+
+缓存以基因组 FASTA 的 sha256 为键，文件改名或移动不会导致重算；
+文件哈希本身按 (路径, 大小, mtime) 缓存，避免每次重新读取 4Mb 级别的组装文件。
+
+用法示例：
+  python3 2-ANI结果整理.py ingest --cache-dir cache --run data/GCF_008632635.1.fasta conf/list.txt output/OUT.TXT
+  python3 2-ANI结果整理.py plan --cache-dir cache --genomes conf/list.txt --shards 8 --out-dir shards
+  python3 2-ANI结果整理.py matrix --cache-dir cache --genomes conf/list.txt \\
+      --reference data/GCF_008632635.1.fasta -o output/ANI_matrix.csv
+"""
+
+import os
+import sys
+import csv
+import hashlib
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 一般认为 ANI >= 95% 为同一物种
+SPECIES_ANI = 95.0
+
+FASTANI_COLUMNS = ['query', 'reference', 'ani', 'fragments_mapped', 'fragments_total']
+CACHE_COLUMNS = ['query_hash', 'reference_hash', 'ani', 'fragments_mapped', 'fragments_total']
+HASH_INDEX_COLUMNS = ['path', 'size', 'mtime_ns', 'sha256']
+
+FASTA_SUFFIXES = ('.fasta', '.fa', '.fna', '.fas')
+
+
+def sample_name(path):
+    """由基因组路径得到样本名：ERR1946991.fasta -> ERR1946991"""
+    name = Path(path).name
+    for ext in FASTA_SUFFIXES:
+        if name.endswith(ext):
+            return name[: -len(ext)]
+    return Path(path).stem
+
+
+def read_genome_list(list_file):
+    """读取 fastANI 的 --ql/--rl 列表文件（每行一个路径）；直接给出 FASTA 时视为单个基因组"""
+    if str(list_file).endswith(FASTA_SUFFIXES):
+        return [str(list_file)]
+    with open(list_file) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+# ============ 文件哈希缓存 ============
+
+class HashIndex:
+    """按 (路径, 大小, mtime) 缓存文件 sha256，路径未变化时不重新读取文件"""
+
+    def __init__(self, cache_dir):
+        self.path = Path(cache_dir) / 'file_hashes.tsv'
+        self.entries = {}
+        self.dirty = False
+        if self.path.exists():
+            with open(self.path, newline='') as f:
+                for row in csv.DictReader(f, delimiter='\t'):
+                    self.entries[row['path']] = (int(row['size']), int(row['mtime_ns']), row['sha256'])
+
+    def sha256(self, file_path):
+        file_path = str(Path(file_path).resolve())
+        st = os.stat(file_path)
+        cached = self.entries.get(file_path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+
+        h = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.entries[file_path] = (st.st_size, st.st_mtime_ns, digest)
+        self.dirty = True
+        return digest
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter='\t')
+            writer.writerow(HASH_INDEX_COLUMNS)
+            for p, (size, mtime_ns, digest) in self.entries.items():
+                writer.writerow([p, size, mtime_ns, digest])
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+# ============ ANI 结果缓存 ============
+
+def load_ani_cache(cache_dir):
+    """读取两两 ANI 缓存；键为 (query_hash, reference_hash)"""
+    cache_file = Path(cache_dir) / 'ani_cache.tsv'
+    if not cache_file.exists():
+        return pd.DataFrame({
+            'query_hash': pd.Series(dtype=str), 'reference_hash': pd.Series(dtype=str),
+            'ani': pd.Series(dtype='float64'),
+            'fragments_mapped': pd.Series(dtype='int64'), 'fragments_total': pd.Series(dtype='int64'),
+        })
+    return pd.read_csv(cache_file, sep='\t',
+                       dtype={'query_hash': str, 'reference_hash': str, 'ani': 'float64',
+                              'fragments_mapped': 'int64', 'fragments_total': 'int64'})
+
+
+def save_ani_cache(cache_dir, cache):
+    cache_file = Path(cache_dir) / 'ani_cache.tsv'
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_suffix('.tmp')
+    cache.to_csv(tmp, sep='\t', index=False)
+    os.replace(tmp, cache_file)
+
+
+def load_done_pairs(cache_dir):
+    """
+    读取已经跑过的组合（包括 fastANI 因 ANI 过低未输出结果的组合）
+
+    fastANI 对 ANI < ~80% 的组合不输出任何行，只记录 ANI 结果会导致这些组合每次都被重算
+    """
+    done_file = Path(cache_dir) / 'done_pairs.tsv'
+    if not done_file.exists():
+        return set()
+    with open(done_file) as f:
+        next(f, None)
+        return {tuple(line.rstrip('\n').split('\t')[:2]) for line in f if line.strip()}
+
+
+def append_done_pairs(cache_dir, pairs):
+    done_file = Path(cache_dir) / 'done_pairs.tsv'
+    done_file.parent.mkdir(parents=True, exist_ok=True)
+    new_file = not done_file.exists()
+    with open(done_file, 'a') as f:
+        if new_file:
+            f.write('query_hash\treference_hash\n')
+        for q, r in pairs:
+            f.write(f"{q}\t{r}\n")
+
+
+def parse_fastani_output(out_file):
+    """解析 fastANI 输出为带类型的 DataFrame"""
+    df = pd.read_csv(out_file, sep='\t', header=None, names=FASTANI_COLUMNS,
+                     dtype={'query': str, 'reference': str, 'ani': 'float64',
+                            'fragments_mapped': 'int64', 'fragments_total': 'int64'})
+    df['query_sample'] = df['query'].map(sample_name)
+    df['reference_sample'] = df['reference'].map(sample_name)
+    df['aligned_fraction'] = (df['fragments_mapped'] / df['fragments_total']).round(4)
+    return df
+
+
+def ingest(out_files, cache_dir, pairs_tsv=None, shard_lists=None):
+    """
+    解析 fastANI 输出并写入缓存
+
+    shard_lists: 可选的 (ql, rl) 列表文件对（也可以直接是 FASTA），
+                 用于把“跑过但没有输出”的组合也记为已完成；只能传入 fastANI 正常退出的分片，
+                 否则失败分片的组合会被当作已完成，以后不再重算
+    """
+    hashes = HashIndex(cache_dir)
+    cache = load_ani_cache(cache_dir)
+
+    frames = []
+    for out_file in out_files:
+        if not os.path.isfile(out_file) or os.path.getsize(out_file) == 0:
+            print(f"[WARN] 跳过空文件或不存在的文件：{out_file}", file=sys.stderr)
+            continue
+        df = parse_fastani_output(out_file)
+        print(f"[INFO] {out_file}: {len(df)} 条结果")
+        frames.append(df)
+
+    results = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FASTANI_COLUMNS)
+
+    if len(results):
+        results['query_hash'] = results['query'].map(hashes.sha256)
+        results['reference_hash'] = results['reference'].map(hashes.sha256)
+        cache = pd.concat([cache, results[CACHE_COLUMNS]], ignore_index=True)
+        cache = cache.drop_duplicates(['query_hash', 'reference_hash'], keep='last')
+        save_ani_cache(cache_dir, cache)
+
+    done = set(zip(results['query_hash'], results['reference_hash'])) if len(results) else set()
+    for ql, rl in shard_lists or []:
+        q_hashes = [hashes.sha256(p) for p in read_genome_list(ql)]
+        r_hashes = [hashes.sha256(p) for p in read_genome_list(rl)]
+        done.update((q, r) for q in q_hashes for r in r_hashes)
+    done -= load_done_pairs(cache_dir)
+    append_done_pairs(cache_dir, sorted(done))
+    hashes.save()
+
+    if pairs_tsv and len(results):
+        columns = ['query_sample', 'reference_sample', 'ani', 'fragments_mapped',
+                   'fragments_total', 'aligned_fraction', 'query', 'reference']
+        results[columns].sort_values(['reference_sample', 'query_sample']).to_csv(
+            pairs_tsv, sep='\t', index=False)
+        print(f"[INFO] 结果表已保存：{pairs_tsv}")
+
+    print(f"[INFO] 缓存中共有 {len(cache)} 个组合的 ANI 结果")
+    return results
+
+
+# ============ 增量分片 ============
+
+def plan(genomes, references, cache_dir, out_dir, shards, allowed_pairs=None):
+    """
+    只为缓存中没有的 (query, reference) 组合生成 fastANI 分片
+
+    allowed_pairs: 可选的 (query路径, reference路径) 集合（如 3-MinHash预筛.py 的不确定组合），
+                   给出时只计算这些组合
+
+    按“需要比对的参考集合”把 query 分组（通常只有两组：旧基因组只需比对新基因组，
+    新基因组需要比对全部），每组再按 query 均分为若干分片，避免 many-to-many 重算旧组合；
+    组数多于 shards 时合并相邻的组，分片总数不超过 shards。
+    返回分片列表 [(ql_file, rl_file), ...]
+    """
+    hashes = HashIndex(cache_dir)
+    done = load_done_pairs(cache_dir)
+
+    ref_hash = {r: hashes.sha256(r) for r in references}
+    groups = {}
+    for q in genomes:
+        qh = hashes.sha256(q)
+        # 自身比对不排除：这样首次 all-vs-all 时所有 query 的待比对集合相同，只形成一组
+        pending = tuple(r for r in references if (qh, ref_hash[r]) not in done
+                        and (allowed_pairs is None or (q, r) in allowed_pairs))
+        if pending:
+            groups.setdefault(pending, []).append(q)
+    hashes.save()
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob('shard_*'):
+        old.unlink()
+
+    n_pairs = sum(len(refs) * len(qs) for refs, qs in groups.items())
+    shards = max(1, shards)
+    if len(groups) <= shards:
+        # 每组至少 1 个分片，其余分片按组内组合数占比分配（最大余数法）；同组的分片共用一个参考列表
+        quota = [(shards - len(groups)) * len(refs) * len(qs) / max(n_pairs, 1) for refs, qs in groups.items()]
+        counts = [1 + int(x) for x in quota]
+        for i in sorted(range(len(quota)), key=lambda i: int(quota[i]) - quota[i])[:shards - sum(counts)]:
+            counts[i] += 1
+        batches = []
+        for n, (refs, queries) in zip(counts, groups.items()):
+            n = min(len(queries), n)
+            batches.extend((refs, list(chunk)) for chunk in np.array_split(np.array(queries, dtype=object), n)
+                           if len(chunk))
+    else:
+        # 组数多于分片数（如 --pairs 限定组合时几乎每个 query 自成一组）：
+        # 按参考集合排序后把 query 顺序切成 shards 段，每段待比对组合数大致相同，
+        # 参考列表取段内各 query 待比对参考的并集（会多算少量组合，一并记入缓存）
+        ordered = sorted(groups.items())
+        queries = [q for _, qs in ordered for q in qs]
+        pending = [refs for refs, qs in ordered for _ in qs]
+        weight = np.cumsum([len(refs) for refs in pending])
+        cuts = np.searchsorted(weight, weight[-1] * np.arange(1, shards) / shards, side='right')
+        batches = []
+        for idx in np.split(np.arange(len(queries)), np.unique(cuts)):
+            if len(idx) == 0:
+                continue
+            union = set().union(*(pending[i] for i in idx))
+            batches.append((tuple(r for r in references if r in union), [queries[i] for i in idx]))
+
+    shard_files = []
+    rl_files = {}
+    for i, (refs, chunk) in enumerate(batches):
+        rl = rl_files.get(refs)
+        if rl is None:
+            rl = rl_files[refs] = out_dir / f"shard_{len(rl_files):03d}.rl.txt"
+            rl.write_text('\n'.join(refs) + '\n')
+        ql = out_dir / f"shard_{i:03d}.ql.txt"
+        ql.write_text('\n'.join(chunk) + '\n')
+        shard_files.append((ql, rl))
+    n_run = sum(len(refs) * len(chunk) for refs, chunk in batches)
+
+    with open(out_dir / 'shards.tsv', 'w') as f:
+        for ql, rl in shard_files:
+            f.write(f"{ql}\t{rl}\n")
+
+    print(f"[INFO] 待计算组合：{n_pairs}（实际比对 {n_run}），分片数：{len(shard_files)} -> {out_dir / 'shards.tsv'}")
+    return shard_files
+
+
+# ============ ANI 矩阵 ============
+
+def build_matrix(genomes, cache_dir, output_csv, reference=None, species_ani=SPECIES_ANI, mash_matrix=None):
+    """
+    从缓存组装 ANI 矩阵
+
+    fastANI 结果不对称，矩阵取两个方向的平均值；只有一个方向时直接使用该值；
+    没有结果（fastANI 不输出 ANI < ~80% 的组合）留空。对角线为 100。
+    mash_matrix: 3-MinHash预筛.py 输出的 <前缀>_ani_matrix.csv；给出时用 Mash 估计值补齐
+                 没有 fastANI 结果的组合（预筛判定为明确同种 / 不同种而未交给 fastANI 的组合）
+    """
+    hashes = HashIndex(cache_dir)
+    cache = load_ani_cache(cache_dir)
+
+    names = [sample_name(g) for g in genomes]
+    hash_of = [hashes.sha256(g) for g in genomes]
+    hashes.save()
+    index = {h: i for i, h in enumerate(hash_of)}
+
+    n = len(genomes)
+    total = np.zeros((n, n), dtype=np.float64)
+    count = np.zeros((n, n), dtype=np.int32)
+
+    qi = cache['query_hash'].map(index)
+    ri = cache['reference_hash'].map(index)
+    keep = qi.notna() & ri.notna()
+    qi = qi[keep].astype(np.int64).to_numpy()
+    ri = ri[keep].astype(np.int64).to_numpy()
+    ani = cache.loc[keep, 'ani'].to_numpy()
+    # 两个方向都累加到同一对称位置
+    np.add.at(total, (qi, ri), ani)
+    np.add.at(total, (ri, qi), ani)
+    np.add.at(count, (qi, ri), 1)
+    np.add.at(count, (ri, qi), 1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        matrix = np.where(count > 0, total / count, np.nan)
+    estimated = np.zeros((n, n), dtype=bool)
+    if mash_matrix:
+        mash = pd.read_csv(mash_matrix, index_col=0)
+        mash = mash.loc[~mash.index.duplicated()].reindex(index=names, columns=names).to_numpy(dtype=np.float64)
+        estimated = np.isnan(matrix) & ~np.isnan(mash)
+        matrix[estimated] = mash[estimated]
+        print(f"[INFO] 用 Mash 估计值补齐 {int(np.triu(estimated, 1).sum())} 个组合（{mash_matrix}）")
+    np.fill_diagonal(matrix, 100.0)
+    np.fill_diagonal(estimated, False)
+
+    df = pd.DataFrame(np.round(matrix, 4), index=names, columns=names)
+    df.to_csv(output_csv, float_format='%.4f')
+    print(f"[INFO] ANI 矩阵已保存：{output_csv} ({n} × {n}，缺失 {int(np.isnan(matrix).sum())} 个组合)")
+
+    # 以样本名为键的长表（保留 fastANI 原始方向）
+    pairs = cache.loc[keep, ['ani', 'fragments_mapped', 'fragments_total']].copy()
+    pairs.insert(0, 'query_sample', [names[i] for i in qi])
+    pairs.insert(1, 'reference_sample', [names[i] for i in ri])
+    pairs['aligned_fraction'] = (pairs['fragments_mapped'] / pairs['fragments_total']).round(4)
+    pairs_file = Path(output_csv).with_name(Path(output_csv).stem + '_pairs.tsv')
+    pairs.sort_values(['reference_sample', 'query_sample']).to_csv(pairs_file, sep='\t', index=False)
+    print(f"[INFO] 两两结果表已保存：{pairs_file}")
+
+    if reference:
+        ref_name = sample_name(reference)
+        if ref_name not in df.columns:
+            print(f"[WARN] 参考基因组 {ref_name} 不在基因组列表中，跳过物种判定", file=sys.stderr)
+            return df
+        ref_col = names.index(ref_name)
+        screen = pd.DataFrame({
+            'sample': names,
+            'ani_to_reference': df[ref_name].values,
+            'source': np.where(estimated[:, ref_col], 'mash', 'fastANI'),
+        })
+        screen = screen.loc[screen['sample'] != ref_name]
+        # 没有结果的样本 same_species 留空，单独列出，不算作不同物种
+        missing = screen['ani_to_reference'].isna()
+        screen.loc[missing, 'source'] = ''
+        screen['same_species'] = (screen['ani_to_reference'] >= species_ani).astype('boolean').mask(missing)
+        screen_file = Path(output_csv).with_name(Path(output_csv).stem + '_species_screen.tsv')
+        screen.to_csv(screen_file, sep='\t', index=False, float_format='%.4f')
+        flagged = screen.loc[screen['ani_to_reference'] < species_ani, 'sample'].tolist()
+        print(f"[INFO] 物种筛查结果：{screen_file}")
+        if flagged:
+            print(f"[WARN] ANI < {species_ani}% 的样本（{len(flagged)} 个）：{', '.join(flagged)}")
+        if missing.any():
+            print(f"[WARN] 没有 ANI 结果的样本（{int(missing.sum())} 个）：{', '.join(screen.loc[missing, 'sample'])}")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fastANI 结果整理、缓存与 ANI 矩阵")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_ingest = sub.add_parser('ingest', help='解析 fastANI 输出并写入缓存')
+    p_ingest.add_argument('outputs', nargs='+', help='fastANI 输出文件（可多个分片）')
+    p_ingest.add_argument('--cache-dir', required=True, help='缓存目录')
+    p_ingest.add_argument('--pairs', help='输出带类型的结果表（TSV）')
+    p_ingest.add_argument('--shards', help='plan 生成的 shards.tsv，用于记录无输出的组合（要求全部分片都已成功）')
+    p_ingest.add_argument('--run', nargs=2, action='append', metavar=('QL', 'RL'),
+                          help='成功运行的 query/reference 列表（或 FASTA），可重复；作用同 --shards，只记录这些分片')
+
+    p_plan = sub.add_parser('plan', help='为未缓存的组合生成 fastANI 分片')
+    p_plan.add_argument('--cache-dir', required=True, help='缓存目录')
+    p_plan.add_argument('--genomes', required=True, help='基因组列表（作为 query）')
+    p_plan.add_argument('--references', help='参考列表（默认与 --genomes 相同，即 all-vs-all）')
+    p_plan.add_argument('--shards', type=int, default=1, help='分片数（默认 1）')
+    p_plan.add_argument('--out-dir', required=True, help='分片列表输出目录')
+    p_plan.add_argument('--pairs', help='只计算此表中的组合（TSV，含 query / reference 列，如 MinHash 预筛结果）')
+
+    p_matrix = sub.add_parser('matrix', help='从缓存组装 ANI 矩阵')
+    p_matrix.add_argument('--cache-dir', required=True, help='缓存目录')
+    p_matrix.add_argument('--genomes', required=True, help='基因组列表')
+    p_matrix.add_argument('--reference', help='物种判定用的参考基因组（会自动加入矩阵）')
+    p_matrix.add_argument('--species-ani', type=float, default=SPECIES_ANI,
+                          help=f'物种阈值（默认：{SPECIES_ANI}）')
+    p_matrix.add_argument('--mash', help='3-MinHash预筛.py 的 <前缀>_ani_matrix.csv，用于补齐预筛跳过的组合')
+    p_matrix.add_argument('-o', '--output', required=True, help='输出 CSV')
+
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        shard_lists = []
+        if args.shards:
+            with open(args.shards) as f:
+                shard_lists = [tuple(line.rstrip('\n').split('\t')) for line in f if line.strip()]
+        shard_lists += [tuple(r) for r in args.run or []]
+        ingest(args.outputs, args.cache_dir, args.pairs, shard_lists)
+    elif args.command == 'plan':
+        genomes = read_genome_list(args.genomes)
+        references = read_genome_list(args.references) if args.references else genomes
+        allowed_pairs = None
+        if args.pairs:
+            allowed = pd.read_csv(args.pairs, sep='\t', dtype=str)
+            allowed_pairs = set(zip(allowed['query'], allowed['reference']))
+            print(f"[INFO] 限定组合数：{len(allowed_pairs)}（{args.pairs}）")
+        plan(genomes, references, args.cache_dir, args.out_dir, args.shards, allowed_pairs)
+    else:
+        genomes = read_genome_list(args.genomes)
+        if args.reference and args.reference not in genomes:
+            genomes = [args.reference] + genomes
+        build_matrix(genomes, args.cache_dir, args.output, args.reference, args.species_ani, args.mash)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MinHash 预筛：在调用 fastANI 之前，用 bottom-k MinHash 草图快速估计所有组合的 Mash 距离
+
+fastANI 做 many-vs-many 比较代价很高，而真正需要精确 ANI 的只是 95% 物种阈值附近的组合。
+本脚本：
+  1. 对每个组装做 NumPy 向量化的 k-mer 编码（2-bit，取正反链较小者为规范 k-mer），
+     用 splitmix64 混合得到 64 位哈希，保留最小的 s 个作为草图
+  2. 草图按组装保存到 sketch_dir/<样本>.<路径哈希>.sketch.npz（不同目录下的同名组装各有一份），
+     文件大小和 mtime 未变时直接复用
+  3. 对 list.txt 中全部组合计算 Mash 距离 D = -1/k * ln(2j / (1 + j))，
+     估计 ANI ≈ (1 - D) * 100
+  4. 只把估计 ANI 落在不确定区间（默认 93%-97%）内的组合写入 uncertain_pairs.tsv，
+     交给 2-ANI结果整理.py plan --pairs 生成 fastANI 分片
+
+用法：
+  python3 3-MinHash预筛.py --genomes conf/list.txt --sketch-dir output/sketches -o output/mash -j 8
+"""
+
+import os
+import sys
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Mash 默认参数
+KMER_SIZE = 21
+SKETCH_SIZE = 1000
+
+# 不确定区间：估计 ANI 落在此区间内的组合才交给 fastANI
+BAND_LOW = 93.0
+BAND_HIGH = 97.0
+
+FASTA_SUFFIXES = ('.fasta', '.fa', '.fna', '.fas')
+EMPTY_HASH = np.iinfo(np.uint64).max
+
+# A/C/G/T -> 0/1/2/3，其余碱基（N 等）记为 4
+BASE_CODE = np.full(256, 4, dtype=np.uint8)
+for _i, _b in enumerate(b'ACGT'):
+    BASE_CODE[_b] = _i
+    BASE_CODE[ord(chr(_b).lower())] = _i
+
+
+def sample_name(path):
+    """由基因组路径得到样本名：ERR1946991.fasta -> ERR1946991"""
+    name = Path(path).name
+    for ext in FASTA_SUFFIXES:
+        if name.endswith(ext):
+            return name[: -len(ext)]
+    return Path(path).stem
+
+
+def read_contigs(fasta_path):
+    """一次性读入 FASTA，按 contig 返回碱基编码数组（uint8）"""
+    with open(fasta_path, 'rb') as f:
+        data = f.read()
+    for record in data.split(b'>')[1:]:
+        newline = record.find(b'\n')
+        if newline < 0:
+            continue
+        seq = record[newline + 1:].replace(b'\n', b'').replace(b'\r', b'')
+        if seq:
+            yield BASE_CODE[np.frombuffer(seq, dtype=np.uint8)]
+
+
+def splitmix64(x):
+    """64 位整数混合函数（uint64 数组运算自动按 2^64 取模）"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def contig_kmer_hashes(codes, k):
+    """
+    计算一条 contig 上全部规范 k-mer 的哈希
+
+    正链 k-mer 按位移逐位累加（k 次整段向量运算，而不是逐个 k-mer 循环），
+    反向互补同理；含非 ACGT 碱基的窗口被剔除。
+    """
+    n = len(codes) - k + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64)
+
+    valid = codes < 4
+    c = np.where(valid, codes, 0).astype(np.uint64)
+    fwd = np.zeros(n, dtype=np.uint64)
+    rev = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        window = c[j:j + n]
+        fwd = (fwd << np.uint64(2)) | window
+        rev = rev | ((np.uint64(3) - window) << np.uint64(2 * j))
+
+    # 窗口内无效碱基计数为 0 才保留
+    bad = np.concatenate(([0], np.cumsum(~valid, dtype=np.int64)))
+    ok = (bad[k:] - bad[:-k]) == 0
+    canonical = np.minimum(fwd, rev)[ok]
+    return splitmix64(canonical)
+
+
+def sketch_genome(fasta_path, k=KMER_SIZE, s=SKETCH_SIZE):
+    """计算一个组装的 bottom-s MinHash 草图（升序 uint64 数组）"""
+    bottom = np.empty(0, dtype=np.uint64)
+    for codes in read_contigs(fasta_path):
+        h = contig_kmer_hashes(codes, k)
+        if len(h) == 0:
+            continue
+        # 每条 contig 先各自截取最小的 s 个，再与已有草图合并，内存只随最长 contig 增长
+        if len(h) > s:
+            h = np.partition(h, s)[:s]
+        bottom = np.unique(np.concatenate((bottom, h)))[:s]
+    return bottom
+
+
+def sketch_path(fasta_path, sketch_dir):
+    """草图文件路径；文件名带上组装绝对路径的哈希，避免不同目录下的同名组装互相覆盖"""
+    key = hashlib.sha1(str(Path(fasta_path).resolve()).encode()).hexdigest()[:16]
+    return Path(sketch_dir) / f"{sample_name(fasta_path)}.{key}.sketch.npz"
+
+
+def load_or_sketch(fasta_path, sketch_dir, k, s):
+    """读取已保存的草图；组装文件或参数有变化时重新计算"""
+    st = os.stat(fasta_path)
+    sketch_file = sketch_path(fasta_path, sketch_dir)
+    if sketch_file.exists():
+        saved = np.load(sketch_file)
+        if (int(saved['k']) == k and int(saved['s']) == s
+                and int(saved['size']) == st.st_size and int(saved['mtime_ns']) == st.st_mtime_ns):
+            return saved['hashes'], False
+
+    hashes = sketch_genome(fasta_path, k, s)
+    tmp = sketch_file.with_name(sketch_file.name + '.tmp.npz')
+    np.savez_compressed(tmp, hashes=hashes, k=k, s=s, size=st.st_size, mtime_ns=st.st_mtime_ns)
+    os.replace(tmp, sketch_file)
+    return hashes, True
+
+
+def _sketch_worker(job):
+    fasta_path, sketch_dir, k, s = job
+    return load_or_sketch(fasta_path, sketch_dir, k, s)
+
+
+def stack_sketches(sketches, s):
+    """把草图堆成 N × s 矩阵，不足 s 个哈希的用最大值填充"""
+    matrix = np.full((len(sketches), s), EMPTY_HASH, dtype=np.uint64)
+    lengths = np.zeros(len(sketches), dtype=np.int64)
+    for i, h in enumerate(sketches):
+        matrix[i, :len(h)] = h
+        lengths[i] = len(h)
+    return matrix, lengths
+
+
+def jaccard_row(a, matrix, lengths, s):
+    """
+    计算第 a 个草图与所有草图的 bottom-k Jaccard 估计（Mash 的估计方式）
+
+    对 b 中的每个哈希 h = H[b][j]：
+      h 在 a 中           <=> H[a][searchsorted(H[a], h)] == h
+      h 在并集中的秩      = (j + 1) + #{a 中 <= h} - #{共有且 <= h}
+    并集前 s 个里的共有哈希数 / min(s, |并集|) 即为 Jaccard 估计，全程是 N × s 的数组运算。
+    """
+    ha = matrix[a, :lengths[a]]
+    if len(ha) == 0:
+        return np.zeros(len(matrix))
+    pos = np.searchsorted(ha, matrix)
+    shared = (ha[np.minimum(pos, len(ha) - 1)] == matrix) & (matrix != EMPTY_HASH)
+    shared_cum = np.cumsum(shared, axis=1)
+    rank = np.arange(1, s + 1)[None, :] + (pos + shared) - shared_cum
+
+    union = lengths[a] + lengths - shared_cum[:, -1]
+    denom = np.minimum(s, union)
+    shared_in_bottom = (shared & (rank <= denom[:, None])).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denom > 0, shared_in_bottom / denom, 0.0)
+
+
+def _jaccard_worker(job):
+    rows, matrix, lengths, s = job
+    return rows, np.vstack([jaccard_row(a, matrix, lengths, s) for a in rows])
+
+
+def mash_distance(j, k):
+    """Mash 距离 D = -1/k * ln(2j / (1 + j))；j = 0 时记为 1"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d = -np.log(2 * j / (1 + j)) / k
+    return np.where(j > 0, np.clip(d, 0.0, 1.0), 1.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MinHash 预筛：估计 Mash 距离，只把阈值附近的组合交给 fastANI")
+    parser.add_argument('--genomes', required=True, help='基因组列表（list.txt，每行一个路径）')
+    parser.add_argument('--sketch-dir', required=True, help='草图保存目录')
+    parser.add_argument('-o', '--out-prefix', required=True, help='输出前缀，如 output/mash')
+    parser.add_argument('-k', '--kmer', type=int, default=KMER_SIZE, help=f'k-mer 长度（默认：{KMER_SIZE}，最大 32）')
+    parser.add_argument('-s', '--sketch-size', type=int, default=SKETCH_SIZE, help=f'草图大小（默认：{SKETCH_SIZE}）')
+    parser.add_argument('--band', type=float, nargs=2, default=(BAND_LOW, BAND_HIGH), metavar=('LOW', 'HIGH'),
+                        help=f'不确定区间（估计 ANI，默认：{BAND_LOW} {BAND_HIGH}）')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='并发进程数，0 表示使用 CPU 核心数')
+    args = parser.parse_args()
+
+    if not 1 <= args.kmer <= 32:
+        print("错误：k-mer 长度必须在 1-32 之间（2-bit 编码存入 uint64）")
+        sys.exit(1)
+
+    with open(args.genomes) as f:
+        genomes = [line.strip() for line in f if line.strip()]
+    missing = [g for g in genomes if not os.path.isfile(g)]
+    if missing:
+        print(f"错误：以下基因组文件不存在：{', '.join(missing)}")
+        sys.exit(1)
+
+    names = [sample_name(g) for g in genomes]
+    k, s = args.kmer, args.sketch_size
+    Path(args.sketch_dir).mkdir(parents=True, exist_ok=True)
+    Path(args.out_prefix).parent.mkdir(parents=True, exist_ok=True)
+    max_workers = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    # 1) 草图
+    with ProcessPoolExecutor(max_workers=max_workers) as exe:
+        results = list(exe.map(_sketch_worker, [(g, args.sketch_dir, k, s) for g in genomes]))
+    sketches = [h for h, _ in results]
+    n_new = sum(1 for _, new in results if new)
+    print(f"[INFO] 草图：{len(genomes)} 个（新计算 {n_new} 个，复用 {len(genomes) - n_new} 个）")
+
+    # 2) 全部组合的 Jaccard / Mash 距离
+    matrix, lengths = stack_sketches(sketches, s)
+    n = len(genomes)
+    jaccard = np.zeros((n, n))
+    row_chunks = [list(c) for c in np.array_split(np.arange(n), min(n, max_workers * 4)) if len(c)]
+    with ProcessPoolExecutor(max_workers=max_workers) as exe:
+        for rows, block in exe.map(_jaccard_worker, [(c, matrix, lengths, s) for c in row_chunks]):
+            jaccard[rows] = block
+    ani = (1.0 - mash_distance(jaccard, k)) * 100.0
+    np.fill_diagonal(ani, 100.0)
+
+    matrix_file = f"{args.out_prefix}_ani_matrix.csv"
+    pd.DataFrame(np.round(ani, 4), index=names, columns=names).to_csv(matrix_file)
+    print(f"[INFO] Mash 估计 ANI 矩阵：{matrix_file}")
+
+    # 3) 不确定区间内的组合（只取上三角）
+    low, high = args.band
+    iu, ju = np.triu_indices(n, k=1)
+    est = ani[iu, ju]
+    in_band = (est >= low) & (est <= high)
+    pairs = pd.DataFrame({
+        'query': [genomes[i] for i in iu[in_band]],
+        'reference': [genomes[j] for j in ju[in_band]],
+        'query_sample': [names[i] for i in iu[in_band]],
+        'reference_sample': [names[j] for j in ju[in_band]],
+        'mash_ani': np.round(est[in_band], 4),
+    })
+    pairs_file = f"{args.out_prefix}_uncertain_pairs.tsv"
+    pairs.to_csv(pairs_file, sep='\t', index=False)
+
+    total = len(est)
+    print(f"[INFO] 组合总数：{total}")
+    print(f"  估计 ANI > {high}%（同一物种）：{int((est > high).sum())}")
+    print(f"  估计 ANI < {low}%（不同物种）：{int((est < low).sum())}")
+    print(f"  不确定区间 [{low}%, {high}%]：{int(in_band.sum())} -> {pairs_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,13 +10,30 @@
 # 注意事项：
 # - 需要预先安装fastANI工具。
 # - 路径需根据实际环境进行调整。
-# - 输出文件将包含每个样本与参考基因组的ANI结果。
+# - 输出文件（OUT.TXT）只包含本次新计算的组合；全部结果（含以前运行的）见缓存和 ANI 矩阵。
+# - 结果按基因组文件内容哈希缓存在 output/cache/，重复运行时只计算新的组合；
+#   MODE=all 时对 list.txt 中的全部基因组做 all-vs-all，按 SHARDS 分片运行 fastANI。
+# - 只有 fastANI 正常退出的分片才写入缓存；有分片失败时写入成功的分片后以非零状态退出，
+#   重新运行时只计算失败分片中的组合。
+# - MODE=all 且 PRESCREEN=1 时先用 MinHash 草图估计全部组合的 ANI，
+#   只有估计值落在 93%-97% 不确定区间内的组合才交给 fastANI，其余组合在 ANI 矩阵中用 Mash 估计值补齐。
 #todo 设置目录和文件路径
 SCRIPT_BASE_DIR="/home/luolintao/0_Github/13-A.baumannii/3-fastANI/"
 ASSEMBLE_DIR="/home/luolintao/5-AB-Baoman/1-Assemble/" #? 组装目录
 LIST_TXT="${SCRIPT_BASE_DIR}conf/list.txt" #? fasta列表文件
 OUTPUT_TXT="${SCRIPT_BASE_DIR}output/OUT.TXT" #? 输出结果文件
 REF_FASTA="${SCRIPT_BASE_DIR}data/GCF_008632635.1.fasta" #? 参考基因组fasta文件
+PYTHON_SCRIPT="${SCRIPT_BASE_DIR}python/2-ANI结果整理.py"
+CACHE_DIR="${SCRIPT_BASE_DIR}output/cache" #? ANI缓存目录
+SHARD_DIR="${SCRIPT_BASE_DIR}output/shards" #? fastANI分片列表目录
+MATRIX_CSV="${SCRIPT_BASE_DIR}output/ANI_matrix.csv" #? ANI矩阵
+MODE="${MODE:-reference}" #? reference: 参考基因组 vs 全部样本；all: 全部样本 all-vs-all
+SHARDS="${SHARDS:-1}" #? 分片数
+PRESCREEN="${PRESCREEN:-0}" #? 1: all-vs-all 前先做 MinHash 预筛
+SKETCH_DIR="${SCRIPT_BASE_DIR}output/sketches" #? MinHash 草图目录
+THREADS="${THREADS:-16}"
+
+set -e
 
 cd ${ASSEMBLE_DIR}
 
@@ -25,13 +42,78 @@ echo "[1. 查找fasta文件...]"
 
 find $(pwd) -maxdepth 2 -type f -name "*fasta" > ${LIST_TXT}
 
-echo "[2. 计算ANI...]"
+echo "[2. 检查缓存，生成待计算的分片...]"
+
+PLAN_ARGS=()
+MATRIX_ARGS=()
+if [[ "${MODE}" == "all" ]]; then
+    QUERIES="${LIST_TXT}"
+    if [[ "${PRESCREEN}" == "1" ]]; then
+        echo "[2.1 MinHash 预筛...]"
+        python3 "${SCRIPT_BASE_DIR}python/3-MinHash预筛.py" \
+            --genomes "${LIST_TXT}" \
+            --sketch-dir "${SKETCH_DIR}" \
+            -o "${SCRIPT_BASE_DIR}output/mash" \
+            -j "${THREADS}"
+        PLAN_ARGS+=(--pairs "${SCRIPT_BASE_DIR}output/mash_uncertain_pairs.tsv")
+        MATRIX_ARGS+=(--mash "${SCRIPT_BASE_DIR}output/mash_ani_matrix.csv")
+    fi
+else
+    QUERIES="${REF_FASTA}"
+fi
+
+python3 "${PYTHON_SCRIPT}" plan \
+    --cache-dir "${CACHE_DIR}" \
+    --genomes "${QUERIES}" \
+    --references "${LIST_TXT}" \
+    --shards "${SHARDS}" \
+    --out-dir "${SHARD_DIR}" \
+    "${PLAN_ARGS[@]}"
+
+echo "[3. 计算ANI...]"
+
+: > "${OUTPUT_TXT}"
+RUN_ARGS=()
+FAILED=0
+while IFS=$'\t' read -r QL RL; do
+    SHARD_OUT="${QL%.ql.txt}.out"
+    # 先写临时文件，fastANI 正常退出后才改名，中断或失败的分片不会被当作已完成
+    if fastANI \
+        --threads "${THREADS}" \
+        --ql "${QL}" \
+        --rl "${RL}" \
+        -o "${SHARD_OUT}.tmp"; then
+        touch "${SHARD_OUT}.tmp"
+        mv -f "${SHARD_OUT}.tmp" "${SHARD_OUT}"
+        cat "${SHARD_OUT}" >> "${OUTPUT_TXT}"
+        RUN_ARGS+=(--run "${QL}" "${RL}")
+    else
+        echo "[失败] fastANI 分片 ${QL}"
+        rm -f "${SHARD_OUT}.tmp"
+        FAILED=$((FAILED + 1))
+    fi
+done < "${SHARD_DIR}/shards.tsv"
+
+echo "[4. 写入缓存并组装ANI矩阵...]"
+
+# 只有成功的分片通过 --run 记为已完成
+python3 "${PYTHON_SCRIPT}" ingest \
+    --cache-dir "${CACHE_DIR}" \
+    "${RUN_ARGS[@]}" \
+    "${OUTPUT_TXT}"
+
+if [[ "${FAILED}" -gt 0 ]]; then
+    echo "错误：${FAILED} 个 fastANI 分片失败，成功的结果已写入缓存，请重新运行"
+    exit 1
+fi
 
-fastANI \
-    --threads 16 \
-    -q ${REF_FASTA} \
-    --rl ${LIST_TXT} \
-    -o ${OUTPUT_TXT}
+python3 "${PYTHON_SCRIPT}" matrix \
+    --cache-dir "${CACHE_DIR}" \
+    --genomes "${LIST_TXT}" \
+    --reference "${REF_FASTA}" \
+    -o "${MATRIX_CSV}" \
+    "${MATRIX_ARGS[@]}"
 
-echo "[完成] 结果保存在 ${OUTPUT_TXT}"
+echo "[完成] 本次新计算的结果保存在 ${OUTPUT_TXT}"
+echo "[完成] ANI矩阵: ${MATRIX_CSV}"
 echo "[一般认为ANI值在95%以上表示两个基因组属于同一物种.]"
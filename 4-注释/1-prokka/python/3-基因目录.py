@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prokka 基因目录：一次扫描全部样本的 Prokka 输出，建立整个队列的基因索引（SQLite）
+
+后续的 Python 过滤脚本（剩余毒力因子、毒力/耐药结果注释等）不再各自遍历 注释prokka/<样本>/ 重新读取
+.gff / .ffn / .faa，而是按 locus_tag 直接查询：
+- genes 表：样本、locus_tag、类型、contig、起止位置、链、基因名、EC 号、产物，
+  以及该基因在 .ffn / .faa 中的字节偏移和长度（取序列时 seek 一次即可，不用解析整个文件）
+- samples 表：每个样本的文件路径和签名（大小 + 修改时间），重新构建时只处理新增或变化的样本，
+  目录中已不存在的样本会从目录中删除
+- 各样本的解析用 ProcessPoolExecutor 并行，写入在主进程中按样本分批提交
+
+用法:
+  python3 3-基因目录.py build /mnt/d/1-ABaumannii/注释prokka [-d gene_catalog.sqlite] [-j 8] [--force]
+  python3 3-基因目录.py get gene_catalog.sqlite ABCDEFGH_00001 [更多 ID ...] [--seq ffn|faa]
+  python3 3-基因目录.py stats gene_catalog.sqlite
+
+在其它脚本中使用（文件名带连字符和中文，按路径加载）：
+  with catalog_module.GeneCatalog(db) as cat:
+      cat.get('ABCDEFGH_00001')['product']
+      cat.sequence('ABCDEFGH_00001', 'faa')
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime
+from urllib.parse import unquote
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+CATALOG_NAME = 'gene_catalog.sqlite'
+SEQ_KINDS = ('ffn', 'faa')
+FEATURE_TYPES = {'CDS', 'tRNA', 'rRNA', 'tmRNA', 'misc_RNA', 'ncRNA'}
+SQL_CHUNK = 900   # SQLite 单条语句的参数个数上限为 999
+
+GENE_COLUMNS = ['locus_tag', 'sample', 'ftype', 'contig', 'start', 'end', 'strand', 'gene', 'ec', 'product',
+                'ffn_offset', 'ffn_length', 'faa_offset', 'faa_length']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    sample      TEXT PRIMARY KEY,
+    gff         TEXT,
+    ffn         TEXT,
+    faa         TEXT,
+    signature   TEXT,
+    n_genes     INTEGER,
+    indexed_at  TEXT
+);
+CREATE TABLE IF NOT EXISTS genes (
+    locus_tag   TEXT NOT NULL,
+    sample      TEXT NOT NULL,
+    ftype       TEXT,
+    contig      TEXT,
+    start       INTEGER,
+    "end"       INTEGER,
+    strand      TEXT,
+    gene        TEXT,
+    ec          TEXT,
+    product     TEXT,
+    ffn_offset  INTEGER,
+    ffn_length  INTEGER,
+    faa_offset  INTEGER,
+    faa_length  INTEGER,
+    PRIMARY KEY (locus_tag, sample)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS genes_sample ON genes (sample);
+"""
+
+
+# 共用的模块加载函数（8-流程调度/python/模块加载.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+
+profiling = load_module('8-流程调度/python/3-性能记录.py')
+
+
+# ---------------------------------------------------------------------------
+# 解析单个样本（在 worker 进程中运行）
+# ---------------------------------------------------------------------------
+
+def sample_files(sample_dir):
+    """注释prokka/<样本>/<样本>.{gff,ffn,faa}（与 2-prokka.sh 的 --prefix 一致）"""
+    sample = sample_dir.name
+    return {ext: sample_dir / f"{sample}.{ext}" for ext in ('gff', *SEQ_KINDS)}
+
+
+def signature(files):
+    parts = []
+    for ext in ('gff', *SEQ_KINDS):
+        path = files[ext]
+        st = path.stat() if path.exists() else None
+        parts.append(f"{st.st_size}:{st.st_mtime_ns}" if st else '-')
+    return '|'.join(parts)
+
+
+def index_fasta_offsets(path):
+    """{序列 ID: (记录起始字节, 记录字节数)}，记录从 '>' 开始到下一条记录之前"""
+    offsets = {}
+    if not path.exists():
+        return offsets
+    name, start, pos = None, 0, 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'>'):
+                if name is not None:
+                    offsets[name] = (start, pos - start)
+                name = line[1:].split(None, 1)[0].decode('utf-8') if len(line) > 2 else ''
+                start = pos
+            pos += len(line)
+    if name is not None:
+        offsets[name] = (start, pos - start)
+    return offsets
+
+
+def parse_gff_features(path):
+    """Prokka GFF3 中的基因特征（到 ##FASTA 为止）：[(locus_tag, 类型, contig, 起, 止, 链, 基因名, EC, 产物)]"""
+    features = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line.startswith('##FASTA'):
+                break
+            if line.startswith('#'):
+                continue
+            cols = line.rstrip('\n').split('\t')
+            if len(cols) != 9 or cols[2] not in FEATURE_TYPES:
+                continue
+            attrs = {}
+            for item in cols[8].split(';'):
+                if '=' in item:
+                    key, value = item.split('=', 1)
+                    attrs[key] = unquote(value)
+            locus_tag = attrs.get('locus_tag') or attrs.get('ID')
+            if not locus_tag:
+                continue
+            features.append((locus_tag, cols[2], cols[0], int(cols[3]), int(cols[4]), cols[6],
+                             attrs.get('gene', ''), attrs.get('eC_number', ''), attrs.get('product', '')))
+    return features
+
+
+def index_sample(sample_dir):
+    """解析一个样本，返回 (样本名, 文件路径, 签名, 基因行列表)"""
+    sample_dir = Path(sample_dir)
+    files = sample_files(sample_dir)
+    sig = signature(files)
+    offsets = {kind: index_fasta_offsets(files[kind]) for kind in SEQ_KINDS}
+    rows = []
+    for locus_tag, ftype, contig, start, end, strand, gene, ec, product in parse_gff_features(files['gff']):
+        ffn = offsets['ffn'].get(locus_tag, (None, None))
+        faa = offsets['faa'].get(locus_tag, (None, None))
+        rows.append((locus_tag, sample_dir.name, ftype, contig, start, end, strand, gene, ec, product,
+                     ffn[0], ffn[1], faa[0], faa[1]))
+    return sample_dir.name, {k: str(v) for k, v in files.items()}, sig, rows
+
+
+# ---------------------------------------------------------------------------
+# 构建
+# ---------------------------------------------------------------------------
+
+def connect(db_path):
+    conn = sqlite3.connect(str(db_path))
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def discover_sample_dirs(prokka_dir):
+    """含有 <样本>/<样本>.gff 的子目录"""
+    dirs = []
+    for entry in sorted(os.scandir(prokka_dir), key=lambda e: e.name):
+        if entry.is_dir() and os.path.isfile(os.path.join(entry.path, f"{entry.name}.gff")):
+            dirs.append(Path(entry.path))
+    return dirs
+
+
+def build_catalog(prokka_dir, db_path, jobs=0, force=False, prof=None):
+    """
+    建立或增量更新基因目录，返回 (新增/更新的样本数, 删除的样本数, 未变化的样本数)
+    """
+    prof = prof or profiling.Profiler('3-基因目录.py')
+    with prof.phase('scan') as ph:
+        dirs = discover_sample_dirs(prokka_dir)
+        ph.items = len(dirs)
+    conn = connect(db_path)
+    try:
+        known = dict(conn.execute('SELECT sample, signature FROM samples'))
+        present = {d.name for d in dirs}
+        todo = [d for d in dirs if force or known.get(d.name) != signature(sample_files(d))]
+        stale = [s for s in known if s not in present]
+
+        with conn:
+            for sample in stale:
+                conn.execute('DELETE FROM genes WHERE sample = ?', (sample,))
+                conn.execute('DELETE FROM samples WHERE sample = ?', (sample,))
+
+        workers = jobs if jobs and jobs > 0 else (os.cpu_count() or 1)
+        done = 0
+        with prof.phase('index') as ph, ProcessPoolExecutor(max_workers=min(workers, max(1, len(todo)))) as pool:
+            futures = [pool.submit(index_sample, str(d)) for d in todo]
+            for fut in as_completed(futures):
+                sample, files, sig, rows = fut.result()
+                with prof.phase('write', accumulate=True) as wph, conn:
+                    conn.execute('DELETE FROM genes WHERE sample = ?', (sample,))
+                    conn.executemany(f"INSERT OR REPLACE INTO genes VALUES ({','.join('?' * len(GENE_COLUMNS))})",
+                                     rows)
+                    conn.execute('INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                 (sample, files['gff'], files['ffn'], files['faa'], sig, len(rows),
+                                  datetime.now().isoformat(timespec='seconds')))
+                    wph.items = len(rows)
+                done += 1
+                if done % 100 == 0 or done == len(todo):
+                    print(f"[INFO] 已索引 {done}/{len(todo)} 个样本")
+            ph.items = len(todo)
+        prof.flush()
+    finally:
+        conn.close()
+    return len(todo), len(stale), len(dirs) - len(todo)
+
+
+# ---------------------------------------------------------------------------
+# 查询
+# ---------------------------------------------------------------------------
+
+class GeneCatalog:
+    """只读访问基因目录：按 locus_tag 取注释和序列"""
+
+    def __init__(self, db_path):
+        if not os.path.isfile(db_path):
+            raise FileNotFoundError(f"基因目录不存在：{db_path}")
+        self.conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+        self.conn.row_factory = sqlite3.Row
+        self._paths = {row['sample']: {'ffn': row['ffn'], 'faa': row['faa']}
+                       for row in self.conn.execute('SELECT sample, ffn, faa FROM samples')}
+        self._handles = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        for handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
+        self.conn.close()
+
+    def samples(self):
+        return list(self._paths)
+
+    def is_current(self, sample):
+        """目录中有该样本且其 .gff / .ffn / .faa 自建立索引后未变化"""
+        row = self.conn.execute('SELECT gff, signature FROM samples WHERE sample = ?', (sample,)).fetchone()
+        return row is not None and row['signature'] == signature(sample_files(Path(row['gff']).parent))
+
+    def get(self, locus_tag, sample=None):
+        """一个基因的注释（dict），找不到时返回 None；locus_tag 在队列中重复时需给出 sample"""
+        if sample is None:
+            row = self.conn.execute('SELECT * FROM genes WHERE locus_tag = ? LIMIT 1', (locus_tag,)).fetchone()
+        else:
+            row = self.conn.execute('SELECT * FROM genes WHERE locus_tag = ? AND sample = ?',
+                                    (locus_tag, sample)).fetchone()
+        return dict(row) if row else None
+
+    def get_many(self, locus_tags):
+        """批量查询：{locus_tag: 注释 dict}，找不到的 ID 不出现在结果中"""
+        result = {}
+        ids = list(dict.fromkeys(locus_tags))
+        for i in range(0, len(ids), SQL_CHUNK):
+            chunk = ids[i:i + SQL_CHUNK]
+            sql = f"SELECT * FROM genes WHERE locus_tag IN ({','.join('?' * len(chunk))})"
+            for row in self.conn.execute(sql, chunk):
+                result.setdefault(row['locus_tag'], dict(row))
+        return result
+
+    def lookup(self, pairs):
+        """按 (样本, locus_tag) 批量查询：{(样本, locus_tag): 注释 dict}，locus_tag 在不同样本中重复也能区分"""
+        wanted = set(pairs)
+        result = {}
+        ids = list({locus_tag for _, locus_tag in wanted})
+        for i in range(0, len(ids), SQL_CHUNK):
+            chunk = ids[i:i + SQL_CHUNK]
+            sql = f"SELECT * FROM genes WHERE locus_tag IN ({','.join('?' * len(chunk))})"
+            for row in self.conn.execute(sql, chunk):
+                key = (row['sample'], row['locus_tag'])
+                if key in wanted:
+                    result[key] = dict(row)
+        return result
+
+    def genes(self, sample):
+        """一个样本的全部基因，按 contig、位置排序"""
+        rows = self.conn.execute('SELECT * FROM genes WHERE sample = ? ORDER BY contig, start', (sample,))
+        return [dict(r) for r in rows]
+
+    def _read(self, sample, kind, offset, length):
+        path = self._paths[sample][kind]
+        handle = self._handles.get(path)
+        if handle is None:
+            handle = self._handles[path] = open(path, 'rb')
+        handle.seek(offset)
+        return handle.read(length).decode('utf-8')
+
+    def record(self, gene, kind='ffn'):
+        """按注释 dict 中的偏移读取 (序列头, 序列)；该文件中没有此基因时返回 None"""
+        offset, length = gene[f"{kind}_offset"], gene[f"{kind}_length"]
+        if offset is None:
+            return None
+        text = self._read(gene['sample'], kind, offset, length)
+        header, _, seq = text.partition('\n')
+        return header[1:].strip(), seq.replace('\n', '').replace('\r', '')
+
+    def sequence(self, locus_tag, kind='ffn', sample=None):
+        """核酸（ffn）或蛋白（faa）序列，找不到时返回 None"""
+        gene = self.get(locus_tag, sample)
+        rec = self.record(gene, kind) if gene else None
+        return rec[1] if rec else None
+
+
+# ---------------------------------------------------------------------------
+# 命令行
+# ---------------------------------------------------------------------------
+
+def cmd_build(args):
+    if not os.path.isdir(args.prokka_dir):
+        print(f"错误：Prokka 输出目录不存在：{args.prokka_dir}")
+        sys.exit(1)
+    db = args.db or os.path.join(args.prokka_dir, CATALOG_NAME)
+    start = time.time()
+    with profiling.Profiler('3-基因目录.py') as prof:
+        updated, removed, unchanged = build_catalog(args.prokka_dir, db, args.jobs, args.force, prof)
+    print(f"[INFO] 基因目录：{db}")
+    print(f"[INFO] 新增/更新 {updated} 个样本，删除 {removed} 个，未变化 {unchanged} 个（{time.time() - start:.1f}s）")
+
+
+def cmd_get(args):
+    try:
+        cat = GeneCatalog(args.db)
+    except FileNotFoundError as e:
+        print(f"错误：{e}")
+        sys.exit(1)
+    with cat:
+        found = cat.get_many(args.ids)
+        for locus_tag in args.ids:
+            gene = found.get(locus_tag)
+            if gene is None:
+                print(f"[WARN] 未找到：{locus_tag}", file=sys.stderr)
+                continue
+            if args.seq:
+                rec = cat.record(gene, args.seq)
+                if rec is None:
+                    print(f"[WARN] {locus_tag} 没有 .{args.seq} 序列", file=sys.stderr)
+                    continue
+                print(f">{gene['sample']}|{rec[0]}\n{rec[1]}")
+            else:
+                print('\t'.join('' if gene[c] is None else str(gene[c]) for c in GENE_COLUMNS[:10]))
+
+
+def cmd_stats(args):
+    try:
+        cat = GeneCatalog(args.db)
+    except FileNotFoundError as e:
+        print(f"错误：{e}")
+        sys.exit(1)
+    with cat:
+        n_samples = len(cat.samples())
+        print(f"样本数：{n_samples}")
+        for ftype, n in cat.conn.execute('SELECT ftype, COUNT(*) FROM genes GROUP BY ftype ORDER BY 2 DESC'):
+            print(f"  {ftype}: {n}（平均每个样本 {n / max(1, n_samples):.0f}）")
+        dup = cat.conn.execute('SELECT COUNT(*) FROM (SELECT locus_tag FROM genes GROUP BY locus_tag '
+                               'HAVING COUNT(*) > 1)').fetchone()[0]
+        if dup:
+            print(f"[WARN] {dup} 个 locus_tag 在多个样本中重复，查询时需指定样本")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prokka 输出的队列基因目录（SQLite）")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_build = sub.add_parser('build', help='扫描 Prokka 输出目录，建立或增量更新基因目录')
+    p_build.add_argument('prokka_dir', help='Prokka 输出目录（其下为 <样本>/<样本>.gff 等）')
+    p_build.add_argument('-d', '--db', help=f'基因目录文件（默认：<prokka_dir>/{CATALOG_NAME}）')
+    p_build.add_argument('-j', '--jobs', type=int, default=0, help='并行进程数（默认：CPU 核数）')
+    p_build.add_argument('--force', action='store_true', help='忽略签名，重新索引全部样本')
+    p_get = sub.add_parser('get', help='按 locus_tag 查询注释或序列')
+    p_get.add_argument('db', help='基因目录文件')
+    p_get.add_argument('ids', nargs='+', help='locus_tag')
+    p_get.add_argument('--seq', choices=SEQ_KINDS, help='输出 FASTA 序列而不是注释')
+    p_stats = sub.add_parser('stats', help='基因目录概况')
+    p_stats.add_argument('db', help='基因目录文件')
+    args = parser.parse_args()
+
+    {'build': cmd_build, 'get': cmd_get, 'stats': cmd_stats}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,9 @@
 #!/bin/bash
 # 用法: bash rename_contigs.sh /mnt/d/1-鲍曼菌/组装完成/
+# 原地把目录下 fasta/fa/fna 文件的 contig header 改为 >basename_1、>basename_2 ……
+# 由 1-组装/python/5-contig重命名.py 完成（并行、原子写入）；原 header 记录在 indir/contig_id_map.tsv
 
-indir="/mnt/d/1-鲍曼菌/组装完成"
+indir="${1:-/mnt/d/1-鲍曼菌/组装完成}"
+PYTHON_SCRIPT="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/1-组装/python/5-contig重命名.py"
 
-
-
-# 遍历目录下的 fasta/fa/fna 文件
-find "$indir" -maxdepth 1 -type f \( -name "*.fasta" -o -name "*.fa" -o -name "*.fna" \) -print0 |
-while IFS= read -r -d '' f; do
-  ext="${f##*.}"
-  base=$(basename "$f" ."$ext")
-  echo "🔄 正在处理 $f ..."
-  # 用 awk 重写 contig header
-  awk -v base="$base" 'BEGIN{c=0} 
-    /^>/ {c++; print ">" base "_" c; next} 
-    {print}' "$f" > "$f.tmp" && mv "$f.tmp" "$f"
-done
-
-echo "✅ 所有 fasta 文件重命名完成"
+python3 "$PYTHON_SCRIPT" "$indir" --ext fasta fa fna -j 8 && echo "✅ 所有 fasta 文件重命名完成"
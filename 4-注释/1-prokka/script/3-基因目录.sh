@@ -0,0 +1,11 @@
+#!/bin/bash
+# 扫描全部 Prokka 输出，建立队列基因目录（locus_tag -> 样本、产物、坐标、.ffn/.faa 字节偏移）
+# 重复运行时只索引新增或变化的样本
+
+PROKKA_DIR="/mnt/d/1-ABaumannii/注释prokka"
+PYTHON_SCRIPT="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/4-注释/1-prokka/python/3-基因目录.py"
+
+python3 "$PYTHON_SCRIPT" build \
+    "$PROKKA_DIR" \
+    -d "$PROKKA_DIR/gene_catalog.sqlite" \
+    -j 8
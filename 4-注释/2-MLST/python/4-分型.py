@@ -17,10 +17,22 @@ import os
 import sys
 import csv
 import argparse
+import heapq
 from pathlib import Path
-from collections import defaultdict, OrderedDict
+from contextlib import nullcontext
+from collections import defaultdict, OrderedDict, Counter
 from datetime import datetime
 
+
+# 共用的模块加载函数（8-流程调度/python/模块加载.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+
+profiling = load_module('8-流程调度/python/3-性能记录.py')
+
 # MLST方案的基因列表
 OXFORD_GENES = ['Oxf_gltA', 'Oxf_gyrB', 'Oxf_gdhB', 'Oxf_recA', 'Oxf_cpn60', 'Oxf_gpi', 'Oxf_rpoD']
 PASTEUR_GENES = ['Pas_cpn60', 'Pas_fusA', 'Pas_gltA', 'Pas_pyrG', 'Pas_recA', 'Pas_rplB', 'Pas_rpoB']
@@ -31,6 +43,107 @@ MIN_COVERAGE = 90.0    # 最小覆盖度
 MAX_EVALUE = 1e-10     # 最大E值
 
 
+# 两套方案的定义：显示名、位点、BLAST 结果文件后缀、配置文件（相对 profiles 目录）
+SCHEMES = OrderedDict([
+    ('oxford', {'name': 'Oxford', 'genes': OXFORD_GENES,
+                'b6_suffix': '.oxford_vs_query.b6',
+                'profiles': os.path.join('Oxford', 'profiles_oxford.csv')}),
+    ('pasteur', {'name': 'Pasteur', 'genes': PASTEUR_GENES,
+                 'b6_suffix': '.pasteur_vs_query.b6',
+                 'profiles': os.path.join('Pasteur', 'profiles_pasteur.csv')}),
+])
+
+
+def parse_blast_line(fields):
+    """
+    解析一行BLAST结果（已按制表符拆分的字段列表）
+
+    返回 (gene_name, hit) ；字段不足或无法解析时返回 None
+    """
+    if len(fields) < 12:
+        return None
+
+    # BLAST输出格式：qseqid sseqid pident length qlen slen qstart qend sstart send bitscore evalue
+    # 注意：实际输出中字段顺序可能不同，需要检查
+    subject_id = fields[1]
+    identity = float(fields[2])
+    length = int(fields[3])
+
+    # 尝试解析其他字段，处理可能的格式问题
+    try:
+        qlen = int(fields[4]) if fields[4] != '0' else None
+        slen = int(fields[5]) if fields[5] != '0' else None
+
+        # 如果前面的字段为0，尝试从其他位置获取
+        if qlen is None or qlen == 0:
+            # 尝试从query coordinates计算长度
+            qstart = int(fields[6]) if len(fields) > 6 else 1
+            qend = int(fields[7]) if len(fields) > 7 else length
+            qlen = abs(qend - qstart) + 1
+
+        if slen is None or slen == 0:
+            slen = int(fields[8]) if len(fields) > 8 else length
+
+        # E值和分数可能在不同位置
+        evalue = float(fields[10])
+        bitscore = float(fields[11])
+
+    except (ValueError, IndexError):
+        print(f"警告：解析BLAST结果行时出错：{chr(9).join(fields)}")
+        return None
+
+    # 计算覆盖度（基于查询序列长度）
+    # 注意：有些BLAST输出中qlen可能为0，需要特殊处理
+    if qlen > 0:
+        coverage = (length / qlen) * 100
+    else:
+        # 如果qlen为0，使用slen作为参考
+        coverage = (length / slen) * 100 if slen > 0 else 100.0
+
+    # 提取基因名和等位基因号
+    if '_' not in subject_id:
+        return None
+    gene_name, allele_num = subject_id.rsplit('_', 1)
+    try:
+        coords = [int(fields[i]) for i in (6, 7, 8, 9)]
+    except ValueError:
+        coords = [None] * 4
+    return gene_name, {
+        'allele': allele_num,
+        'identity': identity,
+        'coverage': coverage,
+        'evalue': evalue,
+        'score': bitscore,
+        'length': length,
+        'qlen': qlen,
+        'slen': slen,
+        # 比对位置（用于从组装中提取新等位基因序列）
+        'contig': fields[0],
+        'qstart': coords[0], 'qend': coords[1],
+        'sstart': coords[2], 'send': coords[3]
+    }
+
+
+def parse_blast_hits(rows):
+    """
+    把若干行BLAST结果整理为 {gene_name: [hit, ...]}
+
+    rows 可以是字段列表的列表，也可以是二维数组（如 numpy / pandas 读入的 b6 表）
+    """
+    results = defaultdict(list)
+    for fields in rows:
+        parsed = parse_blast_line([str(x).strip() for x in fields])
+        if parsed is not None:
+            gene_name, hit = parsed
+            results[gene_name].append(hit)
+
+    # 对每个基因的结果按照分数排序
+    for gene in results:
+        results[gene].sort(key=lambda x: (-x['score'], x['evalue'], -x['identity']))
+
+    return dict(results)
+
+
 def parse_blast_results(blast_file):
     """
     解析BLAST结果文件
@@ -48,84 +161,16 @@ def parse_blast_results(blast_file):
         ]
     }
     """
-    results = defaultdict(list)
-    
     if not os.path.exists(blast_file):
         print(f"警告：BLAST结果文件不存在：{blast_file}")
-        return results
+        return {}
     
     with open(blast_file, 'r') as f:
-        for line in f:
-            if line.strip():
-                fields = line.strip().split('\t')
-                if len(fields) >= 12:
-                    # BLAST输出格式：qseqid sseqid pident length qlen slen qstart qend sstart send bitscore evalue
-                    # 注意：实际输出中字段顺序可能不同，需要检查
-                    query_id = fields[0]
-                    subject_id = fields[1]
-                    identity = float(fields[2])
-                    length = int(fields[3])
-                    
-                    # 尝试解析其他字段，处理可能的格式问题
-                    try:
-                        qlen = int(fields[4]) if fields[4] != '0' else None
-                        slen = int(fields[5]) if fields[5] != '0' else None
-                        
-                        # 如果前面的字段为0，尝试从其他位置获取
-                        if qlen is None or qlen == 0:
-                            # 尝试从query coordinates计算长度
-                            qstart = int(fields[6]) if len(fields) > 6 else 1
-                            qend = int(fields[7]) if len(fields) > 7 else length
-                            qlen = abs(qend - qstart) + 1
-                        
-                        if slen is None or slen == 0:
-                            slen = int(fields[8]) if len(fields) > 8 else length
-                        
-                        # E值和分数可能在不同位置
-                        if len(fields) >= 12:
-                            evalue = float(fields[10])
-                            bitscore = float(fields[11])
-                        else:
-                            evalue = float(fields[-1])  # 最后一个字段
-                            bitscore = float(fields[-2])  # 倒数第二个字段
-                        
-                    except (ValueError, IndexError) as e:
-                        print(f"警告：解析BLAST结果行时出错：{line.strip()}")
-                        continue
-                    
-                    # 计算覆盖度（基于查询序列长度）
-                    # 注意：有些BLAST输出中qlen可能为0，需要特殊处理
-                    if qlen > 0:
-                        coverage = (length / qlen) * 100
-                    else:
-                        # 如果qlen为0，使用slen作为参考
-                        coverage = (length / slen) * 100 if slen > 0 else 100.0
-                    
-                    # 提取基因名和等位基因号
-                    if '_' in subject_id:
-                        parts = subject_id.rsplit('_', 1)
-                        if len(parts) == 2:
-                            gene_name = parts[0]
-                            allele_num = parts[1]
-                            
-                            results[gene_name].append({
-                                'allele': allele_num,
-                                'identity': identity,
-                                'coverage': coverage,
-                                'evalue': evalue,
-                                'score': bitscore,
-                                'length': length,
-                                'qlen': qlen
-                            })
-    
-    # 对每个基因的结果按照分数排序
-    for gene in results:
-        results[gene].sort(key=lambda x: (-x['score'], x['evalue'], -x['identity']))
-    
-    return dict(results)
+        return parse_blast_hits(line.strip().split('\t') for line in f if line.strip())
 
 
-def find_best_allele(blast_results, gene_name):
+def find_best_allele(blast_results, gene_name, min_identity=MIN_IDENTITY,
+                     min_coverage=MIN_COVERAGE, max_evalue=MAX_EVALUE):
     """
     为指定基因找到最佳等位基因匹配
     
@@ -141,13 +186,13 @@ def find_best_allele(blast_results, gene_name):
     # 筛选通过质量控制的结果
     valid_hits = []
     for hit in hits:
-        if (hit['identity'] >= MIN_IDENTITY and 
-            hit['coverage'] >= MIN_COVERAGE and 
-            hit['evalue'] <= MAX_EVALUE):
+        if (hit['identity'] >= min_identity and 
+            hit['coverage'] >= min_coverage and 
+            hit['evalue'] <= max_evalue):
             valid_hits.append(hit)
     
     if not valid_hits:
-        return None, f"{gene_name}无满足质量标准的比对结果 (身份≥{MIN_IDENTITY}%, 覆盖度≥{MIN_COVERAGE}%, E值≤{MAX_EVALUE})"
+        return None, f"{gene_name}无满足质量标准的比对结果 (身份≥{min_identity}%, 覆盖度≥{min_coverage}%, E值≤{max_evalue})"
     
     # 选择最佳匹配
     best_hit = valid_hits[0]
@@ -161,7 +206,8 @@ def find_best_allele(blast_results, gene_name):
         'coverage': best_hit['coverage'],
         'evalue': best_hit['evalue'],
         'is_perfect': len(perfect_matches) > 0 and best_hit in perfect_matches,
-        'alternative_alleles': len([h for h in valid_hits if h['identity'] >= 99.0]) - 1
+        'alternative_alleles': len([h for h in valid_hits if h['identity'] >= 99.0]) - 1,
+        'hit': best_hit
     }
     
     return best_hit['allele'], quality_info
@@ -185,316 +231,604 @@ def read_profiles_csv(csv_file):
     return profiles
 
 
-def determine_st_type_partial(allele_profile, profiles_file, scheme_name, min_genes=5):
+class ProfileIndex:
     """
-    根据等位基因组合确定ST型号（支持部分匹配）
-    
-    Args:
-        allele_profile: 已知的等位基因字典
-        profiles_file: MLST配置文件路径
-        scheme_name: 方案名称 ('Oxford' 或 'Pasteur')
-        min_genes: 最少需要匹配的基因数
+    MLST配置表的倒排索引：{基因: {等位基因: [行号, ...]}}
+
+    查找ST时只需对已检出基因的行号集合求交集，不必逐行扫描整个配置表
     """
-    if not os.path.exists(profiles_file):
-        return None, f"配置文件不存在：{profiles_file}"
-    
-    try:
-        # 读取ST配置文件
-        profiles = read_profiles_csv(profiles_file)
-        if not profiles:
-            return None, f"无法读取配置文件：{profiles_file}"
-        
-        # 确保列名正确
-        gene_columns = OXFORD_GENES if scheme_name == 'Oxford' else PASTEUR_GENES
-        
-        # 检查必需的列是否存在
-        if profiles:
-            available_columns = profiles[0].keys()
-            missing_columns = [col for col in gene_columns if col not in available_columns]
-            if missing_columns:
-                return None, f"配置文件缺少列：{missing_columns}"
-        
-        # 查找最佳匹配的ST
-        best_matches = []
-        for profile in profiles:
-            match_count = 0
-            total_available = 0
-            matched_genes = {}
-            
-            for gene in gene_columns:
-                if gene in allele_profile and allele_profile[gene] is not None:
-                    total_available += 1
-                    expected_allele = str(allele_profile[gene]).strip()
-                    actual_allele = str(profile.get(gene, '')).strip()
-                    if expected_allele == actual_allele:
-                        match_count += 1
-                        matched_genes[gene] = expected_allele
-            
-            # 如果匹配的基因数达到要求
-            if match_count >= min_genes and match_count == total_available:
-                confidence = 'exact_match' if match_count == len(gene_columns) else 'partial_match'
-                
+
+    def __init__(self, profiles, gene_columns):
+        self.profiles = profiles
+        self.gene_columns = list(gene_columns)
+        available_columns = profiles[0].keys() if profiles else []
+        self.missing_columns = [col for col in self.gene_columns if col not in available_columns]
+
+        self.alleles = {gene: defaultdict(list) for gene in self.gene_columns}
+        for row, profile in enumerate(profiles):
+            for gene in self.gene_columns:
+                self.alleles[gene][str(profile.get(gene, '')).strip()].append(row)
+
+    @classmethod
+    def from_file(cls, profiles_file, gene_columns):
+        return cls(read_profiles_csv(profiles_file), gene_columns)
+
+    def match(self, allele_profile, min_genes=5):
+        """
+        根据等位基因组合确定ST型号（支持部分匹配）
+
+        已检出的基因必须全部一致且不少于 min_genes 个；多个ST满足时取配置表中靠前的一个
+        返回 (st, st_info) 或 (None, error_message)
+        """
+        if self.missing_columns:
+            return None, f"配置文件缺少列：{self.missing_columns}"
+
+        available = OrderedDict(
+            (gene, str(allele_profile[gene]).strip())
+            for gene in self.gene_columns
+            if gene in allele_profile and allele_profile[gene] is not None
+        )
+
+        if len(available) >= min_genes:
+            rows = None
+            for gene, allele in available.items():
+                gene_rows = self.alleles[gene].get(allele)
+                if not gene_rows:
+                    rows = set()
+                    break
+                rows = set(gene_rows) if rows is None else rows.intersection(gene_rows)
+                if not rows:
+                    break
+            if rows is None:
+                rows = set(range(len(self.profiles)))
+
+            if rows:
+                profile = self.profiles[min(rows)]
+                confidence = 'exact_match' if len(available) == len(self.gene_columns) else 'partial_match'
+
                 # 预测缺失基因的等位基因
-                missing_genes = {}
-                for gene in gene_columns:
-                    if gene not in allele_profile or allele_profile[gene] is None:
-                        missing_genes[gene] = profile.get(gene, 'N/A')
-                
-                best_matches.append({
+                missing_genes = {gene: profile.get(gene, 'N/A')
+                                 for gene in self.gene_columns if gene not in available}
+
+                best_match = {
                     'st': profile.get('ST', 'Unknown'),
                     'clonal_complex': profile.get('clonal_complex', 'N/A'),
                     'species': profile.get('species', 'N/A'),
                     'confidence': confidence,
-                    'matched_count': match_count,
-                    'total_genes': len(gene_columns),
-                    'matched_genes': matched_genes,
+                    'matched_count': len(available),
+                    'total_genes': len(self.gene_columns),
+                    'matched_genes': dict(available),
                     'missing_genes': missing_genes
-                })
-        
-        if best_matches:
-            # 按匹配数排序，选择最佳匹配
-            best_matches.sort(key=lambda x: x['matched_count'], reverse=True)
-            best_match = best_matches[0]
-            
-            return best_match['st'], best_match
-        
+                }
+                return best_match['st'], best_match
+
         return None, f"未找到至少匹配{min_genes}个基因的ST型号"
-            
-    except Exception as e:
-        return None, f"处理配置文件时出错：{e}"
 
 
-def analyze_sample(sample_name, blast_dir, profiles_dir):
+    def nearest(self, allele_profile, k=5):
+        """
+        按不一致的基因数对配置表中的ST排序，返回最接近的 k 个
+
+        只累加与样本至少共享一个等位基因的行（由倒排索引直接给出），不扫描整个配置表；
+        样本缺失的基因不计入不一致数
+        """
+        if self.missing_columns or k <= 0:
+            return []
+        available = OrderedDict(
+            (gene, str(allele_profile[gene]).strip())
+            for gene in self.gene_columns
+            if gene in allele_profile and allele_profile[gene] is not None
+        )
+        shared = Counter()
+        for gene, allele in available.items():
+            shared.update(self.alleles[gene].get(allele, ()))
+
+        top = heapq.nsmallest(k, shared.items(), key=lambda item: (-item[1], item[0]))
+        nearest = []
+        for row, matched in top:
+            profile = self.profiles[row]
+            mismatched_genes = {gene: {'sample': allele, 'st': profile.get(gene, 'N/A')}
+                                for gene, allele in available.items()
+                                if str(profile.get(gene, '')).strip() != allele}
+            nearest.append({
+                'st': profile.get('ST', 'Unknown'),
+                'clonal_complex': profile.get('clonal_complex', 'N/A'),
+                'mismatches': len(available) - matched,
+                'matched_count': matched,
+                'compared_genes': len(available),
+                'mismatched_genes': mismatched_genes
+            })
+        return nearest
+
+
+def find_novel_alleles(quality):
     """
-    分析单个样本的MLST分型
+    从各基因的最佳匹配中找出可能的新等位基因（最佳比对相似度 < 100%）
+
+    返回 {基因: {'closest_allele', 'identity', 'coverage', 'contig', 'start', 'end', 'strand'}}
     """
-    results = {
-        'sample': sample_name,
-        'oxford': {'st': None, 'alleles': {}, 'quality': {}, 'error': None},
-        'pasteur': {'st': None, 'alleles': {}, 'quality': {}, 'error': None}
-    }
+    novel = OrderedDict()
+    for gene, info in quality.items():
+        if 'error' in info or info.get('identity', 100.0) >= 100.0:
+            continue
+        hit = info.get('hit', {})
+        entry = {
+            'closest_allele': info['allele'],
+            'identity': info['identity'],
+            'coverage': info['coverage'],
+            'contig': hit.get('contig'),
+            'start': None, 'end': None, 'strand': None
+        }
+        if None not in (hit.get('qstart'), hit.get('qend'), hit.get('sstart'), hit.get('send')):
+            entry.update(allele_region(hit))
+        novel[gene] = entry
+    return novel
+
+
+def allele_region(hit):
+    """
+    根据比对坐标推算完整等位基因在 contig 上的区间（1-based，闭区间）
+
+    比对未覆盖的等位基因两端按 slen 向外延伸，便于提取全长候选序列
+    """
+    qstart, qend = sorted((hit['qstart'], hit['qend']))
+    sstart, send = hit['sstart'], hit['send']
+    slen = hit.get('slen') or max(sstart, send)
+    query_forward = hit['qstart'] <= hit['qend']
+    subject_forward = sstart <= send
+    strand = '+' if query_forward == subject_forward else '-'
+    s_lo, s_hi = sorted((sstart, send))
+    if strand == '+':
+        left, right = s_lo - 1, slen - s_hi
+    else:
+        left, right = slen - s_hi, s_lo - 1
+    return {'start': max(1, qstart - left), 'end': qend + right, 'strand': strand}
+
+
+def find_assembly(assembly_dir, sample_name):
+    """在组装目录中查找样本的 FASTA（与 3-blastn-比对.sh 相同的扩展名）"""
+    for ext in ('.fasta', '.fa', '.fna', '.fas', '.FASTA', '.FA', '.FNA', '.FAS'):
+        path = os.path.join(assembly_dir, sample_name + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_contigs(fasta_file, wanted):
+    """只读取需要的 contig 序列"""
+    contigs = {}
+    name, chunks = None, []
+    with open(fasta_file, 'r') as f:
+        for line in f:
+            if line.startswith('>'):
+                if name in wanted:
+                    contigs[name] = ''.join(chunks)
+                name = line[1:].split()[0] if len(line) > 1 else ''
+                chunks = []
+            elif name in wanted:
+                chunks.append(line.strip())
+    if name in wanted:
+        contigs[name] = ''.join(chunks)
+    return contigs
+
+
+_COMPLEMENT = str.maketrans('ACGTNacgtn', 'TGCANtgcan')
+
+
+def extract_novel_sequences(novel_alleles, fasta_file):
+    """为新等位基因补充 'sequence'（负链时取反向互补）"""
+    wanted = {e['contig'] for e in novel_alleles.values() if e['start'] is not None}
+    if not wanted:
+        return
+    contigs = read_contigs(fasta_file, wanted)
+    for entry in novel_alleles.values():
+        seq = contigs.get(entry['contig'])
+        if seq is None or entry['start'] is None:
+            continue
+        region = seq[entry['start'] - 1:min(entry['end'], len(seq))]
+        entry['sequence'] = region.translate(_COMPLEMENT)[::-1] if entry['strand'] == '-' else region
+
+
+def load_profile_index(profiles_file, gene_columns):
+    """
+    加载配置文件并建立索引
+
+    返回 ProfileIndex；文件不存在或无法读取时返回错误信息字符串
+    """
+    if not os.path.exists(profiles_file):
+        return f"配置文件不存在：{profiles_file}"
+    try:
+        index = ProfileIndex.from_file(profiles_file, gene_columns)
+    except Exception as e:
+        return f"处理配置文件时出错：{e}"
+    if not index.profiles:
+        return f"无法读取配置文件：{profiles_file}"
+    return index
+
+
+def determine_st_type_partial(allele_profile, profiles_file, scheme_name, min_genes=5):
+    """
+    根据等位基因组合确定ST型号（支持部分匹配）
     
-    # 分析Oxford方案
-    oxford_blast_file = os.path.join(blast_dir, f"{sample_name}.oxford_vs_query.b6")
-    if os.path.exists(oxford_blast_file):
-        oxford_results = parse_blast_results(oxford_blast_file)
-        oxford_alleles = {}
-        oxford_quality = {}
-        
-        for gene in OXFORD_GENES:
-            allele, quality_info = find_best_allele(oxford_results, gene)
+    Args:
+        allele_profile: 已知的等位基因字典
+        profiles_file: MLST配置文件路径
+        scheme_name: 方案名称 ('Oxford' 或 'Pasteur')
+        min_genes: 最少需要匹配的基因数
+
+    每次调用都会重新读取配置文件；批量分型请使用 MLSTTyper
+    """
+    gene_columns = OXFORD_GENES if scheme_name == 'Oxford' else PASTEUR_GENES
+    index = load_profile_index(profiles_file, gene_columns)
+    if isinstance(index, str):
+        return None, index
+    return index.match(allele_profile, min_genes)
+
+
+class MLSTTyper:
+    """
+    可复用的MLST分型器
+
+    方案定义、质量控制阈值和已建立索引的配置表都保存在对象中，
+    创建一次即可对任意多个样本调用，不依赖也不修改模块级全局变量。
+
+    示例：
+        typer = MLSTTyper('download', min_identity=95.0)
+        typer.type_b6('S1.oxford_vs_query.b6')       # 按文件后缀判断方案
+        typer.type_hits(rows, 'pasteur')             # rows: b6 字段的二维数组
+        typer.type_sample('S1', blast_dir)           # 两套方案，结构与 analyze_sample 相同
+    """
+
+    def __init__(self, profiles_dir, min_identity=MIN_IDENTITY, min_coverage=MIN_COVERAGE,
+                 max_evalue=MAX_EVALUE, min_genes=5, schemes=None, nearest_k=0, assembly_dir=None,
+                 profiler=None):
+        self.profiles_dir = profiles_dir
+        # 可选的 profiling.Profiler：parse / match / novel 各阶段累加计时
+        self.profiler = profiler
+        # 未确定ST时返回最接近的 nearest_k 个ST（0 表示关闭）
+        self.nearest_k = nearest_k
+        # 组装目录：提供时从组装中提取新等位基因序列
+        self.assembly_dir = assembly_dir
+        self.min_identity = min_identity
+        self.min_coverage = min_coverage
+        self.max_evalue = max_evalue
+        self.min_genes = min_genes
+        self.schemes = OrderedDict(schemes or SCHEMES)
+        # 方案 -> ProfileIndex（加载失败时为错误信息，分型时原样报告）
+        self.indexes = {
+            key: load_profile_index(os.path.join(profiles_dir, scheme['profiles']), scheme['genes'])
+            for key, scheme in self.schemes.items()
+        }
+
+    def _phase(self, name):
+        if self.profiler is None:
+            return nullcontext(profiling.Phase(name))
+        return self.profiler.phase(name, accumulate=True)
+
+    def scheme_for_file(self, blast_file):
+        """根据BLAST结果文件后缀判断方案"""
+        for key, scheme in self.schemes.items():
+            if str(blast_file).endswith(scheme['b6_suffix']):
+                return key
+        raise ValueError(f"无法从文件名判断MLST方案：{blast_file}")
+
+    def type_hits(self, hits, scheme):
+        """
+        对一个样本一个方案的BLAST结果分型
+
+        hits 可以是 parse_blast_results 的返回值，也可以是 b6 字段的二维数组/行列表
+        返回 {'st', 'alleles', 'quality', 'error', 'novel_alleles'[, 'st_info', 'nearest_sts']}
+        """
+        if not isinstance(hits, dict):
+            hits = parse_blast_hits(hits)
+        genes = self.schemes[scheme]['genes']
+
+        result = {'st': None, 'alleles': {}, 'quality': {}, 'error': None}
+        for gene in genes:
+            allele, quality_info = find_best_allele(hits, gene, self.min_identity,
+                                                    self.min_coverage, self.max_evalue)
             if allele is not None:
-                oxford_alleles[gene] = allele
-                oxford_quality[gene] = quality_info
+                result['alleles'][gene] = allele
+                result['quality'][gene] = quality_info
             else:
-                oxford_quality[gene] = {'error': quality_info}
-        
-        results['oxford']['alleles'] = oxford_alleles
-        results['oxford']['quality'] = oxford_quality
-        
-        # 确定ST型号（允许部分匹配，至少需要5个基因）
-        if len(oxford_alleles) >= 5:
-            oxford_profiles = os.path.join(profiles_dir, "Oxford", "profiles_oxford.csv")
-            st_type, st_info = determine_st_type_partial(oxford_alleles, oxford_profiles, 'Oxford', min_genes=5)
-            results['oxford']['st'] = st_type
-            results['oxford']['st_info'] = st_info
+                result['quality'][gene] = {'error': quality_info}
+
+        # 确定ST型号（允许部分匹配，至少需要 min_genes 个基因）
+        n_alleles = len(result['alleles'])
+        if n_alleles >= self.min_genes:
+            index = self.indexes[scheme]
+            if isinstance(index, str):
+                st_type, st_info = None, index
+            else:
+                st_type, st_info = index.match(result['alleles'], self.min_genes)
+            result['st'] = st_type
+            result['st_info'] = st_info
         else:
-            results['oxford']['error'] = f"找到的等位基因数量不足({len(oxford_alleles)}/7)，需要至少5个基因"
-    else:
-        results['oxford']['error'] = f"Oxford BLAST结果文件不存在：{oxford_blast_file}"
-    
-    # 分析Pasteur方案
-    pasteur_blast_file = os.path.join(blast_dir, f"{sample_name}.pasteur_vs_query.b6")
-    if os.path.exists(pasteur_blast_file):
-        pasteur_results = parse_blast_results(pasteur_blast_file)
-        pasteur_alleles = {}
-        pasteur_quality = {}
+            result['error'] = f"找到的等位基因数量不足({n_alleles}/{len(genes)})，需要至少{self.min_genes}个基因"
+
+        result['novel_alleles'] = find_novel_alleles(result['quality'])
+        index = self.indexes[scheme]
+        if not result['st'] and self.nearest_k > 0 and n_alleles and not isinstance(index, str):
+            result['nearest_sts'] = index.nearest(result['alleles'], self.nearest_k)
+        return result
+
+    def type_b6(self, blast_file, scheme=None):
+        """对一个 .b6 文件分型；scheme 为空时按文件后缀判断"""
+        scheme = scheme or self.scheme_for_file(blast_file)
+        if not os.path.exists(blast_file):
+            return {'st': None, 'alleles': {}, 'quality': {},
+                    'error': f"{self.schemes[scheme]['name']} BLAST结果文件不存在：{blast_file}"}
+        with self._phase('parse') as ph:
+            hits = parse_blast_results(blast_file)
+            ph.items = sum(len(v) for v in hits.values())
+        with self._phase('match') as ph:
+            result = self.type_hits(hits, scheme)
+            ph.items = 1
+        return result
+
+    def type_sample(self, sample_name, blast_dir):
+        """对单个样本的所有方案分型"""
+        results = {'sample': sample_name}
+        for key, scheme in self.schemes.items():
+            blast_file = os.path.join(blast_dir, f"{sample_name}{scheme['b6_suffix']}")
+            results[key] = self.type_b6(blast_file, key)
+
+        # 新等位基因序列：每个样本的组装只读取一次
+        if self.assembly_dir:
+            novel = [r['novel_alleles'] for key in self.schemes
+                     for r in [results[key]] if r.get('novel_alleles')]
+            fasta_file = find_assembly(self.assembly_dir, sample_name) if novel else None
+            if fasta_file:
+                merged = OrderedDict((gene, e) for n in novel for gene, e in n.items())
+                with self._phase('novel_sequences') as ph:
+                    extract_novel_sequences(merged, fasta_file)
+                    ph.items = len(merged)
+        return results
+
+
+def analyze_sample(sample_name, blast_dir, profiles_dir, typer=None):
+    """
+    分析单个样本的MLST分型
+
+    typer 为空时按默认阈值临时创建（会重新读取配置文件）；批量分析时请传入同一个 MLSTTyper
+    """
+    if typer is None:
+        typer = MLSTTyper(profiles_dir)
+    return typer.type_sample(sample_name, blast_dir)
+
+
+def write_scheme_section(f, scheme_result, scheme_name, genes):
+    """在详细报告中写出一个方案的分型结果"""
+    f.write(f"\n【{scheme_name}方案】\n")
+    if scheme_result['st']:
+        f.write(f"ST型号：ST-{scheme_result['st']}\n")
+        if 'st_info' in scheme_result:
+            st_info = scheme_result['st_info']
+            f.write(f"克隆复合群：{st_info.get('clonal_complex', 'N/A')}\n")
+            f.write(f"种属：{st_info.get('species', 'N/A')}\n")
+            f.write(f"匹配可信度：{st_info.get('confidence', 'N/A')}\n")
+            if st_info.get('confidence') == 'partial_match':
+                f.write(f"匹配基因数：{st_info.get('matched_count', 0)}/{st_info.get('total_genes', 7)}\n")
         
-        for gene in PASTEUR_GENES:
-            allele, quality_info = find_best_allele(pasteur_results, gene)
-            if allele is not None:
-                pasteur_alleles[gene] = allele
-                pasteur_quality[gene] = quality_info
+        f.write("\n等位基因组合：\n")
+        for gene in genes:
+            allele = scheme_result['alleles'].get(gene, 'N/A')
+            quality = scheme_result['quality'].get(gene, {})
+            if 'error' not in quality:
+                f.write(f"  {gene}: {allele} (相似度:{quality.get('identity', 0):.1f}%, 覆盖度:{quality.get('coverage', 0):.1f}%)\n")
             else:
-                pasteur_quality[gene] = {'error': quality_info}
-        
-        results['pasteur']['alleles'] = pasteur_alleles
-        results['pasteur']['quality'] = pasteur_quality
-        
-        # 确定ST型号（允许部分匹配，至少需要5个基因）
-        if len(pasteur_alleles) >= 5:
-            pasteur_profiles = os.path.join(profiles_dir, "Pasteur", "profiles_pasteur.csv")
-            st_type, st_info = determine_st_type_partial(pasteur_alleles, pasteur_profiles, 'Pasteur', min_genes=5)
-            results['pasteur']['st'] = st_type
-            results['pasteur']['st_info'] = st_info
-        else:
-            results['pasteur']['error'] = f"找到的等位基因数量不足({len(pasteur_alleles)}/7)，需要至少5个基因"
+                # 显示预测的等位基因（如果有部分匹配）
+                if 'st_info' in scheme_result and 'missing_genes' in scheme_result['st_info']:
+                    predicted = scheme_result['st_info']['missing_genes'].get(gene)
+                    if predicted and predicted != 'N/A':
+                        f.write(f"  {gene}: 未检测到，预测为 {predicted}\n")
+                    else:
+                        f.write(f"  {gene}: 失败 - {quality['error']}\n")
+                else:
+                    f.write(f"  {gene}: 失败 - {quality['error']}\n")
     else:
-        results['pasteur']['error'] = f"Pasteur BLAST结果文件不存在：{pasteur_blast_file}"
+        f.write(f"ST型号：未确定\n")
+        f.write(f"错误：{scheme_result.get('error', '未知错误')}\n")
     
-    return results
+    write_extra_findings(f, scheme_result)
+
+
+def write_extra_findings(f, scheme_result):
+    """在详细报告中补充可能的新等位基因和最接近的ST（没有时不写）"""
+    for gene, entry in scheme_result.get('novel_alleles', {}).items():
+        f.write(f"  可能的新等位基因 {gene}：最接近 {entry['closest_allele']} "
+                f"(相似度:{entry['identity']:.2f}%)\n")
+    nearest = scheme_result.get('nearest_sts')
+    if nearest:
+        f.write("最接近的ST：\n")
+        for item in nearest:
+            diffs = ', '.join(f"{gene} {d['sample']}→{d['st']}" for gene, d in item['mismatched_genes'].items())
+            f.write(f"  ST-{item['st']}：{item['mismatches']}/{item['compared_genes']} 个基因不一致"
+                    f"{'（' + diffs + '）' if diffs else ''}\n")
+
+
+def summary_row(result):
+    """MLST_summary.csv 的一行"""
+    return {
+        'Sample': result['sample'],
+        'Oxford_ST': f"ST-{result['oxford']['st']}" if result['oxford']['st'] else 'N/A',
+        'Oxford_CC': result['oxford'].get('st_info', {}).get('clonal_complex', 'N/A') if result['oxford']['st'] else 'N/A',
+        'Oxford_Species': result['oxford'].get('st_info', {}).get('species', 'N/A') if result['oxford']['st'] else 'N/A',
+        'Pasteur_ST': f"ST-{result['pasteur']['st']}" if result['pasteur']['st'] else 'N/A',
+        'Pasteur_CC': result['pasteur'].get('st_info', {}).get('clonal_complex', 'N/A') if result['pasteur']['st'] else 'N/A',
+        'Pasteur_Species': result['pasteur'].get('st_info', {}).get('species', 'N/A') if result['pasteur']['st'] else 'N/A',
+        'Status': 'Complete' if (result['oxford']['st'] and result['pasteur']['st']) else 'Incomplete'
+    }
+
+
+def alleles_row(result):
+    """MLST_detailed_alleles.csv 的一行（未检出的基因尝试使用部分匹配预测的等位基因）"""
+    row = {
+        'Sample': result['sample'],
+        'Oxford_ST': f"ST-{result['oxford']['st']}" if result['oxford']['st'] else 'N/A',
+        'Pasteur_ST': f"ST-{result['pasteur']['st']}" if result['pasteur']['st'] else 'N/A'
+    }
+    for key, genes in (('oxford', OXFORD_GENES), ('pasteur', PASTEUR_GENES)):
+        scheme_result = result[key]
+        for gene in genes:
+            allele = scheme_result['alleles'].get(gene)
+            if allele is not None:
+                row[gene] = allele
+            elif 'st_info' in scheme_result and 'missing_genes' in scheme_result['st_info']:
+                # 尝试从预测的基因中获取
+                predicted = scheme_result['st_info']['missing_genes'].get(gene)
+                row[gene] = predicted if predicted and predicted != 'N/A' else 'N/A'
+            else:
+                row[gene] = 'N/A'
+    return row
 
 
-def generate_report(all_results, output_dir):
+class ReportWriter:
     """
-    生成MLST分型报告
+    流式写出MLST分型报告
+
+    每完成一个样本调用 add(result)，同时追加到详细报告、汇总表和等位基因表，
+    每 flush_every 个样本刷新一次文件缓冲；内存占用与样本数无关，中断时已写出的样本保留在文件中。
+    新等位基因序列和最接近ST表在第一次有内容时才创建。
+
+    示例：
+        with ReportWriter(output_dir, typer) as writer:
+            for sample in samples:
+                writer.add(typer.type_sample(sample, blast_dir))
     """
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 生成详细报告
-    detailed_report_file = os.path.join(output_dir, "MLST_detailed_report.txt")
-    with open(detailed_report_file, 'w', encoding='utf-8') as f:
+
+    SUMMARY_FIELDS = ['Sample', 'Oxford_ST', 'Oxford_CC', 'Oxford_Species',
+                      'Pasteur_ST', 'Pasteur_CC', 'Pasteur_Species', 'Status']
+    ALLELES_FIELDS = ['Sample', 'Oxford_ST', 'Pasteur_ST'] + OXFORD_GENES + PASTEUR_GENES
+    NEAREST_FIELDS = ['Sample', 'Scheme', 'Rank', 'ST', 'CC', 'Mismatches', 'Compared_genes',
+                      'Mismatched_alleles']
+
+    def __init__(self, output_dir, typer=None, flush_every=100):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.flush_every = max(1, flush_every)
+        self.count = 0
+
+        self.detailed_report_file = os.path.join(output_dir, "MLST_detailed_report.txt")
+        self.summary_file = os.path.join(output_dir, "MLST_summary.csv")
+        self.detailed_alleles_file = os.path.join(output_dir, "MLST_detailed_alleles.csv")
+        self.novel_file = None
+        self.nearest_file = None
+
+        self._report = open(self.detailed_report_file, 'w', encoding='utf-8')
+        self._summary = open(self.summary_file, 'w', newline='', encoding='utf-8')
+        self._alleles = open(self.detailed_alleles_file, 'w', newline='', encoding='utf-8')
+        self._novel = None
+        self._nearest = None
+        self._nearest_writer = None
+
+        min_identity = typer.min_identity if typer else MIN_IDENTITY
+        min_coverage = typer.min_coverage if typer else MIN_COVERAGE
+        max_evalue = typer.max_evalue if typer else MAX_EVALUE
+
+        f = self._report
         f.write("=" * 80 + "\n")
         f.write("鲍曼菌 MLST 分型详细报告\n")
         f.write("=" * 80 + "\n\n")
         f.write(f"分析时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
         f.write(f"质量控制标准：\n")
-        f.write(f"  - 最小相似度：{MIN_IDENTITY}%\n")
-        f.write(f"  - 最小覆盖度：{MIN_COVERAGE}%\n")
-        f.write(f"  - 最大E值：{MAX_EVALUE}\n\n")
-        
-        for result in all_results:
-            f.write("-" * 60 + "\n")
-            f.write(f"样本：{result['sample']}\n")
-            f.write("-" * 60 + "\n")
-            
-            # Oxford方案
-            f.write("\n【Oxford方案】\n")
-            if result['oxford']['st']:
-                f.write(f"ST型号：ST-{result['oxford']['st']}\n")
-                if 'st_info' in result['oxford']:
-                    st_info = result['oxford']['st_info']
-                    f.write(f"克隆复合群：{st_info.get('clonal_complex', 'N/A')}\n")
-                    f.write(f"种属：{st_info.get('species', 'N/A')}\n")
-                    f.write(f"匹配可信度：{st_info.get('confidence', 'N/A')}\n")
-                    if st_info.get('confidence') == 'partial_match':
-                        f.write(f"匹配基因数：{st_info.get('matched_count', 0)}/{st_info.get('total_genes', 7)}\n")
-                
-                f.write("\n等位基因组合：\n")
-                for gene in OXFORD_GENES:
-                    allele = result['oxford']['alleles'].get(gene, 'N/A')
-                    quality = result['oxford']['quality'].get(gene, {})
-                    if 'error' not in quality:
-                        f.write(f"  {gene}: {allele} (相似度:{quality.get('identity', 0):.1f}%, 覆盖度:{quality.get('coverage', 0):.1f}%)\n")
-                    else:
-                        # 显示预测的等位基因（如果有部分匹配）
-                        if 'st_info' in result['oxford'] and 'missing_genes' in result['oxford']['st_info']:
-                            predicted = result['oxford']['st_info']['missing_genes'].get(gene)
-                            if predicted and predicted != 'N/A':
-                                f.write(f"  {gene}: 未检测到，预测为 {predicted}\n")
-                            else:
-                                f.write(f"  {gene}: 失败 - {quality['error']}\n")
-                        else:
-                            f.write(f"  {gene}: 失败 - {quality['error']}\n")
-            else:
-                f.write(f"ST型号：未确定\n")
-                f.write(f"错误：{result['oxford'].get('error', '未知错误')}\n")
-            
-            # Pasteur方案
-            f.write("\n【Pasteur方案】\n")
-            if result['pasteur']['st']:
-                f.write(f"ST型号：ST-{result['pasteur']['st']}\n")
-                if 'st_info' in result['pasteur']:
-                    st_info = result['pasteur']['st_info']
-                    f.write(f"克隆复合群：{st_info.get('clonal_complex', 'N/A')}\n")
-                    f.write(f"种属：{st_info.get('species', 'N/A')}\n")
-                    f.write(f"匹配可信度：{st_info.get('confidence', 'N/A')}\n")
-                    if st_info.get('confidence') == 'partial_match':
-                        f.write(f"匹配基因数：{st_info.get('matched_count', 0)}/{st_info.get('total_genes', 7)}\n")
-                
-                f.write("\n等位基因组合：\n")
-                for gene in PASTEUR_GENES:
-                    allele = result['pasteur']['alleles'].get(gene, 'N/A')
-                    quality = result['pasteur']['quality'].get(gene, {})
-                    if 'error' not in quality:
-                        f.write(f"  {gene}: {allele} (相似度:{quality.get('identity', 0):.1f}%, 覆盖度:{quality.get('coverage', 0):.1f}%)\n")
-                    else:
-                        # 显示预测的等位基因（如果有部分匹配）
-                        if 'st_info' in result['pasteur'] and 'missing_genes' in result['pasteur']['st_info']:
-                            predicted = result['pasteur']['st_info']['missing_genes'].get(gene)
-                            if predicted and predicted != 'N/A':
-                                f.write(f"  {gene}: 未检测到，预测为 {predicted}\n")
-                            else:
-                                f.write(f"  {gene}: 失败 - {quality['error']}\n")
-                        else:
-                            f.write(f"  {gene}: 失败 - {quality['error']}\n")
-            else:
-                f.write(f"ST型号：未确定\n")
-                f.write(f"错误：{result['pasteur'].get('error', '未知错误')}\n")
-            
-            f.write("\n")
-    
-    # 生成简要汇总表
-    summary_file = os.path.join(output_dir, "MLST_summary.csv")
-    with open(summary_file, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['Sample', 'Oxford_ST', 'Oxford_CC', 'Oxford_Species', 
-                     'Pasteur_ST', 'Pasteur_CC', 'Pasteur_Species', 'Status']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for result in all_results:
-            row = {
-                'Sample': result['sample'],
-                'Oxford_ST': f"ST-{result['oxford']['st']}" if result['oxford']['st'] else 'N/A',
-                'Oxford_CC': result['oxford'].get('st_info', {}).get('clonal_complex', 'N/A') if result['oxford']['st'] else 'N/A',
-                'Oxford_Species': result['oxford'].get('st_info', {}).get('species', 'N/A') if result['oxford']['st'] else 'N/A',
-                'Pasteur_ST': f"ST-{result['pasteur']['st']}" if result['pasteur']['st'] else 'N/A',
-                'Pasteur_CC': result['pasteur'].get('st_info', {}).get('clonal_complex', 'N/A') if result['pasteur']['st'] else 'N/A',
-                'Pasteur_Species': result['pasteur'].get('st_info', {}).get('species', 'N/A') if result['pasteur']['st'] else 'N/A',
-                'Status': 'Complete' if (result['oxford']['st'] and result['pasteur']['st']) else 'Incomplete'
-            }
-            writer.writerow(row)
-    
-    # 生成详细的等位基因表格
-    detailed_alleles_file = os.path.join(output_dir, "MLST_detailed_alleles.csv")
-    with open(detailed_alleles_file, 'w', newline='', encoding='utf-8') as f:
-        # 构建列名：样本名 + ST信息 + Oxford基因 + Pasteur基因
-        fieldnames = (['Sample', 'Oxford_ST', 'Pasteur_ST'] + 
-                     OXFORD_GENES + PASTEUR_GENES)
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        
+        f.write(f"  - 最小相似度：{min_identity}%\n")
+        f.write(f"  - 最小覆盖度：{min_coverage}%\n")
+        f.write(f"  - 最大E值：{max_evalue}\n\n")
+
+        self._summary_writer = csv.DictWriter(self._summary, fieldnames=self.SUMMARY_FIELDS)
+        self._summary_writer.writeheader()
+        self._alleles_writer = csv.DictWriter(self._alleles, fieldnames=self.ALLELES_FIELDS)
+        self._alleles_writer.writeheader()
+
+    def add(self, result):
+        """追加一个样本的结果"""
+        f = self._report
+        f.write("-" * 60 + "\n")
+        f.write(f"样本：{result['sample']}\n")
+        f.write("-" * 60 + "\n")
+        write_scheme_section(f, result['oxford'], 'Oxford', OXFORD_GENES)
+        write_scheme_section(f, result['pasteur'], 'Pasteur', PASTEUR_GENES)
+        f.write("\n")
+
+        self._summary_writer.writerow(summary_row(result))
+        self._alleles_writer.writerow(alleles_row(result))
+        self._add_novel_and_nearest(result)
+
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.flush()
+
+    def _add_novel_and_nearest(self, result):
+        """新等位基因序列写入 MLST_novel_alleles.fasta，最接近ST排名写入 MLST_nearest_ST.tsv"""
+        for key, scheme in SCHEMES.items():
+            scheme_result = result.get(key, {})
+            for gene, entry in scheme_result.get('novel_alleles', {}).items():
+                seq = entry.get('sequence')
+                if not seq:
+                    continue
+                if self._novel is None:
+                    self.novel_file = os.path.join(self.output_dir, "MLST_novel_alleles.fasta")
+                    self._novel = open(self.novel_file, 'w', encoding='utf-8')
+                self._novel.write(f">{result['sample']}|{gene}|closest={entry['closest_allele']}"
+                                  f"|identity={entry['identity']:.2f}"
+                                  f"|{entry['contig']}:{entry['start']}-{entry['end']}({entry['strand']})\n")
+                for i in range(0, len(seq), 60):
+                    self._novel.write(seq[i:i + 60] + "\n")
+
+            for rank, item in enumerate(scheme_result.get('nearest_sts', []), 1):
+                if self._nearest is None:
+                    self.nearest_file = os.path.join(self.output_dir, "MLST_nearest_ST.tsv")
+                    self._nearest = open(self.nearest_file, 'w', newline='', encoding='utf-8')
+                    self._nearest_writer = csv.writer(self._nearest, delimiter='\t')
+                    self._nearest_writer.writerow(self.NEAREST_FIELDS)
+                self._nearest_writer.writerow([
+                    result['sample'], scheme['name'], rank, f"ST-{item['st']}",
+                    item['clonal_complex'], item['mismatches'], item['compared_genes'],
+                    ';'.join(f"{g}:{d['sample']}>{d['st']}" for g, d in item['mismatched_genes'].items())
+                ])
+
+    def _handles(self):
+        return [h for h in (self._report, self._summary, self._alleles, self._novel, self._nearest)
+                if h is not None]
+
+    def flush(self):
+        for handle in self._handles():
+            handle.flush()
+
+    def close(self):
+        for handle in self._handles():
+            handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def print_outputs(self):
+        print(f"\n报告已生成：")
+        print(f"  详细报告：{self.detailed_report_file}")
+        print(f"  汇总表格：{self.summary_file}")
+        print(f"  详细等位基因表格：{self.detailed_alleles_file}")
+        if self.novel_file:
+            print(f"  新等位基因序列：{self.novel_file}")
+        if self.nearest_file:
+            print(f"  最接近ST：{self.nearest_file}")
+
+
+def generate_report(all_results, output_dir, typer=None):
+    """
+    生成MLST分型报告
+
+    typer 用于在报告中写出实际使用的质量控制阈值（为空时使用默认阈值）；
+    all_results 可以是任意可迭代对象（如生成器），结果逐个写出
+    """
+    with ReportWriter(output_dir, typer) as writer:
         for result in all_results:
-            row = {
-                'Sample': result['sample'],
-                'Oxford_ST': f"ST-{result['oxford']['st']}" if result['oxford']['st'] else 'N/A',
-                'Pasteur_ST': f"ST-{result['pasteur']['st']}" if result['pasteur']['st'] else 'N/A'
-            }
-            
-            # 添加Oxford方案的等位基因
-            for gene in OXFORD_GENES:
-                allele = result['oxford']['alleles'].get(gene)
-                if allele is not None:
-                    row[gene] = allele
-                else:
-                    # 尝试从预测的基因中获取
-                    if ('st_info' in result['oxford'] and 
-                        'missing_genes' in result['oxford']['st_info']):
-                        predicted = result['oxford']['st_info']['missing_genes'].get(gene)
-                        row[gene] = predicted if predicted and predicted != 'N/A' else 'N/A'
-                    else:
-                        row[gene] = 'N/A'
-            
-            # 添加Pasteur方案的等位基因
-            for gene in PASTEUR_GENES:
-                allele = result['pasteur']['alleles'].get(gene)
-                if allele is not None:
-                    row[gene] = allele
-                else:
-                    # 尝试从预测的基因中获取
-                    if ('st_info' in result['pasteur'] and 
-                        'missing_genes' in result['pasteur']['st_info']):
-                        predicted = result['pasteur']['st_info']['missing_genes'].get(gene)
-                        row[gene] = predicted if predicted and predicted != 'N/A' else 'N/A'
-                    else:
-                        row[gene] = 'N/A'
-            
-            writer.writerow(row)
-    
-    print(f"\n报告已生成：")
-    print(f"  详细报告：{detailed_report_file}")
-    print(f"  汇总表格：{summary_file}")
-    print(f"  详细等位基因表格：{detailed_alleles_file}")
+            writer.add(result)
+    writer.print_outputs()
 
 
 def main():
@@ -511,13 +845,22 @@ def main():
                        help='最小相似度阈值（默认：95.0）')
     parser.add_argument('--min-coverage', type=float, default=90.0,
                        help='最小覆盖度阈值（默认：90.0）')
+    parser.add_argument('--nearest', type=int, default=0,
+                       help='未确定ST时列出最接近的前K个ST（按不一致基因数排序，默认：0 不输出）')
+    parser.add_argument('--flush-every', type=int, default=100,
+                       help='每分析多少个样本刷新一次报告文件（默认：100）')
+    parser.add_argument('-a', '--assembly-dir',
+                       help='组装FASTA目录（与BLAST查询序列相同）；提供时提取新等位基因（相似度<100%%）的序列')
+    parser.add_argument('--profile', metavar='JSONL',
+                       help=f'把各阶段耗时/内存追加写入该文件（也可用环境变量 {profiling.PROFILE_ENV}）')
     
     args = parser.parse_args()
-    
-    # 更新全局阈值
-    global MIN_IDENTITY, MIN_COVERAGE
-    MIN_IDENTITY = args.min_identity
-    MIN_COVERAGE = args.min_coverage
+    profiling.enable(args.profile)
+    with profiling.Profiler('4-分型.py') as prof:
+        run(args, prof)
+
+
+def run(args, prof):
     
     # 检查输入目录
     if not os.path.exists(args.input):
@@ -547,23 +890,28 @@ def main():
         sys.exit(1)
     
     print(f"发现 {len(samples)} 个样本需要分析：{', '.join(samples)}")
-    print(f"质量控制标准：相似度≥{MIN_IDENTITY}%, 覆盖度≥{MIN_COVERAGE}%")
+    print(f"质量控制标准：相似度≥{args.min_identity}%, 覆盖度≥{args.min_coverage}%")
     print("-" * 60)
     
-    # 分析所有样本
-    all_results = []
-    for sample in samples:
-        print(f"正在分析样本：{sample}")
-        result = analyze_sample(sample, args.input, args.profiles)
-        all_results.append(result)
-        
-        # 简要显示结果
-        oxford_st = f"ST-{result['oxford']['st']}" if result['oxford']['st'] else "未确定"
-        pasteur_st = f"ST-{result['pasteur']['st']}" if result['pasteur']['st'] else "未确定"
-        print(f"  Oxford: {oxford_st}   Pasteur: {pasteur_st}")
-    
-    # 生成报告
-    generate_report(all_results, args.output)
+    # 配置表只读取并建立索引一次，所有样本共用
+    with prof.phase('load_profiles'):
+        typer = MLSTTyper(args.profiles, min_identity=args.min_identity, min_coverage=args.min_coverage,
+                          nearest_k=args.nearest, assembly_dir=args.assembly_dir, profiler=prof)
+    
+    # 分析所有样本，每完成一个样本即写入报告
+    with ReportWriter(args.output, typer, flush_every=args.flush_every) as writer:
+        for sample in samples:
+            print(f"正在分析样本：{sample}")
+            result = typer.type_sample(sample, args.input)
+            with prof.phase('write', accumulate=True) as ph:
+                writer.add(result)
+                ph.items = 1
+            
+            # 简要显示结果
+            oxford_st = f"ST-{result['oxford']['st']}" if result['oxford']['st'] else "未确定"
+            pasteur_st = f"ST-{result['pasteur']['st']}" if result['pasteur']['st'] else "未确定"
+            print(f"  Oxford: {oxford_st}   Pasteur: {pasteur_st}")
+    writer.print_outputs()
     
     print(f"\n分析完成！共处理 {len(samples)} 个样本。")
 
@@ -1,13 +1,61 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+OXFORD_COLUMNS = ["Oxf_gltA", "Oxf_gyrB", "Oxf_gdhB", "Oxf_recA", "Oxf_cpn60", "Oxf_gpi", "Oxf_rpoD"]
+PASTEUR_COLUMNS = ["Pas_cpn60", "Pas_fusA", "Pas_gltA", "Pas_pyrG", "Pas_recA", "Pas_rplB", "Pas_rpoB"]
+
+# 等位基因编号为整数，N/A 读为缺失（可空整数类型），导出时缺失写为空（与原先 pandas 默认一致）
+ALLELE_DTYPE = "Int32"
+NA_VALUES = ["N/A", "NA", ""]
+CHUNK_SIZE = 50000
+
+
+def export_profiles(input_csv, out_ox, out_pa, out_npz=None, chunksize=CHUNK_SIZE):
+    """
+    分块读取 MLST_detailed_alleles.csv，只读样本名和两套方案的位点列，
+    每块同时追加到 Oxford / Pasteur 两个 profile 文件
+
+    out_npz 不为空时另存二进制 profile 矩阵：
+      samples（样本名）、oxford / pasteur（int32[样本, 位点]，缺失为 0）、
+      oxford_loci / pasteur_loci（位点名）
+    """
+    dtypes = {"Sample": str, **{c: ALLELE_DTYPE for c in OXFORD_COLUMNS + PASTEUR_COLUMNS}}
+    reader = pd.read_csv(input_csv, usecols=list(dtypes), dtype=dtypes,
+                         na_values=NA_VALUES, keep_default_na=False, chunksize=chunksize)
+
+    samples, ox_blocks, pa_blocks = [], [], []
+    n = 0
+    with open(out_ox, "w") as f_ox, open(out_pa, "w") as f_pa:
+        for chunk in reader:
+            chunk[["Sample"] + OXFORD_COLUMNS].to_csv(f_ox, sep="\t", index=False, header=False, na_rep="")
+            chunk[["Sample"] + PASTEUR_COLUMNS].to_csv(f_pa, sep="\t", index=False, header=False, na_rep="")
+            if out_npz is not None:
+                samples.extend(chunk["Sample"].tolist())
+                ox_blocks.append(chunk[OXFORD_COLUMNS].fillna(0).to_numpy(dtype=np.int32))
+                pa_blocks.append(chunk[PASTEUR_COLUMNS].fillna(0).to_numpy(dtype=np.int32))
+            n += len(chunk)
+
+    if out_npz is not None:
+        empty = np.zeros((0, len(OXFORD_COLUMNS)), dtype=np.int32)
+        np.savez(out_npz,
+                 samples=np.array(samples, dtype=str),
+                 oxford=np.vstack(ox_blocks) if ox_blocks else empty,
+                 pasteur=np.vstack(pa_blocks) if pa_blocks else empty,
+                 oxford_loci=np.array(OXFORD_COLUMNS, dtype=str),
+                 pasteur_loci=np.array(PASTEUR_COLUMNS, dtype=str))
+    return n
+
+
 def main():
     parser = argparse.ArgumentParser(description="导出 MLST profiles (Oxford/Pasteur)")
     parser.add_argument("input_csv", help="输入 MLST_detailed_alleles.csv 文件路径")
     parser.add_argument("output_dir", help="输出目录")
+    parser.add_argument("--npz", action="store_true",
+                        help="同时导出二进制 profile 矩阵 MLST_profiles.npz（供 5-等位基因距离.py 直接读取）")
     args = parser.parse_args()
 
     input_csv = Path(args.input_csv).resolve()
@@ -16,32 +64,15 @@ def main():
 
     out_ox = outdir / "MLST_ST_Ox.txt"
     out_pa = outdir / "MLST_ST_Pa.txt"
+    out_npz = outdir / "MLST_profiles.npz" if args.npz else None
 
-    # 读取输入
-    df = pd.read_csv(input_csv)
-
-    # 去掉 ST- 前缀
-    if "Oxford_ST" in df.columns:
-        df["Oxford_ST"] = df["Oxford_ST"].astype(str).str.replace("ST-", "", regex=False)
-    if "Pasteur_ST" in df.columns:
-        df["Pasteur_ST"] = df["Pasteur_ST"].astype(str).str.replace("ST-", "", regex=False)
-
-    # 提取 Oxford
-    df_ox = df.loc[:, [
-        "Sample","Oxf_gltA","Oxf_gyrB","Oxf_gdhB",
-        "Oxf_recA","Oxf_cpn60","Oxf_gpi","Oxf_rpoD"
-    ]]
-    df_ox.to_csv(out_ox, sep="\t", index=False, header=None)
-
-    # 提取 Pasteur
-    df_pa = df.loc[:, [
-        "Sample","Pas_cpn60","Pas_fusA","Pas_gltA",
-        "Pas_pyrG","Pas_recA","Pas_rplB","Pas_rpoB"
-    ]]
-    df_pa.to_csv(out_pa, sep="\t", index=False, header=None)
+    n = export_profiles(input_csv, out_ox, out_pa, out_npz)
 
+    print(f"[INFO] 共 {n} 个样本")
     print(f"[INFO] Oxford profiles 已导出到 {out_ox}")
     print(f"[INFO] Pasteur profiles 已导出到 {out_pa}")
+    if out_npz is not None:
+        print(f"[INFO] 二进制 profile 矩阵已导出到 {out_npz}")
 
 if __name__ == "__main__":
     main()
@@ -1,23 +1,129 @@
 import numpy as np
-import pandas as pd
 import os, sys
+import shutil
+import argparse
+
+
+def format_values(values):
+    """一行距离值转 CSV 文本：整数写为整数，否则写 float32 的最短表示"""
+    if np.all(values == np.rint(values)):
+        return ",".join(map(str, values.astype(np.int64).tolist()))
+    return ",".join(np.format_float_positional(v, unique=True, trim="-") for v in values)
+
+
+def dist_to_csv(file_path: str, write_csv: bool = True, npy: bool = False, condensed: bool = False):
+    """
+    单遍读取 PHYLIP 风格的距离矩阵（第一行为样本数，之后每行：样本名 距离...）
+
+    - 支持完整方阵（每行 n 个值）和下三角（第 i 行 i 个值）两种输入
+    - CSV 不经过 DataFrame；方阵输入按原文本边读边写，下三角输入先解析进 float32 方阵
+      （--npy 时即 .npy 内存映射），读完后按对称补齐的方阵逐行写出（对角线为 0，整数写为整数）
+    - 数据行数必须与首行样本数一致，否则报错
+    - npy=True：同时写出 float32 方阵 <name>.npy（np.load(..., mmap_mode='r') 可直接内存映射）
+    - condensed=True：同时写出 scipy pdist 顺序的压缩上三角 <name>.condensed.npy
+    - 写出 .npy 时样本名另存为 <name>.names.txt
+    """
+    stem = os.path.splitext(file_path)[0]
+    output_path = stem + ".csv"
 
-def dist_to_csv(file_path: str):
-    # 先跳过第一行
     with open(file_path) as f:
         n = int(f.readline().strip())
-    # 第二列开始是矩阵
-    data = np.loadtxt(file_path, skiprows=1, usecols=range(1, n+1))
-    samples = np.loadtxt(file_path, skiprows=1, usecols=0, dtype=str)
 
-    df = pd.DataFrame(data, index=samples, columns=samples)
-    output_path = os.path.splitext(file_path)[0] + ".csv"
-    df.to_csv(output_path)
-    print(f"✅ 转换完成: {output_path}")
+        full = np.lib.format.open_memmap(stem + ".npy", mode="w+", dtype=np.float32, shape=(n, n)) if npy else None
+        cond = (np.lib.format.open_memmap(stem + ".condensed.npy", mode="w+", dtype=np.float32,
+                                          shape=(n * (n - 1) // 2,)) if condensed else None)
+
+        # CSV 表头需要全部样本名，先把数据行写到临时文件，最后拼接
+        body_path = output_path + ".body.tmp"
+        body = open(body_path, "w") if write_csv else None
+        names = []
+        square = None
+        matrix = full  # 下三角输入写 CSV 时用于对称补齐的方阵，首行确定格式后按需分配
+        try:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+                row = len(names)
+                if row >= n:
+                    raise ValueError(f"数据行数多于首行样本数 {n}（第 {row + 2} 行：{parts[0]}）")
+                names.append(parts[0])
+                tokens = parts[1:]
+
+                # 以第一行判断输入格式，之后各行必须一致
+                if square is None:
+                    square = n > 0 and len(tokens) == n
+                    if matrix is None and body is not None and not square:
+                        matrix = np.zeros((n, n), dtype=np.float32)
+                if len(tokens) != (n if square else row):
+                    raise ValueError(f"第 {row + 2} 行有 {len(tokens)} 个数值，"
+                                     f"应为 {n if square else row}（{'方阵' if square else '下三角'}）")
+
+                if matrix is not None or cond is not None:
+                    values = np.array(tokens, dtype=np.float32)
+                    lower = values[:row]
+                    if matrix is not None:
+                        matrix[row, :row] = lower
+                        matrix[:row, row] = lower
+                        matrix[row, row] = values[row] if square else 0.0
+                    if cond is not None and row > 0:
+                        # (j, row), j < row 在 pdist 顺序中的位置
+                        j = np.arange(row)
+                        cond[n * j - j * (j + 1) // 2 + row - j - 1] = lower
+
+                if body is not None and square:
+                    body.write(parts[0] + "," + ",".join(tokens) + "\n")
+
+            if len(names) != n:
+                raise ValueError(f"数据行数少于首行样本数：首行 {n}，实际 {len(names)}")
+
+            if body is not None and not square:
+                for name, values in zip(names, matrix):
+                    body.write(name + "," + format_values(values) + "\n")
+        except BaseException:
+            if body is not None:
+                body.close()
+                os.remove(body_path)
+            # 不留下不完整的 .npy
+            del full, cond, matrix
+            for flag, path in ((npy, stem + ".npy"), (condensed, stem + ".condensed.npy")):
+                if flag:
+                    os.remove(path)
+            raise
+        if body is not None:
+            body.close()
+
+    if write_csv:
+        with open(output_path, "w") as out:
+            out.write("," + ",".join(names) + "\n")
+            with open(body_path) as body:
+                shutil.copyfileobj(body, out, 1 << 20)
+        os.remove(body_path)
+        print(f"✅ 转换完成: {output_path}")
+
+    if full is not None or cond is not None:
+        if full is not None:
+            full.flush()
+            print(f"✅ 方阵: {stem}.npy")
+        if cond is not None:
+            cond.flush()
+            print(f"✅ 压缩上三角: {stem}.condensed.npy")
+        with open(stem + ".names.txt", "w") as out:
+            out.write("\n".join(names) + "\n")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("用法: python dist2csv.py <输入文件路径>")
+    parser = argparse.ArgumentParser(description="PHYLIP 距离矩阵转 CSV（可选 .npy / 压缩形式）")
+    parser.add_argument("file_path", help="输入距离矩阵文件（如 grapetree -m distance 输出）")
+    parser.add_argument("--npy", action="store_true", help="同时写出 float32 方阵 .npy（可内存映射）")
+    parser.add_argument("--condensed", action="store_true", help="同时写出压缩上三角 .condensed.npy")
+    parser.add_argument("--no-csv", action="store_true", help="不写 CSV")
+    if len(sys.argv) < 2:
+        print("用法: python dist2csv.py <输入文件路径> [--npy] [--condensed] [--no-csv]")
+        sys.exit(1)
+    args = parser.parse_args()
+    try:
+        dist_to_csv(args.file_path, write_csv=not args.no_csv, npy=args.npy, condensed=args.condensed)
+    except ValueError as e:
+        print(f"错误：{e}")
         sys.exit(1)
-    dist_to_csv(sys.argv[1])
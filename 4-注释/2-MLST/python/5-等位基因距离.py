@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MLST 等位基因距离矩阵（替代 grapetree -m distance）
+
+读取 5-MLST→Grapetree.py 导出的 profile 文件（无表头，制表符分隔：样本名 + 各位点等位基因）
+或其 --npz 导出的二进制 profile 矩阵，
+计算样本两两之间不同等位基因的位点数（Hamming 距离），输出与
+`grapetree -m distance -x symmetric` 相同的格式（首行样本数，之后每行：样本名 距离...），
+可直接交给 5-dis→csv.py 转换。
+
+- 等位基因按列编码为整数，N/A、空值、-、? 视为缺失（编码 0）
+- --missing ignore（默认，对应 grapetree -y 0）：任一样本缺失的位点不计入距离
+  --missing allele：缺失当作一个独立的等位基因参与比较
+- 按行分块计算，每块只占用 block × 样本数 × 位点数 的内存，多块由多进程并行
+- --mst：额外输出最小生成树（Prim 算法，逐行现算距离，不需要完整矩阵），
+  写出 Newick（所有样本均为叶节点，可用 6-Grapetree可视化.R 绘制）和边表
+
+用法示例：
+  python3 5-等位基因距离.py MLST_ST_Ox.txt -j 8
+  python3 5-等位基因距离.py MLST_ST_Ox.txt -o MLST_ST_Ox.dist --mst MLST_ST_Ox.mst.nwk
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# 视为缺失的等位基因取值
+MISSING_VALUES = {'', 'N/A', 'NA', 'nan', '-', '?', '0'}
+
+BLOCK_ROWS = 256
+
+# 子进程共享的 profile 矩阵（由 _init_worker 设置）
+_PROFILES = None
+_IGNORE_MISSING = True
+
+
+def read_profiles(profile_file, scheme="oxford"):
+    """
+    读取 profile 文件，返回 (样本名列表, int32 矩阵[样本, 位点])，缺失为 0
+
+    .npz 为 5-MLST→Grapetree.py --npz 导出的二进制矩阵，按 scheme 取 oxford / pasteur
+    """
+    if str(profile_file).endswith('.npz'):
+        with np.load(profile_file) as data:
+            return data['samples'].tolist(), encode_integer_alleles(data[scheme])
+
+    df = pd.read_csv(profile_file, sep='\t', header=None, dtype=str, keep_default_na=False)
+    if df.shape[1] < 2:
+        raise ValueError(f"{profile_file} 至少需要两列（样本名 + 位点）")
+    names = df.iloc[:, 0].astype(str).tolist()
+    return names, encode_alleles(df.iloc[:, 1:])
+
+
+def encode_alleles(df_alleles):
+    """逐列把等位基因字符串编码为整数（同一列相同取值编码相同，缺失为 0）"""
+    profiles = np.zeros(df_alleles.shape, dtype=np.int32)
+    for j, col in enumerate(df_alleles.columns):
+        values = df_alleles[col].astype(str).str.strip()
+        codes, _ = pd.factorize(values.where(~values.isin(MISSING_VALUES)))
+        profiles[:, j] = codes + 1   # factorize 的缺失为 -1 → 0
+    return profiles
+
+
+def encode_integer_alleles(matrix):
+    """等位基因已是整数编号时，非正数视为缺失，其余原样保留"""
+    profiles = np.asarray(matrix, dtype=np.int32)
+    return np.where(profiles > 0, profiles, 0).astype(np.int32)
+
+
+def hamming_block(block, profiles, ignore_missing=True):
+    """计算 block 行与全部样本的距离，返回 uint16[len(block), n]"""
+    a = block[:, None, :]
+    b = profiles[None, :, :]
+    diff = a != b
+    if ignore_missing:
+        diff &= (a > 0) & (b > 0)
+    return diff.sum(axis=2, dtype=np.uint16)
+
+
+def _init_worker(profiles, ignore_missing):
+    global _PROFILES, _IGNORE_MISSING
+    _PROFILES = profiles
+    _IGNORE_MISSING = ignore_missing
+
+
+def _block_worker(bounds):
+    start, end = bounds
+    return hamming_block(_PROFILES[start:end], _PROFILES, _IGNORE_MISSING)
+
+
+def iter_distance_blocks(profiles, ignore_missing=True, block_rows=BLOCK_ROWS, jobs=1):
+    """按顺序逐块产出距离矩阵的行块"""
+    n = profiles.shape[0]
+    bounds = [(s, min(s + block_rows, n)) for s in range(0, n, block_rows)]
+    if jobs <= 1 or len(bounds) == 1:
+        for start, end in bounds:
+            yield hamming_block(profiles[start:end], profiles, ignore_missing)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(profiles, ignore_missing)) as exe:
+        # map 保证按提交顺序返回，写出时无需重排
+        yield from exe.map(_block_worker, bounds)
+
+
+def format_rows(names, dist_block):
+    """把一块距离格式化为 “样本名\\t距离\\t...” 文本行"""
+    if dist_block.size and dist_block.max() < 10:
+        # 距离都是个位数时，直接按字节拼接，避免逐个数字转字符串
+        n_cols = dist_block.shape[1]
+        buf = np.full((dist_block.shape[0], 2 * n_cols), ord('\t'), dtype=np.uint8)
+        buf[:, 1::2] = dist_block + ord('0')
+        return ''.join(f"{name}{row.tobytes().decode('ascii')}\n" for name, row in zip(names, buf))
+    return ''.join(name + '\t' + '\t'.join(map(str, row)) + '\n'
+                   for name, row in zip(names, dist_block.tolist()))
+
+
+def write_distance_matrix(names, profiles, output_file, ignore_missing=True,
+                          block_rows=BLOCK_ROWS, jobs=1):
+    """分块计算并写出 grapetree 格式的对称距离矩阵"""
+    tmp = f"{output_file}.tmp"
+    with open(tmp, 'w') as out:
+        out.write(f"{len(names)}\n")
+        start = 0
+        for block in iter_distance_blocks(profiles, ignore_missing, block_rows, jobs):
+            out.write(format_rows(names[start:start + len(block)], block))
+            start += len(block)
+    os.replace(tmp, output_file)
+
+
+def minimum_spanning_tree(profiles, ignore_missing=True):
+    """
+    Prim 算法求最小生成树，每加入一个节点只计算它到其余样本的一行距离
+
+    返回 parent 数组（根节点为 -1）和对应的边长
+    """
+    n = profiles.shape[0]
+    parent = np.full(n, -1, dtype=np.int64)
+    best = np.full(n, np.iinfo(np.int32).max, dtype=np.int64)
+    in_tree = np.zeros(n, dtype=bool)
+    current = 0
+    for _ in range(n - 1):
+        in_tree[current] = True
+        d = hamming_block(profiles[current:current + 1], profiles, ignore_missing)[0]
+        closer = ~in_tree & (d < best)
+        best[closer] = d[closer]
+        parent[closer] = current
+        candidates = np.where(in_tree, np.iinfo(np.int64).max, best)
+        current = int(np.argmin(candidates))
+    in_tree[current] = True
+    lengths = np.where(parent >= 0, best, 0)
+    return parent, lengths
+
+
+def mst_to_newick(names, parent, lengths):
+    """把生成树写成 Newick：有子节点的样本以 0 长度叶节点形式出现在自己的子树中"""
+    n = len(names)
+    children = [[] for _ in range(n)]
+    for child, p in enumerate(parent):
+        if p >= 0:
+            children[p].append(child)
+
+    # 迭代后序遍历，避免长链导致递归过深
+    text = [None] * n
+    root = int(np.flatnonzero(parent < 0)[0])
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        if not visited and children[node]:
+            stack.append((node, True))
+            stack.extend((c, False) for c in children[node])
+            continue
+        if children[node]:
+            parts = [f"{names[node]}:0"] + [f"{text[c]}:{lengths[c]}" for c in children[node]]
+            text[node] = '(' + ','.join(parts) + ')'
+        else:
+            text[node] = names[node]
+    return text[root] + ';'
+
+
+def write_mst(names, profiles, newick_file, ignore_missing=True):
+    """写出最小生成树的 Newick 和边表（<newick 前缀>.edges.tsv）"""
+    parent, lengths = minimum_spanning_tree(profiles, ignore_missing)
+    with open(newick_file, 'w') as f:
+        f.write(mst_to_newick(names, parent, lengths) + '\n')
+
+    edges_file = os.path.splitext(newick_file)[0] + '.edges.tsv'
+    child = np.flatnonzero(parent >= 0)
+    pd.DataFrame({
+        'source': [names[p] for p in parent[child]],
+        'target': [names[c] for c in child],
+        'distance': lengths[child],
+    }).to_csv(edges_file, sep='\t', index=False)
+    print(f"[INFO] 最小生成树: {newick_file}（总长度 {int(lengths.sum())}）")
+    print(f"[INFO] 生成树边表: {edges_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MLST 等位基因 Hamming 距离矩阵（grapetree distance 格式）")
+    parser.add_argument("profile_file",
+                        help="5-MLST→Grapetree.py 导出的 profile 文件（如 MLST_ST_Ox.txt）或 MLST_profiles.npz")
+    parser.add_argument("--scheme", choices=["oxford", "pasteur"], default="oxford",
+                        help="输入为 .npz 时使用的方案（默认 oxford）")
+    parser.add_argument("-o", "--output", help="输出距离文件（默认：<profile 前缀>.dist）")
+    parser.add_argument("--missing", choices=["ignore", "allele"], default="ignore",
+                        help="缺失位点的处理方式（默认 ignore，等同 grapetree -y 0）")
+    parser.add_argument("--block", type=int, default=BLOCK_ROWS, help=f"每块行数（默认 {BLOCK_ROWS}）")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="并行进程数（默认：CPU 核数）")
+    parser.add_argument("--mst", help="额外输出最小生成树 Newick 文件")
+    args = parser.parse_args()
+
+    profile_file = Path(args.profile_file)
+    if not profile_file.is_file():
+        print(f"错误：profile 文件不存在：{profile_file}")
+        sys.exit(1)
+
+    if args.output:
+        output = args.output
+    elif profile_file.suffix == '.npz':
+        output = str(profile_file.with_name(f"{profile_file.stem}_{args.scheme}.dist"))
+    else:
+        output = str(profile_file.with_suffix('.dist'))
+    jobs = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+    ignore_missing = args.missing == "ignore"
+
+    names, profiles = read_profiles(profile_file, args.scheme)
+    n_missing = int((profiles == 0).sum())
+    print(f"[INFO] {len(names)} 个样本，{profiles.shape[1]} 个位点，缺失等位基因 {n_missing} 个")
+    print(f"[INFO] 分块计算距离（每块 {args.block} 行，{jobs} 个进程）...")
+
+    write_distance_matrix(names, profiles, output, ignore_missing, max(1, args.block), jobs)
+    print(f"[INFO] 距离矩阵: {output}")
+
+    if args.mst:
+        write_mst(names, profiles, args.mst, ignore_missing)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,11 @@
 #   - OUTPUT_DIR: 输出文件保存目录
 #
 # 输出文件:
+#   - MLST_profiles.npz: Ox / Pa 两套方案的二进制 profile 矩阵（距离计算的输入）
 #   - MLST_ST_Ox.tree.nwk: Ox 类型的系统发育树 (Newick 格式)
 #   - MLST_ST_Pa.tree.nwk: Pa 类型的系统发育树 (Newick 格式)
+#   - MLST_ST_{Ox,Pa}.dist / .csv / .npy: 等位基因距离矩阵
+#   - MLST_ST_{Ox,Pa}.mst.nwk / .mst.edges.tsv: 最小生成树
 #
 # 使用方法:
 #   直接运行本脚本，无需额外参数。
@@ -26,6 +29,7 @@
 
 PYTHON_SCRIPT="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/4-注释/2-MLST/python/5-MLST→Grapetree.py"
 PYTHON_SCRIPT_2="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/4-注释/2-MLST/python/5-dis→csv.py"
+PYTHON_SCRIPT_3="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/4-注释/2-MLST/python/5-等位基因距离.py"
 MLST_FILE="/mnt/d/1-ABaumannii/MLST/分型结果/MLST_detailed_alleles.csv"
 OUTPUT_DIR="/mnt/d/1-ABaumannii/MLST/分型结果/"
 
@@ -34,7 +38,8 @@ cd ${OUTPUT_DIR}
 # 调用：输入文件 + 输出目录
 python3 "${PYTHON_SCRIPT}" \
   "${MLST_FILE}" \
-  "${OUTPUT_DIR}"
+  "${OUTPUT_DIR}" \
+  --npz
 
 
 grapetree -p "${OUTPUT_DIR}/MLST_ST_Ox.txt" \
@@ -47,22 +52,24 @@ grapetree -p "${OUTPUT_DIR}/MLST_ST_Pa.txt" \
      --heuristic harmonic \
      > "${OUTPUT_DIR}/MLST_ST_Pa.tree.nwk"
 
-grapetree -p "${OUTPUT_DIR}/MLST_ST_Ox.txt" \
-  -m distance \
-  -x symmetric -y 0 \
-  --n_proc 8 \
-  > "${OUTPUT_DIR}/MLST_ST_Ox.dist"
+# 距离矩阵由 Python 直接从 --npz 导出的 MLST_profiles.npz 计算（按 --scheme 取 Oxford / Pasteur，
+# 与 grapetree -m distance -x symmetric -y 0 输出格式相同）
+python3 "${PYTHON_SCRIPT_3}" \
+  "${OUTPUT_DIR}/MLST_profiles.npz" --scheme oxford \
+  -o "${OUTPUT_DIR}/MLST_ST_Ox.dist" \
+  --mst "${OUTPUT_DIR}/MLST_ST_Ox.mst.nwk" \
+  -j 8
 
-grapetree -p "${OUTPUT_DIR}/MLST_ST_Pa.txt" \
-  -m distance \
-  -x symmetric -y 0 \
-  --n_proc 8 \
-  > "${OUTPUT_DIR}/MLST_ST_Pa.dist"
+python3 "${PYTHON_SCRIPT_3}" \
+  "${OUTPUT_DIR}/MLST_profiles.npz" --scheme pasteur \
+  -o "${OUTPUT_DIR}/MLST_ST_Pa.dist" \
+  --mst "${OUTPUT_DIR}/MLST_ST_Pa.mst.nwk" \
+  -j 8
 
 python3 "${PYTHON_SCRIPT_2}" \
-     "${OUTPUT_DIR}/MLST_ST_Ox.dist"
+     "${OUTPUT_DIR}/MLST_ST_Ox.dist" --npy
 
 python3 "${PYTHON_SCRIPT_2}" \
-     "${OUTPUT_DIR}/MLST_ST_Pa.dist"
+     "${OUTPUT_DIR}/MLST_ST_Pa.dist" --npy
 
 
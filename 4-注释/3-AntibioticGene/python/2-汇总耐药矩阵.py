@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+汇总 1-AMRfinder.sh 的逐样本结果（<样本>_AMRFinder.tsv），生成整个队列的耐药矩阵
+
+- 逐样本表用 ProcessPoolExecutor 并行流式读取；兼容 AMRFinderPlus 3.x（Gene symbol / Sequence name）
+  和 4.x（Element symbol / Element name）的列名
+- 规范化：基因符号去空白，类别/亚类转大写，'NA' 视为缺失；组合类别（如 AMINOGLYCOSIDE/QUINOLONE）拆分后分别计入
+- 基因和药物类别编码为整数（分类编码），输出与 scipy.sparse.save_npz 兼容的压缩稀疏矩阵：
+    AMR_gene_matrix.npz   样本 × 基因 的拷贝数
+    AMR_class_matrix.npz  样本 × 药物类别 的命中基因数
+  行列标签保存在同一文件的 samples / genes（或 classes）数组中：
+    m = scipy.sparse.load_npz(path)
+    labels = np.load(path); labels['samples'], labels['genes']
+- 增量更新：所有命中汇总在 AMR_hits.tsv.gz（长表），每个样本的文件签名（大小 + 修改时间）记录在 AMR_samples.tsv；
+  再次运行时只读取新增或变化的样本，已删除的样本从结果中移除，然后由长表重建矩阵
+
+用法:
+  python3 2-汇总耐药矩阵.py /mnt/d/1-鲍曼菌/抗生素耐药 -o /mnt/d/1-鲍曼菌/抗生素耐药/汇总 [-j 8] [--tsv]
+  python3 2-汇总耐药矩阵.py ... --element-types AMR          # 只统计 AMR 基因（不含 STRESS / METAL / VIRULENCE）
+"""
+
+import os
+import sys
+import csv
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+# 共用的 CSR 稀疏矩阵写出（8-流程调度/python/稀疏矩阵.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 稀疏矩阵 import save_sparse
+
+SUFFIX = '_AMRFinder.tsv'
+HITS_FILE = 'AMR_hits.tsv.gz'
+SAMPLES_FILE = 'AMR_samples.tsv'
+
+# 规范列名 -> AMRFinderPlus 各版本可能的列名
+COLUMN_ALIASES = {
+    'protein_id': ('Protein identifier', 'Protein id'),
+    'contig': ('Contig id',),
+    'start': ('Start',),
+    'stop': ('Stop',),
+    'strand': ('Strand',),
+    'gene': ('Gene symbol', 'Element symbol'),
+    'name': ('Sequence name', 'Element name'),
+    'scope': ('Scope',),
+    'element_type': ('Element type', 'Type'),
+    'element_subtype': ('Element subtype', 'Subtype'),
+    'class': ('Class',),
+    'subclass': ('Subclass',),
+    'method': ('Method',),
+    'coverage': ('% Coverage of reference sequence', '% Coverage of reference'),
+    'identity': ('% Identity to reference sequence', '% Identity to reference'),
+}
+HIT_COLUMNS = ['sample', *COLUMN_ALIASES]
+MISSING = {'', 'NA', 'N/A', 'na'}
+
+
+def sample_name(path):
+    name = Path(path).name
+    return name[:-len(SUFFIX)] if name.endswith(SUFFIX) else Path(path).stem
+
+
+def signature(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def normalize(field, value):
+    value = value.strip()
+    if value in MISSING:
+        return ''
+    if field in ('class', 'subclass', 'element_type', 'element_subtype', 'scope'):
+        return value.upper()
+    return value
+
+
+def parse_amrfinder(path):
+    """读取一个样本的 AMRFinder 表，返回 (样本名, 签名, [规范化后的行])"""
+    sample = sample_name(path)
+    rows = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader, None)
+        if header is not None:
+            position = {}
+            for field, aliases in COLUMN_ALIASES.items():
+                for alias in aliases:
+                    if alias in header:
+                        position[field] = header.index(alias)
+                        break
+            if 'gene' not in position:
+                raise ValueError(f"{path} 缺少 Gene symbol / Element symbol 列")
+            for row in reader:
+                if not row:
+                    continue
+                rows.append([sample] + [normalize(field, row[position[field]])
+                                        if field in position and position[field] < len(row) else ''
+                                        for field in COLUMN_ALIASES])
+    return sample, signature(path), rows
+
+
+def read_state(out_dir):
+    """已有的长表和样本签名；不存在时返回空表"""
+    hits_path, samples_path = out_dir / HITS_FILE, out_dir / SAMPLES_FILE
+    if not (hits_path.exists() and samples_path.exists()):
+        return pd.DataFrame(columns=HIT_COLUMNS), {}
+    hits = pd.read_csv(hits_path, sep='\t', dtype=str, keep_default_na=False)
+    samples = pd.read_csv(samples_path, sep='\t', dtype=str, keep_default_na=False)
+    return hits, dict(zip(samples['sample'], samples['signature']))
+
+
+def write_atomic_table(df, path, **kwargs):
+    tmp = path.with_name(path.name + '.tmp')
+    df.to_csv(tmp, sep='\t', index=False, **kwargs)
+    os.replace(tmp, path)
+
+
+def build_matrices(hits, samples, out_dir, element_types=None, write_tsv=False):
+    """由长表生成 样本 × 基因 / 样本 × 药物类别 矩阵，返回 (基因数, 类别数)"""
+    df = hits[hits['gene'] != '']
+    if element_types:
+        df = df[df['element_type'].isin(element_types)]
+
+    sample_cat = pd.Categorical(df['sample'], categories=samples)
+
+    # 样本 × 基因：同一样本同一基因出现多次（多拷贝）时计数
+    gene_cat = pd.Categorical(df['gene'])
+    counts = pd.DataFrame({'s': sample_cat.codes, 'g': gene_cat.codes}).value_counts().reset_index(name='n')
+    shape = (len(samples), len(gene_cat.categories))
+    save_sparse(out_dir / 'AMR_gene_matrix.npz', counts['s'].to_numpy(), counts['g'].to_numpy(),
+                counts['n'].to_numpy(dtype=np.int32), shape,
+                samples=np.array(samples, dtype=str), genes=np.array(gene_cat.categories, dtype=str))
+
+    # 样本 × 药物类别：组合类别拆分，记录该类别下不同基因的个数
+    classes = df.loc[df['class'] != '', ['sample', 'gene', 'class']].copy()
+    classes['class'] = classes['class'].str.split('/')
+    classes = classes.explode('class').drop_duplicates()
+    class_cat = pd.Categorical(classes['class'])
+    class_counts = pd.DataFrame({'s': pd.Categorical(classes['sample'], categories=samples).codes,
+                                 'c': class_cat.codes}).value_counts().reset_index(name='n')
+    class_shape = (len(samples), len(class_cat.categories))
+    save_sparse(out_dir / 'AMR_class_matrix.npz', class_counts['s'].to_numpy(), class_counts['c'].to_numpy(),
+                class_counts['n'].to_numpy(dtype=np.int32), class_shape,
+                samples=np.array(samples, dtype=str), classes=np.array(class_cat.categories, dtype=str))
+
+    if write_tsv:
+        for name, frame, col in (('AMR_gene_matrix.tsv', counts.rename(columns={'g': 'c'}), gene_cat.categories),
+                                 ('AMR_class_matrix.tsv', class_counts, class_cat.categories)):
+            dense = np.zeros((len(samples), len(col)), dtype=np.int32)
+            dense[frame['s'].to_numpy(), frame['c'].to_numpy()] = frame['n'].to_numpy()
+            table = pd.DataFrame(dense, index=pd.Index(samples, name='sample'), columns=list(col))
+            tmp = out_dir / f"{name}.tmp"
+            table.to_csv(tmp, sep='\t')
+            os.replace(tmp, out_dir / name)
+    return shape[1], class_shape[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总 AMRFinderPlus 逐样本结果为队列耐药矩阵（增量）")
+    parser.add_argument('input_dir', help='1-AMRfinder.sh 的输出目录（<样本>_AMRFinder.tsv）')
+    parser.add_argument('-o', '--output', help='输出目录（默认：<input_dir>/汇总）')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='并行进程数（默认：CPU 核数）')
+    parser.add_argument('--element-types', nargs='*', type=str.upper,
+                        help='矩阵只统计这些 Element type（如 AMR STRESS），默认全部')
+    parser.add_argument('--tsv', action='store_true', help='同时写出稠密矩阵 TSV（样本多时文件较大）')
+    parser.add_argument('--force', action='store_true', help='忽略已有结果，全部重新读取')
+    args = parser.parse_args()
+
+    input_dir = Path(args.input_dir)
+    if not input_dir.is_dir():
+        print(f"错误：输入目录不存在：{input_dir}")
+        sys.exit(1)
+    out_dir = Path(args.output) if args.output else input_dir / '汇总'
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    files = {sample_name(p): p for p in sorted(input_dir.glob(f"*{SUFFIX}"))}
+    if not files:
+        print(f"[WARN] {input_dir} 下没有 *{SUFFIX}")
+        sys.exit(1)
+
+    hits, known = (pd.DataFrame(columns=HIT_COLUMNS), {}) if args.force else read_state(out_dir)
+    todo = [p for s, p in files.items() if known.get(s) != signature(p)]
+    removed = [s for s in known if s not in files]
+    keep = hits[~hits['sample'].isin(set(removed) | {sample_name(p) for p in todo})]
+    print(f"[INFO] 样本 {len(files)} 个：需读取 {len(todo)} 个，未变化 {len(files) - len(todo)} 个，移除 {len(removed)} 个")
+
+    signatures = {s: known[s] for s in files if s in known}
+    new_rows, failed = [], []
+    if todo:
+        workers = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = {pool.submit(parse_amrfinder, str(p)): p for p in todo}
+            for fut in as_completed(futures):
+                try:
+                    sample, sig, rows = fut.result()
+                except (OSError, ValueError) as e:
+                    print(f"[ERROR] {futures[fut]}：{e}")
+                    failed.append(sample_name(futures[fut]))
+                    continue
+                signatures[sample] = sig
+                new_rows.extend(rows)
+
+    # 读取失败的样本不记录签名，下次运行时重试
+    samples = sorted(s for s in files if s in signatures)
+    hits = pd.concat([keep, pd.DataFrame(new_rows, columns=HIT_COLUMNS)], ignore_index=True)
+    hits = hits[hits['sample'].isin(samples)].sort_values(
+        ['sample', 'contig', 'start'], kind='stable',
+        key=lambda col: pd.to_numeric(col, errors='coerce') if col.name == 'start' else col)
+    write_atomic_table(hits, out_dir / HITS_FILE, compression='gzip')
+
+    n_genes, n_classes = build_matrices(hits, samples, out_dir, args.element_types, args.tsv)
+    # 签名最后写入：中途失败时下次会重新读取
+    write_atomic_table(pd.DataFrame({'sample': samples, 'signature': [signatures[s] for s in samples]}),
+                       out_dir / SAMPLES_FILE)
+
+    print(f"[INFO] 命中 {len(hits)} 条；矩阵 {len(samples)} 样本 × {n_genes} 基因 / {n_classes} 药物类别")
+    print(f"[INFO] 结果目录：{out_dir}")
+    if failed:
+        print(f"[ERROR] {len(failed)} 个样本读取失败：{', '.join(failed[:10])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
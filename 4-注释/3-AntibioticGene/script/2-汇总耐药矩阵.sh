@@ -0,0 +1,13 @@
+#!/bin/bash
+# 汇总 1-AMRfinder.sh 的逐样本结果：样本 × 基因、样本 × 药物类别 稀疏矩阵（.npz）和命中长表
+# 重复运行时只读取新增或变化的样本
+
+AMR_DIR="/mnt/d/1-鲍曼菌/抗生素耐药"
+OUT_DIR="/mnt/d/1-鲍曼菌/抗生素耐药/汇总"
+PYTHON_SCRIPT="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/4-注释/3-AntibioticGene/python/2-汇总耐药矩阵.py"
+
+python3 "$PYTHON_SCRIPT" \
+    "$AMR_DIR" \
+    -o "$OUT_DIR" \
+    -j 8 \
+    --tsv
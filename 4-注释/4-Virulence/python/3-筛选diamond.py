@@ -17,6 +17,16 @@ from pathlib import Path
 from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 
+
+# 共用的模块加载函数（8-流程调度/python/模块加载.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+
+profiling = load_module('8-流程调度/python/3-性能记录.py')
+
 # 映射 DIAMOND outfmt=6 的列（header=None 时的整数列 -> 名称）
 # DIAMOND 默认输出格式只有12列，不包含 stitle
 COL_MAP = {
@@ -33,14 +43,42 @@ def process_file(in_path: Path, out_dir: Path) -> str:
     """
     处理单个 tsv 文件，写入 out_dir/{basename}.txt
     返回写入的输出路径（字符串），若跳过则返回空字符串。
+    开启性能记录时（--profile / AB_PROFILE），每个文件的 parse / filter / write 各记一行。
     """
-    try:
-        # 支持压缩文件（pandas 会根据后缀自动推断）
-        # 注意：假设文件为无表头的 DIAMOND outfmt=6（12 列）
-        df = pd.read_csv(in_path, sep='\t', header=None, compression='infer', dtype=str, low_memory=False)
-    except Exception as e:
-        return f"ERROR: 读取 {in_path} 失败: {e}"
+    prof = profiling.Profiler('3-筛选diamond.py', file=in_path.name)
+    with prof.phase('parse') as ph:
+        try:
+            # 支持压缩文件（pandas 会根据后缀自动推断）
+            # 注意：假设文件为无表头的 DIAMOND outfmt=6（12 列）
+            df = pd.read_csv(in_path, sep='\t', header=None, compression='infer', dtype=str, low_memory=False)
+        except Exception as e:
+            return f"ERROR: 读取 {in_path} 失败: {e}"
+        ph.items = len(df)
+    with prof.phase('filter') as ph:
+        out_df = filter_hits(df)
+        ph.items = len(out_df)
+
+    # 准备输出路径
+    base = in_path.name
+    # 移除常见的复合后缀 .tsv.gz -> 则得到 basename 去掉 .tsv(.gz)
+    for ext in ('.tsv.gz', '.tsv', '.txt.gz', '.txt'):
+        if base.endswith(ext):
+            base = base[: -len(ext)]
+            break
+    out_path = out_dir / f"{base}.txt"
+
+    # 写入（包含表头，与原行为一致），制表符分隔
+    with prof.phase('write') as ph:
+        try:
+            out_df.to_csv(out_path, sep='\t', index=False)
+            ph.items = len(out_df)
+            return str(out_path)
+        except Exception as e:
+            return f"ERROR: 写入 {out_path} 失败: {e}"
+
 
+def filter_hits(df):
+    """按 identity / query coverage 阈值过滤，返回去重后的 qseqid, sseqid"""
     # 检查列数，DIAMOND 默认输出 12 列
     expected_cols = 12
     if df.shape[1] < expected_cols:
@@ -71,23 +109,7 @@ def process_file(in_path: Path, out_dir: Path) -> str:
 
     # 选择并去重：qseqid, sseqid（DIAMOND 默认不输出 stitle）
     # 由于没有 stitle，我们只输出 qseqid 和 sseqid
-    out_df = filtered.loc[:, ['qseqid', 'sseqid']].drop_duplicates()
-
-    # 准备输出路径
-    base = in_path.name
-    # 移除常见的复合后缀 .tsv.gz -> 则得到 basename 去掉 .tsv(.gz)
-    for ext in ('.tsv.gz', '.tsv', '.txt.gz', '.txt'):
-        if base.endswith(ext):
-            base = base[: -len(ext)]
-            break
-    out_path = out_dir / f"{base}.txt"
-
-    # 写入（包含表头，与原行为一致），制表符分隔
-    try:
-        out_df.to_csv(out_path, sep='\t', index=False)
-        return str(out_path)
-    except Exception as e:
-        return f"ERROR: 写入 {out_path} 失败: {e}"
+    return filtered.loc[:, ['qseqid', 'sseqid']].drop_duplicates()
 
 def gather_input_files(input_path: Path):
     """
@@ -109,7 +131,11 @@ def main():
     parser.add_argument('input', help='输入文件（.tsv）或包含多个 .tsv 的目录')
     parser.add_argument('outdir', help='输出目录（会自动创建）')
     parser.add_argument('-j', '--jobs', type=int, default=0, help='并发作业数，0 或省略表示使用 CPU 核心数')
+    parser.add_argument('--profile', metavar='JSONL',
+                        help=f'把各阶段耗时/内存追加写入该文件（也可用环境变量 {profiling.PROFILE_ENV}）')
     args = parser.parse_args()
+    # 在创建进程池之前写入环境变量，worker 继承后同样记录
+    profiling.enable(args.profile)
 
     in_path = Path(args.input).expanduser()
     out_dir = Path(args.outdir).expanduser()
@@ -124,7 +150,9 @@ def main():
     print(f"[INFO] 发现 {len(files)} 个文件，将使用 {max_workers} 个 worker 并行处理...")
 
     results = []
-    with ProcessPoolExecutor(max_workers=max_workers) as exe:
+    # total 记录整批运行，CPU 时间包括进程池 worker
+    with profiling.Profiler('3-筛选diamond.py', files=len(files)), \
+            ProcessPoolExecutor(max_workers=max_workers) as exe:
         future_to_path = {exe.submit(process_file, p, out_dir): p for p in files}
         for future in as_completed(future_to_path):
             p = future_to_path[future]
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+为筛选后的毒力因子命中补充注释，合并为整个队列的一张表
+
+3-筛选diamond.py 只输出 qseqid / sseqid（DIAMOND 默认格式没有 stitle），查看结果时还要再去 grep
+VFDB 和 Prokka 文件。这里一次性预加载两个索引后做哈希连接：
+- VFDB 序列头索引：解析 VFDB 蛋白 FASTA 的序列头（VFG 编号、基因名、描述、VF 名称/编号、类别、来源菌株），
+  缓存为 <FASTA>.headers.tsv，FASTA 未更新时直接读取缓存
+- Prokka 基因目录（4-注释/1-prokka/python/3-基因目录.py build 生成）：按 (样本, locus_tag) 批量取
+  contig、起止位置、链、基因名和产物
+- 所有样本的命中先合并，再各做一次连接，不逐个文件查找
+
+输入的样本名取自文件名 <样本>_vs_VFDB.txt。
+
+用法:
+  python3 4-注释毒力结果.py /mnt/d/1-ABaumannii/毒力因子/阈值 -o VFDB_hits_annotated.tsv \\
+      -c /mnt/d/1-ABaumannii/注释prokka/gene_catalog.sqlite
+"""
+
+import os
+import re
+import sys
+import csv
+import argparse
+from pathlib import Path
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / 'data'
+SUFFIX = '_vs_VFDB.txt'
+
+# >VFG037176(gb|WP_001081735) (plc1) phospholipase C [Phospholipase C (VF0470) - Exotoxin (VFC0235)] [Acinetobacter baumannii ACICU]
+HEADER_RE = re.compile(
+    r'^(?P<vfg_id>VFG\d+)(?:\((?P<accession>[^)]*)\))?\s*'
+    r'(?:\((?P<vf_gene>[^)]*)\)\s*)?'
+    r'(?P<vf_description>.*?)\s*'
+    r'(?:\[(?P<vf_name>.*) \((?P<vf_id>VF\d+)\) - (?P<vf_category>.*) \((?P<vfc_id>VFC\d+)\)\]\s*)?'
+    r'(?:\[(?P<organism>[^\]]*)\])?\s*$'
+)
+VFDB_COLUMNS = ['sseqid', 'vfg_id', 'accession', 'vf_gene', 'vf_description', 'vf_name', 'vf_id',
+                'vf_category', 'vfc_id', 'organism']
+PROKKA_COLUMNS = ['contig', 'start', 'end', 'strand', 'gene', 'product']
+OUTPUT_COLUMNS = ['sample', 'qseqid', 'contig', 'start', 'end', 'strand', 'prokka_gene', 'prokka_product',
+                  'sseqid', 'vfg_id', 'vf_gene', 'vf_description', 'vf_name', 'vf_id', 'vf_category',
+                  'vfc_id', 'organism']
+
+
+# 共用的模块加载函数（8-流程调度/python/模块加载.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+
+
+def parse_header(header):
+    """VFDB 序列头（不含 '>'）-> 字段 dict；格式不符时只保留 ID 和整段描述"""
+    sseqid, _, rest = header.partition(' ')
+    match = HEADER_RE.match(header)
+    if match is None:
+        fields = dict.fromkeys(VFDB_COLUMNS[1:], '')
+        fields['vf_description'] = rest
+    else:
+        fields = {k: v or '' for k, v in match.groupdict().items()}
+    fields['sseqid'] = sseqid
+    return fields
+
+
+def build_header_index(fasta):
+    """读取（或重建）<FASTA>.headers.tsv，返回 DataFrame"""
+    fasta = Path(fasta)
+    cache = Path(f"{fasta}.headers.tsv")
+    if cache.exists() and cache.stat().st_mtime >= fasta.stat().st_mtime:
+        return pd.read_csv(cache, sep='\t', dtype=str, keep_default_na=False)
+    rows = []
+    with open(fasta, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line.startswith('>'):
+                rows.append(parse_header(line[1:].strip()))
+    df = pd.DataFrame(rows, columns=VFDB_COLUMNS)
+    tmp = f"{cache}.tmp"
+    try:
+        df.to_csv(tmp, sep='\t', index=False)
+        os.replace(tmp, cache)
+    except OSError as e:
+        # 数据库目录只读时不缓存
+        print(f"[WARN] 无法写入序列头索引缓存 {cache}：{e}")
+    return df
+
+
+def load_vfdb_index(fastas):
+    """合并多个 VFDB FASTA 的序列头索引，同一 sseqid 保留第一次出现的"""
+    frames = [build_header_index(f) for f in fastas]
+    return pd.concat(frames, ignore_index=True).drop_duplicates('sseqid')
+
+
+def read_hits(input_path):
+    """读取全部 <样本>_vs_VFDB.txt（qseqid, sseqid），返回带 sample 列的 DataFrame"""
+    input_path = Path(input_path)
+    files = [input_path] if input_path.is_file() else sorted(input_path.glob(f"*{SUFFIX}"))
+    rows = []
+    for path in files:
+        sample = path.name[:-len(SUFFIX)] if path.name.endswith(SUFFIX) else path.stem
+        with open(path, 'r', encoding='utf-8') as f:
+            reader = csv.reader(f, delimiter='\t')
+            header = next(reader, None)
+            if header is None:
+                continue
+            q, s = header.index('qseqid'), header.index('sseqid')
+            rows.extend((sample, row[q], row[s]) for row in reader if len(row) > max(q, s))
+    return pd.DataFrame(rows, columns=['sample', 'qseqid', 'sseqid']), len(files)
+
+
+def prokka_annotations(hits, catalog_path):
+    """从基因目录批量取命中基因的 Prokka 注释，返回可与 hits 按 (sample, qseqid) 连接的 DataFrame"""
+    catalog_module = load_module('4-注释/1-prokka/python/3-基因目录.py')
+    pairs = list(zip(hits['sample'], hits['qseqid']))
+    with catalog_module.GeneCatalog(catalog_path) as cat:
+        found = cat.lookup(pairs)
+    rows = [{'sample': sample, 'qseqid': locus_tag, **{c: gene[c] for c in PROKKA_COLUMNS}}
+            for (sample, locus_tag), gene in found.items()]
+    df = pd.DataFrame(rows, columns=['sample', 'qseqid', *PROKKA_COLUMNS])
+    return df.rename(columns={'gene': 'prokka_gene', 'product': 'prokka_product'})
+
+
+def annotate(hits, vfdb, prokka=None):
+    """两次哈希连接（pandas merge）：VFDB 按 sseqid，Prokka 按 (sample, qseqid)"""
+    out = hits.merge(vfdb, on='sseqid', how='left')
+    if prokka is not None:
+        out = out.merge(prokka, on=['sample', 'qseqid'], how='left')
+    # 不给基因目录时 Prokka 列整列缺失，填 NA（写出为空），start / end 仍可转为 Int64
+    for col in OUTPUT_COLUMNS:
+        if col not in out.columns:
+            out[col] = pd.NA
+    out = out[OUTPUT_COLUMNS]
+    for col in ('start', 'end'):
+        out[col] = out[col].astype('Int64')
+    return out.sort_values(['sample', 'contig', 'start', 'qseqid'], kind='stable', na_position='last')
+
+
+def default_vfdb():
+    combined = DATA_DIR / 'VFDB_2022_pro_combined.faa'
+    if combined.exists():
+        return [str(combined)]
+    return [str(p) for p in (DATA_DIR / 'VFDB_setA_pro.fas', DATA_DIR / 'VFDB_setB_pro.fas') if p.exists()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为筛选后的 VFDB 命中补充 VFDB 描述和 Prokka 产物/坐标，合并为一张表")
+    parser.add_argument('input', help='3-筛选diamond.py 的输出目录（<样本>_vs_VFDB.txt）或单个文件')
+    parser.add_argument('-o', '--output', required=True, help='输出表（TSV）')
+    parser.add_argument('-v', '--vfdb', nargs='+', default=default_vfdb(),
+                        help='VFDB 蛋白 FASTA（默认：data/ 下的合并库或 setA/setB）')
+    parser.add_argument('-c', '--catalog', help='Prokka 基因目录（gene_catalog.sqlite）；不给时不补充 Prokka 注释')
+    args = parser.parse_args()
+
+    missing = [p for p in [args.input, *args.vfdb] + ([args.catalog] if args.catalog else []) if not os.path.exists(p)]
+    if not args.vfdb:
+        missing.append('VFDB FASTA')
+    if missing:
+        print(f"错误：输入不存在：{', '.join(missing)}")
+        sys.exit(1)
+
+    hits, n_files = read_hits(args.input)
+    print(f"[INFO] 读取 {n_files} 个文件，命中 {len(hits)} 条")
+    vfdb = load_vfdb_index(args.vfdb)
+    print(f"[INFO] VFDB 序列头 {len(vfdb)} 条")
+    prokka = prokka_annotations(hits, args.catalog) if args.catalog else None
+    if prokka is not None:
+        print(f"[INFO] 基因目录中找到 {len(prokka)}/{len(hits.drop_duplicates(['sample', 'qseqid']))} 个命中基因")
+
+    out = annotate(hits, vfdb, prokka)
+    unknown = int((out['vfg_id'].fillna('') == '').sum())
+    if unknown:
+        print(f"[WARN] {unknown} 条命中的 sseqid 不在 VFDB 序列头索引中")
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{args.output}.tmp"
+    out.to_csv(tmp, sep='\t', index=False)
+    os.replace(tmp, args.output)
+    print(f"[INFO] 已写出 {len(out)} 行：{args.output}")
+
+
+if __name__ == '__main__':
+    main()
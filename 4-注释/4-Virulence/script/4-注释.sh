@@ -0,0 +1,16 @@
+#!/usr/bin/env bash
+
+# 为 3-筛选.sh 的结果补充 VFDB 描述和 Prokka 产物/坐标，合并为一张表
+# 需先运行 4-注释/1-prokka/script/3-基因目录.sh 建立基因目录
+
+INPUT_DIR="/mnt/d/1-鲍曼菌/毒力因子/阈值"
+OUT_FILE="/mnt/d/1-鲍曼菌/毒力因子/VFDB_hits_annotated.tsv"
+CATALOG="/mnt/d/1-ABaumannii/注释prokka/gene_catalog.sqlite"
+VFDB_FASTA="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/4-注释/4-Virulence/data/VFDB_2022_pro_combined.faa"
+PYTHON_SCRIPT="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/4-注释/4-Virulence/python/4-注释毒力结果.py"
+
+python3 "$PYTHON_SCRIPT" \
+    "$INPUT_DIR" \
+    -o "$OUT_FILE" \
+    -v "$VFDB_FASTA" \
+    -c "$CATALOG"
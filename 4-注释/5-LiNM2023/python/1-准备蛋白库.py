@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+准备生物杀灭剂抗性蛋白库：按 locus_tag 列表从 RefSeq 注释中提取 CDS 并翻译，写出 biocide_resistance.translated.faa
+
+替代 script/1-准备蛋白库.sh 中的 grep -F -f、多次 awk 和 seqkit translate：
+- GFF 只解析一次，建立 locus_tag / old_locus_tag -> CDS 的索引（多段 CDS，如核糖体移码的 prfB，按 ID 合并）
+- CDS 序列的来源（二选一）：
+    --cds <GCF_xxx_CDS.fna>：按序列头中的 [locus_tag=...] 建立字典查找，序列头原样保留
+    默认：按 GFF 坐标从基因组 FASTA 截取（负链取反向互补），序列头按 NCBI cds_from_genomic 的格式生成
+- 在进程内翻译（与 seqkit translate --frame 1 一致：从第 1 位翻译，终止密码子输出 *，末尾不足 3 个碱基的部分忽略）
+- 输出先写临时文件再替换，同时写出每个请求 ID 的对应关系表
+
+用法:
+  python3 1-准备蛋白库.py -g data/GCF_900088705.1.gff -f data/GCF_900088705.1.fasta \\
+      -l conf/loci_tag.txt -o data/biocide_resistance.translated.faa
+  # -l all 提取全部 CDS；换用其它 RefSeq GFF / 基因组即可构建自定义蛋白库
+"""
+
+import os
+import re
+import sys
+import argparse
+from pathlib import Path
+from urllib.parse import unquote
+from collections import OrderedDict
+from Bio import SeqIO
+from Bio.Seq import Seq
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / 'data'
+CONF_DIR = BASE_DIR / 'conf'
+
+LOCUS_TAG_RE = re.compile(r'\[locus_tag=([^\]]+)\]')
+FRAME_RE = re.compile(r'\[frame=(\d)\]')
+LINE_WIDTH = 60
+
+
+class CdsFeature:
+    """一个 CDS（可能由多段组成），坐标为 GFF 的 1-based 闭区间"""
+
+    def __init__(self, seqid, strand, attrs, index):
+        self.seqid = seqid
+        self.strand = strand
+        self.attrs = attrs
+        self.index = index            # 在 GFF 中的 CDS 序号（NCBI lcl| 序列名末尾的编号）
+        self.parts = []               # [(start, end, phase), ...]
+        self.start_partial = 'start_range' in attrs
+        self.end_partial = 'end_range' in attrs
+
+    @property
+    def locus_tag(self):
+        return self.attrs.get('locus_tag', '')
+
+    @property
+    def phase(self):
+        """5' 端那一段的 phase（负链为坐标最大的一段）"""
+        parts = sorted(self.parts)
+        first = parts[0] if self.strand != '-' else parts[-1]
+        return first[2]
+
+    def location(self):
+        parts = sorted(self.parts)
+        spans = [f"{s}..{e}" for s, e, _ in parts]
+        if self.start_partial:
+            spans[0] = '<' + spans[0]
+        if self.end_partial:
+            left, right = spans[-1].split('..')
+            spans[-1] = f"{left}..>{right}"
+        loc = spans[0] if len(spans) == 1 else f"join({','.join(spans)})"
+        return f"complement({loc})" if self.strand == '-' else loc
+
+    def partial(self):
+        five, three = (self.start_partial, self.end_partial) if self.strand != '-' \
+            else (self.end_partial, self.start_partial)
+        return ','.join(p for p, flag in (("5'", five), ("3'", three)) if flag)
+
+    def header(self):
+        """NCBI cds_from_genomic 风格的序列头"""
+        a = self.attrs
+        name = a.get('protein_id') or self.locus_tag
+        fields = [('gene', a.get('gene')), ('locus_tag', a.get('locus_tag')), ('protein', a.get('product')),
+                  ('exception', a.get('exception')), ('protein_id', a.get('protein_id')),
+                  ('pseudo', a.get('pseudo')),
+                  ('frame', str(self.phase + 1) if self.phase else None),
+                  ('partial', self.partial() or None), ('location', self.location()), ('gbkey', 'CDS')]
+        tags = ' '.join(f"[{k}={v}]" for k, v in fields if v)
+        return f"lcl|{self.seqid}_cds_{name}_{self.index} {tags}"
+
+    def extract(self, genome):
+        """5'→3' 的核酸序列，已去掉 5' 端 phase 个碱基（从第一个完整密码子开始）"""
+        seq = genome[self.seqid]
+        nt = ''.join(seq[s - 1:e] for s, e, _ in sorted(self.parts))
+        if self.strand == '-':
+            nt = str(Seq(nt).reverse_complement())
+        return nt[self.phase:]
+
+
+def parse_attributes(column):
+    """
+    解析 GFF 第 9 列，返回 (属性字典, 没有键名的值列表)
+
+    部分 RefSeq 假基因的 CDS 行末尾带有不含键名的旧 locus_tag（如 ...;transl_table=11;BAL062_01082），
+    原脚本用 grep -F 整行匹配时能找到它们，这里同样作为别名
+    """
+    attrs, bare = {}, []
+    for item in column.strip().split(';'):
+        if '=' in item:
+            key, value = item.split('=', 1)
+            attrs[key] = unquote(value)
+        elif item:
+            bare.append(unquote(item))
+    return attrs, bare
+
+
+class GffIndex:
+    """一次解析 GFF：CDS 按 locus_tag 索引，并记录 old_locus_tag / 基因 ID 到 locus_tag 的别名"""
+
+    def __init__(self, gff_file):
+        self.cds = OrderedDict()     # locus_tag -> CdsFeature
+        self.aliases = {}            # old_locus_tag / gene ID -> locus_tag
+        self.old_tags = {}           # locus_tag -> old_locus_tag（通常在基因行上）
+        by_id = {}
+        with open(gff_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('##FASTA'):
+                    break
+                if line.startswith('#') or not line.strip():
+                    continue
+                cols = line.rstrip('\n').split('\t')
+                if len(cols) != 9:
+                    continue
+                ftype = cols[2]
+                attrs, bare = parse_attributes(cols[8])
+                locus_tag = attrs.get('locus_tag')
+                if not locus_tag:
+                    continue
+                old_tags = [t for t in attrs.get('old_locus_tag', '').split(',') + bare if t]
+                for old in old_tags:
+                    self.aliases.setdefault(old, locus_tag)
+                if old_tags:
+                    self.old_tags.setdefault(locus_tag, ','.join(old_tags))
+                if ftype == 'CDS':
+                    key = attrs.get('ID') or locus_tag
+                    feature = by_id.get(key)
+                    if feature is None:
+                        feature = CdsFeature(cols[0], cols[6], attrs, len(by_id) + 1)
+                        by_id[key] = feature
+                        self.cds.setdefault(locus_tag, feature)
+                    else:
+                        # 多段 CDS 的末段可能带 end_range 等属性
+                        feature.start_partial |= 'start_range' in attrs
+                        feature.end_partial |= 'end_range' in attrs
+                    phase = int(cols[7]) if cols[7].isdigit() else 0
+                    feature.parts.append((int(cols[3]), int(cols[4]), phase))
+                elif 'ID' in attrs:
+                    self.aliases.setdefault(attrs['ID'], locus_tag)
+
+    def resolve(self, name):
+        """请求的 ID（新/旧 locus_tag 或基因 ID）-> locus_tag；找不到时返回 None"""
+        if name in self.cds:
+            return name
+        return self.aliases.get(name)
+
+
+def read_ids(path):
+    """每行一个 ID（取第一列），跳过空行、# 注释和表头"""
+    ids = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            ids.append(line.split()[0])
+    if ids and ids[0].lower() in ('loci_tag', 'locus_tag', 'id'):
+        ids = ids[1:]
+    return ids
+
+
+def read_cds_fasta(path):
+    """
+    GCF_xxx_CDS.fna：locus_tag -> (序列头, 核酸序列)；同一 locus_tag 只取第一条
+
+    序列头带 [frame=N] 的（5' 端不完整的 CDS）去掉前 N-1 个碱基，与按坐标截取时一致
+    """
+    records = {}
+    for record in SeqIO.parse(path, 'fasta'):
+        match = LOCUS_TAG_RE.search(record.description)
+        if match and match.group(1) not in records:
+            frame = FRAME_RE.search(record.description)
+            offset = int(frame.group(1)) - 1 if frame else 0
+            records[match.group(1)] = (record.description, str(record.seq)[offset:])
+    return records
+
+
+def translate(nt):
+    """按 seqkit translate 默认行为翻译第 1 读码框"""
+    nt = nt[:len(nt) // 3 * 3]
+    return str(Seq(nt).translate(table=11))
+
+
+def write_fasta(records, output):
+    tmp = f"{output}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for header, seq in records:
+            f.write(f">{header}\n")
+            for i in range(0, len(seq), LINE_WIDTH):
+                f.write(seq[i:i + LINE_WIDTH] + '\n')
+    os.replace(tmp, output)
+
+
+def write_table(rows, output):
+    tmp = f"{output}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write('requested_id\tlocus_tag\told_locus_tag\tgene\tproduct\tlocation\tstatus\n')
+        for row in rows:
+            f.write('\t'.join(row) + '\n')
+    os.replace(tmp, output)
+
+
+def build_library(index, ids, genome=None, cds_records=None):
+    """
+    返回 ([(序列头, 蛋白序列), ...], 对应关系表行)
+
+    ids 为 None 时提取全部 CDS；多个请求 ID 对应同一 locus_tag 时只输出一次
+    """
+    requested = ids if ids is not None else list(index.cds)
+    records, rows, seen = [], [], set()
+    for name in requested:
+        locus_tag = index.resolve(name)
+        feature = index.cds.get(locus_tag) if locus_tag else None
+        if feature is None:
+            rows.append([name, locus_tag or '', '', '', '', '', 'not_found' if not locus_tag else 'no_cds'])
+            continue
+        a = feature.attrs
+        if locus_tag in seen:
+            status = 'duplicate'
+        elif cds_records is not None and locus_tag not in cds_records:
+            status = 'missing_in_cds_fasta'
+        else:
+            status = 'ok'
+            seen.add(locus_tag)
+        rows.append([name, locus_tag, index.old_tags.get(locus_tag, ''),
+                     a.get('gene', ''), a.get('product', ''), feature.location(), status])
+        if status != 'ok':
+            continue
+        if cds_records is not None:
+            header, nt = cds_records[locus_tag]
+        else:
+            header, nt = feature.header(), feature.extract(genome)
+        records.append((header, translate(nt)))
+    # 输出按基因组顺序排列（与原脚本逐条扫描 CDS 文件的顺序一致）
+    records.sort(key=lambda r: index.cds[LOCUS_TAG_RE.search(r[0]).group(1)].index)
+    return records, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按 locus_tag 列表从 RefSeq GFF 提取 CDS 并翻译为蛋白库")
+    parser.add_argument('-g', '--gff', default=str(DATA_DIR / 'GCF_900088705.1.gff'), help='RefSeq GFF3 注释')
+    parser.add_argument('-f', '--genome', default=str(DATA_DIR / 'GCF_900088705.1.fasta'),
+                        help='基因组 FASTA（未给 --cds 时按 GFF 坐标截取 CDS）')
+    parser.add_argument('--cds', help='NCBI CDS 核酸序列（GCF_xxx_CDS.fna），给出时按 [locus_tag=] 查找并保留原序列头')
+    parser.add_argument('-l', '--loci', default=str(CONF_DIR / 'loci_tag.txt'),
+                        help='需要提取的 ID 列表（新/旧 locus_tag，每行一个）；传入 all 提取全部 CDS')
+    parser.add_argument('-o', '--output', default=str(DATA_DIR / 'biocide_resistance.translated.faa'),
+                        help='输出蛋白 FASTA')
+    parser.add_argument('-t', '--table', help='ID 对应关系表（默认：<输出前缀>.loci.tsv）')
+    args = parser.parse_args()
+
+    inputs = [args.gff, args.cds or args.genome] + ([] if args.loci == 'all' else [args.loci])
+    missing = [p for p in inputs if not os.path.isfile(p)]
+    if missing:
+        print(f"错误：输入文件不存在：{', '.join(missing)}")
+        sys.exit(1)
+
+    index = GffIndex(args.gff)
+    print(f"[INFO] GFF 中 CDS {len(index.cds)} 个，别名 {len(index.aliases)} 个")
+    ids = None if args.loci == 'all' else read_ids(args.loci)
+
+    genome = cds_records = None
+    if args.cds:
+        cds_records = read_cds_fasta(args.cds)
+        print(f"[INFO] CDS 序列 {len(cds_records)} 条：{args.cds}")
+    else:
+        genome = {r.id: str(r.seq) for r in SeqIO.parse(args.genome, 'fasta')}
+        absent = {f.seqid for f in index.cds.values()} - set(genome)
+        if absent:
+            print(f"错误：基因组 FASTA 中缺少序列：{', '.join(sorted(absent))}")
+            sys.exit(1)
+
+    records, rows = build_library(index, ids, genome, cds_records)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    write_fasta(records, args.output)
+    table = args.table or f"{os.path.splitext(args.output)[0]}.loci.tsv"
+    write_table(rows, table)
+
+    not_ok = [r for r in rows if r[-1] not in ('ok', 'duplicate')]
+    print(f"[INFO] 请求 {len(rows)} 个 ID，输出蛋白 {len(records)} 条：{args.output}")
+    print(f"[INFO] 对应关系表：{table}")
+    if not_ok:
+        print(f"[WARN] {len(not_ok)} 个 ID 未能提取（见对应关系表 status 列），如：{', '.join(r[0] for r in not_ok[:5])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+汇总 1-Kaptive.sh 的 K locus / OCL 结果，并缓存每个样本的解析结果
+
+1-Kaptive.sh 为每个样本在 K_locus_results/ 和 OCL_results/ 下各写出一个结果表（<样本>_K_locus_results.tsv /
+<样本>_OCL_results.tsv）和一个位点基因序列（<样本>_kaptive_results.fna）。这里：
+- 用 ProcessPoolExecutor 并行解析全部样本的结果表和 .fna
+- 每个样本的解析结果缓存为 <缓存目录>/<样本>.json，以 4 个输入文件的大小 + 修改时间为签名，
+  文件未变化时直接读取缓存
+- 缓存中包含 K / OCL 位点的基因 ID 集合（.fna 序列 ID 在 ":" 处截断，与 1-获取剩余毒力ffn.py 相同），
+  剩余毒力因子提取时直接读取，不再解析 .fna
+- 输出整个队列的 Kaptive_summary.tsv：每个样本一行，K 和 OCL 的最佳匹配位点、类型、置信度、问题、覆盖度、一致性
+
+用法:
+  python3 2-汇总Kaptive.py /mnt/d/1-鲍曼菌/荚膜多糖 [-o Kaptive_summary.tsv] [-j 8] [--cache-dir DIR]
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+CACHE_DIRNAME = '.kaptive_cache'
+CACHE_VERSION = 1
+
+# 位点 -> (子目录, 结果表后缀)
+LOCI = {
+    'K': ('K_locus_results', '_K_locus_results.tsv'),
+    'OCL': ('OCL_results', '_OCL_results.tsv'),
+}
+FASTA_SUFFIX = '_kaptive_results.fna'
+
+# 结果表列名 -> 汇总表字段
+TABLE_FIELDS = {
+    'Best match locus': 'locus',
+    'Best match type': 'type',
+    'Match confidence': 'confidence',
+    'Problems': 'problems',
+    'Coverage': 'coverage',
+    'Identity': 'identity',
+    'Expected genes in locus': 'expected_genes',
+    'Missing expected genes': 'missing_genes',
+}
+SUMMARY_COLUMNS = ['sample'] + [f"{locus}_{field}" for locus in LOCI for field in TABLE_FIELDS.values()] + \
+                  [f"{locus}_gene_count" for locus in LOCI]
+
+
+def locus_files(sample, k_dir, ocl_dir):
+    """{位点: (结果表, 基因序列)}"""
+    dirs = {'K': Path(k_dir), 'OCL': Path(ocl_dir)}
+    return {locus: (dirs[locus] / f"{sample}{suffix}", dirs[locus] / f"{sample}{FASTA_SUFFIX}")
+            for locus, (_, suffix) in LOCI.items()}
+
+
+def signature(files):
+    parts = []
+    for tsv, fna in files.values():
+        for path in (tsv, fna):
+            try:
+                st = os.stat(path)
+                parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+            except OSError:
+                parts.append('-')
+    return '|'.join(parts)
+
+
+def parse_table(path, sample):
+    """
+    读取 Kaptive 结果表中该样本的一行（与 1-Kaptive.sh 合并时相同：取 Assembly 列等于样本名的行，
+    没有时取第一行），返回 TABLE_FIELDS 中各字段；文件不存在时返回空字段
+    """
+    result = dict.fromkeys(TABLE_FIELDS.values(), '')
+    if not os.path.isfile(path):
+        return result
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        reader = csv.DictReader(f, delimiter='\t')
+        chosen = None
+        for row in reader:
+            if chosen is None:
+                chosen = row
+            if row.get('Assembly') == sample:
+                chosen = row
+                break
+    if chosen:
+        for column, field in TABLE_FIELDS.items():
+            result[field] = (chosen.get(column) or '').strip()
+    return result
+
+
+def read_gene_ids(path):
+    """位点基因序列的 ID（在 ":" 处截断）；文件不存在时返回 None"""
+    if not os.path.isfile(path):
+        return None
+    ids = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line.startswith('>'):
+                fields = line[1:].split(None, 1)
+                ids.append(fields[0].split(':')[0] if fields else '')
+    return ids
+
+
+def parse_sample(sample, k_dir, ocl_dir):
+    files = locus_files(sample, k_dir, ocl_dir)
+    entry = {'version': CACHE_VERSION, 'sample': sample, 'signature': signature(files)}
+    for locus, (tsv, fna) in files.items():
+        entry[locus] = parse_table(tsv, sample)
+        entry[locus]['genes'] = read_gene_ids(fna)
+    return entry
+
+
+def default_cache_dir(k_dir):
+    return Path(k_dir).resolve().parent / CACHE_DIRNAME
+
+
+def read_cache(sample, files, cache_dir):
+    """缓存有效时返回缓存内容，否则返回 None"""
+    path = Path(cache_dir) / f"{sample}.json"
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get('version') != CACHE_VERSION or entry.get('signature') != signature(files):
+        return None
+    return entry
+
+
+def write_cache(entry, cache_dir):
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / f"{entry['sample']}.json"
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_sample(sample, k_dir, ocl_dir, cache_dir):
+    """读取缓存，缓存缺失或过期时重新解析并写入缓存；返回 (样本结果, 是否命中缓存)"""
+    files = locus_files(sample, k_dir, ocl_dir)
+    entry = read_cache(sample, files, cache_dir)
+    if entry is not None:
+        return entry, True
+    entry = parse_sample(sample, k_dir, ocl_dir)
+    write_cache(entry, cache_dir)
+    return entry, False
+
+
+def cached_gene_ids(sample, k_dir, ocl_dir, cache_dir=None):
+    """
+    供 1-获取剩余毒力ffn.py 使用：有效缓存中的 (K 基因 ID, OCL 基因 ID)
+
+    缓存不存在或已过期时返回 None，由调用方自行读取 .fna；某个位点的 .fna 不存在时对应的值为 None
+    """
+    cache_dir = cache_dir or default_cache_dir(k_dir)
+    entry = read_cache(sample, locus_files(sample, k_dir, ocl_dir), cache_dir)
+    if entry is None:
+        return None
+    return entry['K']['genes'], entry['OCL']['genes']
+
+
+def discover_samples(k_dir, ocl_dir):
+    samples = set()
+    for locus, directory in (('K', k_dir), ('OCL', ocl_dir)):
+        suffix = LOCI[locus][1]
+        if os.path.isdir(directory):
+            samples.update(name[:-len(suffix)] for name in os.listdir(directory) if name.endswith(suffix))
+    return sorted(samples)
+
+
+def summary_row(entry):
+    row = {'sample': entry['sample']}
+    for locus in LOCI:
+        for field in TABLE_FIELDS.values():
+            row[f"{locus}_{field}"] = entry[locus][field]
+        genes = entry[locus]['genes']
+        row[f"{locus}_gene_count"] = '' if genes is None else len(genes)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总 Kaptive K locus / OCL 结果（并行解析、按样本缓存）")
+    parser.add_argument('kaptive_dir', help='1-Kaptive.sh 的输出目录（含 K_locus_results/ 与 OCL_results/）')
+    parser.add_argument('-o', '--output', help='汇总表（默认：<kaptive_dir>/Kaptive_summary.tsv）')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='并行进程数（默认：CPU 核数）')
+    parser.add_argument('--cache-dir', help=f'缓存目录（默认：<kaptive_dir>/{CACHE_DIRNAME}）')
+    args = parser.parse_args()
+
+    kaptive_dir = Path(args.kaptive_dir)
+    k_dir, ocl_dir = kaptive_dir / LOCI['K'][0], kaptive_dir / LOCI['OCL'][0]
+    if not (k_dir.is_dir() or ocl_dir.is_dir()):
+        print(f"错误：{kaptive_dir} 下没有 K_locus_results/ 或 OCL_results/")
+        sys.exit(1)
+    cache_dir = Path(args.cache_dir) if args.cache_dir else default_cache_dir(k_dir)
+    output = Path(args.output) if args.output else kaptive_dir / 'Kaptive_summary.tsv'
+
+    samples = discover_samples(k_dir, ocl_dir)
+    if not samples:
+        print(f"[WARN] {kaptive_dir} 下没有 Kaptive 结果表")
+        sys.exit(1)
+
+    entries, hits = {}, 0
+    workers = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=min(workers, len(samples))) as pool:
+        futures = {pool.submit(load_sample, s, str(k_dir), str(ocl_dir), str(cache_dir)): s for s in samples}
+        for fut in as_completed(futures):
+            entry, cached = fut.result()
+            entries[entry['sample']] = entry
+            hits += cached
+    print(f"[INFO] 样本 {len(samples)} 个：缓存命中 {hits} 个，重新解析 {len(samples) - hits} 个")
+
+    tmp = output.with_name(output.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, delimiter='\t')
+        writer.writeheader()
+        for sample in samples:
+            writer.writerow(summary_row(entries[sample]))
+    os.replace(tmp, output)
+    print(f"[INFO] 汇总表：{output}")
+
+    for locus in LOCI:
+        types = Counter(entries[s][locus]['type'] or '-' for s in samples)
+        confidence = Counter(entries[s][locus]['confidence'] or '-' for s in samples)
+        top = ', '.join(f"{t} {n}" for t, n in types.most_common(5))
+        print(f"  {locus}: 类型 {len(types)} 种（{top}）；置信度 " +
+              ', '.join(f"{c} {n}" for c, n in confidence.most_common()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+#!/bin/bash
+# 汇总 1-Kaptive.sh 的 K locus / OCL 结果为 Kaptive_summary.tsv（每个样本一行）
+# 每个样本的解析结果缓存在 荚膜多糖/.kaptive_cache/，结果文件未变化时直接读取；
+# 7-剩余毒力因子/python/1-获取剩余毒力ffn.py 也会优先使用这里的缓存
+
+KAPTIVE_DIR="/mnt/d/1-鲍曼菌/荚膜多糖"
+PYTHON_SCRIPT="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/4-注释/6-荚膜多糖/python/2-汇总Kaptive.py"
+
+python3 "$PYTHON_SCRIPT" \
+    "$KAPTIVE_DIR" \
+    -o "$KAPTIVE_DIR/Kaptive_summary.tsv" \
+    -j 8
@@ -15,11 +15,31 @@ process_one.py
   - 将结果写到 OUTPUT_DIR/{BASENAME}.Remain.ffn
 注意：上面流程与你给的原始脚本行为一致（包括可能看起来矛盾的 id 处理），**不做任何修正**。
 运行前需通过环境变量提供：PROKKA_DIR, K_DIR, OCL_DIR, OUTPUT_DIR
+设置环境变量 AB_PROFILE=<文件.jsonl> 时记录 parse / filter / extract / write 各阶段耗时
+K / OCL 的 seq ids 优先取自 6-荚膜多糖/python/2-汇总Kaptive.py 的缓存（默认 K_DIR 上级目录下的 .kaptive_cache，
+可用环境变量 KAPTIVE_CACHE 指定）；缓存不存在或 .fna 已更新时仍按原逻辑读取 .fna
+origin 的 seq ids 和序列优先取自 1-prokka/python/3-基因目录.py 的基因目录（默认 PROKKA_DIR/gene_catalog.sqlite，
+可用环境变量 GENE_CATALOG 指定），按偏移只读取需要的序列；目录不存在、没有该样本或文件已更新时解析一遍 ffn
 """
 
 import os
 import sys
+from pathlib import Path
 from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+
+# 共用的模块加载函数（8-流程调度/python/模块加载.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+
+profiling = load_module('8-流程调度/python/3-性能记录.py')
+kaptive_summary = load_module('4-注释/6-荚膜多糖/python/2-汇总Kaptive.py')
+catalog_module = load_module('4-注释/1-prokka/python/3-基因目录.py')
 
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
@@ -42,6 +62,11 @@ def main():
             eprint(f"Error: environment variable {name} is not set.")
             sys.exit(3)
 
+    with profiling.Profiler('1-获取剩余毒力ffn.py', sample=BASENAME) as prof:
+        process_one(BASENAME, PROKKA_DIR, K_DIR, OCL_DIR, OUTPUT_DIR, prof)
+
+
+def process_one(BASENAME, PROKKA_DIR, K_DIR, OCL_DIR, OUTPUT_DIR, prof):
     origin_file = os.path.join(PROKKA_DIR, BASENAME, f"{BASENAME}.ffn")
     k_file = os.path.join(K_DIR, f"{BASENAME}_kaptive_results.fna")
     ocl_file = os.path.join(OCL_DIR, f"{BASENAME}_kaptive_results.fna")
@@ -51,68 +76,96 @@ def main():
         return
 
     # 读取 origin 的 seq ids，并按原脚本加前缀 BASENAME|
-    try:
-        seq_ids = [rec.id for rec in SeqIO.parse(origin_file, "fasta")]
-    except Exception as e:
-        eprint(f"[{BASENAME}] 读取 origin 文件失败: {e}")
-        return
+    with prof.phase('parse') as ph:
+        catalog, genes, records = open_catalog(BASENAME, PROKKA_DIR), None, None
+        if catalog is not None:
+            # 按 ffn 中的顺序，与解析 ffn 得到的 ID 顺序相同
+            genes = sorted((g for g in catalog.genes(BASENAME) if g['ffn_offset'] is not None),
+                           key=lambda g: g['ffn_offset'])
+            seq_ids = [g['locus_tag'] for g in genes]
+        else:
+            try:
+                records = list(SeqIO.parse(origin_file, "fasta"))
+            except Exception as e:
+                eprint(f"[{BASENAME}] 读取 origin 文件失败: {e}")
+                return
+            seq_ids = [rec.id for rec in records]
+        cached = kaptive_summary.cached_gene_ids(BASENAME, K_DIR, OCL_DIR, os.environ.get("KAPTIVE_CACHE"))
+        if cached is not None:
+            # 缓存中 .fna 不存在的位点为 None，与 read_locus_ids 一样当作空集合
+            K_seq_ids, OCL_seq_ids = (ids or [] for ids in cached)
+        else:
+            K_seq_ids = read_locus_ids(BASENAME, k_file, "K")
+            OCL_seq_ids = read_locus_ids(BASENAME, ocl_file, "OCL")
+        ph.items = len(seq_ids) + len(K_seq_ids) + len(OCL_seq_ids)
 
     seq_ids = [f"{BASENAME}|{sid}" for sid in seq_ids]   # **保留原始脚本的行为**
 
-    # 读取 K 的 seq ids（如存在）
-    K_seq_ids = []
-    if os.path.isfile(k_file):
-        try:
-            K_seq_ids = [rec.id for rec in SeqIO.parse(k_file, "fasta")]
-            K_seq_ids = [sid.split(":")[0] for sid in K_seq_ids]  # 保留原始脚本行为
-        except Exception as e:
-            eprint(f"[{BASENAME}] 读取 K 文件失败: {e}，当作空集合处理。")
-            K_seq_ids = []
-    else:
-        eprint(f"[{BASENAME}] 未找到 K 文件：{k_file} （当作空集合）")
-
-    # 读取 OCL 的 seq ids（如存在）
-    OCL_seq_ids = []
-    if os.path.isfile(ocl_file):
-        try:
-            OCL_seq_ids = [rec.id for rec in SeqIO.parse(ocl_file, "fasta")]
-            OCL_seq_ids = [sid.split(":")[0] for sid in OCL_seq_ids]  # 保留原始脚本行为
-        except Exception as e:
-            eprint(f"[{BASENAME}] 读取 OCL 文件失败: {e}，当作空集合处理。")
-            OCL_seq_ids = []
-    else:
-        eprint(f"[{BASENAME}] 未找到 OCL 文件：{ocl_file} （当作空集合）")
-
-    # 求并集与差集（严格按原始逻辑）
-    OCL_K_union_ids = set(OCL_seq_ids) | set(K_seq_ids)
-    OCL_K_diff_ids = set(seq_ids) - OCL_K_union_ids
-
-    # 去掉前缀 'BASENAME|' 的左侧部分，保留原脚本的 split("|")[1]
-    OCL_K_diff_ids = [sid.split("|")[1] for sid in OCL_K_diff_ids]
+    with prof.phase('filter') as ph:
+        # 求并集与差集（严格按原始逻辑）
+        OCL_K_union_ids = set(OCL_seq_ids) | set(K_seq_ids)
+        OCL_K_diff_ids = set(seq_ids) - OCL_K_union_ids
+
+        # 去掉前缀 'BASENAME|' 的左侧部分，保留原脚本的 split("|")[1]
+        OCL_K_diff_ids = [sid.split("|")[1] for sid in OCL_K_diff_ids]
+        ph.items = len(OCL_K_diff_ids)
 
     # 根据 OCL_K_diff_ids 提取出 origin 中对应的序列
     # NOTE: 保留原脚本逻辑：使用 record.id.split("|")[0] 来判断（严格复刻）
     extracted = []
-    try:
-        for rec in SeqIO.parse(origin_file, "fasta"):
-            key = rec.id.split("|")[0]
-            if key in OCL_K_diff_ids:
-                extracted.append(rec)
-    except Exception as e:
-        eprint(f"[{BASENAME}] 从 origin 提取序列失败: {e}")
-        return
+    with prof.phase('extract') as ph:
+        if catalog is not None:
+            with catalog:
+                for gene in genes:
+                    if gene['locus_tag'].split("|")[0] in OCL_K_diff_ids:
+                        header, seq = catalog.record(gene)
+                        extracted.append(SeqRecord(Seq(seq), id=header.split(None, 1)[0], description=header))
+        else:
+            for rec in records:
+                key = rec.id.split("|")[0]
+                if key in OCL_K_diff_ids:
+                    extracted.append(rec)
+        ph.items = len(extracted)
 
     # 输出目录准备
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     out_path = os.path.join(OUTPUT_DIR, f"{BASENAME}.Remain.ffn")
 
-    if extracted:
-        SeqIO.write(extracted, out_path, "fasta")
-        eprint(f"[{BASENAME}] 导出 {len(extracted)} 条序列到 {out_path}")
-    else:
-        # 若没有序列也写出空文件（保留行为可选）
-        SeqIO.write([], out_path, "fasta")
-        eprint(f"[{BASENAME}] 没有匹配的序列，写出空文件 {out_path}")
+    with prof.phase('write') as ph:
+        if extracted:
+            SeqIO.write(extracted, out_path, "fasta")
+            eprint(f"[{BASENAME}] 导出 {len(extracted)} 条序列到 {out_path}")
+        else:
+            # 若没有序列也写出空文件（保留行为可选）
+            SeqIO.write([], out_path, "fasta")
+            eprint(f"[{BASENAME}] 没有匹配的序列，写出空文件 {out_path}")
+        ph.items = len(extracted)
+
+
+def open_catalog(BASENAME, PROKKA_DIR):
+    """基因目录中有该样本且索引后文件未变化时返回打开的 GeneCatalog，否则返回 None"""
+    db_path = os.environ.get("GENE_CATALOG") or os.path.join(PROKKA_DIR, catalog_module.CATALOG_NAME)
+    if not os.path.isfile(db_path):
+        return None
+    catalog = catalog_module.GeneCatalog(db_path)
+    if catalog.is_current(BASENAME):
+        return catalog
+    catalog.close()
+    eprint(f"[{BASENAME}] 基因目录中没有该样本或文件已更新，改为读取 ffn")
+    return None
+
+
+def read_locus_ids(BASENAME, fasta_file, label):
+    """读取 K / OCL 的 seq ids（如存在），并在 ":" 处截断；读取失败或不存在时当作空集合"""
+    if not os.path.isfile(fasta_file):
+        eprint(f"[{BASENAME}] 未找到 {label} 文件：{fasta_file} （当作空集合）")
+        return []
+    try:
+        ids = [rec.id for rec in SeqIO.parse(fasta_file, "fasta")]
+        return [sid.split(":")[0] for sid in ids]  # 保留原始脚本行为
+    except Exception as e:
+        eprint(f"[{BASENAME}] 读取 {label} 文件失败: {e}，当作空集合处理。")
+        return []
 
 if __name__ == "__main__":
     main()
@@ -2,34 +2,53 @@
 """
 合并多个样本的FASTA文件，并在序列ID中添加样本信息
 保留原始基因ID和样本ID用于后期追踪
+设置环境变量 AB_PROFILE=<文件.jsonl> 时记录各阶段耗时（合并阶段按文件累加）
 """
 
 import os
 import sys
 from pathlib import Path
 
+
+# 共用的模块加载函数（8-流程调度/python/模块加载.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+
+profiling = load_module('8-流程调度/python/3-性能记录.py')
+
 def extract_sample_id(filename):
     """从文件名中提取样本ID"""
     # 假设文件名格式为 ERR1946991.Remain.ffn
     sample_id = filename.split('.')[0]
     return sample_id
 
-def merge_fasta_files(input_dir, output_file):
+def merge_fasta_files(input_dir, output_file, prof=None, fasta_files=None):
     """
     合并所有.ffn文件，并在序列ID中添加样本信息
     
     Args:
         input_dir: 输入目录路径
         output_file: 输出文件路径
+        prof: 可选的 profiling.Profiler
+        fasta_files: 可选，只合并这些文件（4-增量聚类.py 只合并新样本），默认为 input_dir 下全部 .ffn
+
+    Returns:
+        {样本ID: 序列数}（没有序列的样本为 0）
     """
+    prof = prof or profiling.Profiler('2-merge-fasta.py')
     input_path = Path(input_dir)
     
     # 查找所有.ffn文件
-    fasta_files = list(input_path.glob("*.ffn"))
+    with prof.phase('scan') as ph:
+        fasta_files = list(input_path.glob("*.ffn")) if fasta_files is None else [Path(f) for f in fasta_files]
+        ph.items = len(fasta_files)
     
     if not fasta_files:
         print(f"在 {input_dir} 中未找到.ffn文件")
-        return
+        return {}
     
     total_sequences = 0
     sample_counts = {}
@@ -41,7 +60,7 @@ def merge_fasta_files(input_dir, output_file):
             
             print(f"处理文件: {fasta_file.name} (样本ID: {sample_id})")
             
-            with open(fasta_file, 'r') as inf:
+            with prof.phase('merge', accumulate=True) as ph, open(fasta_file, 'r') as inf:
                 for line in inf:
                     line = line.strip()
                     if line.startswith('>'):
@@ -55,6 +74,8 @@ def merge_fasta_files(input_dir, output_file):
                         total_sequences += 1
                     else:
                         outf.write(line + '\n')
+                ph.items = sample_counts[sample_id]
+    prof.flush()
     
     print(f"\n合并完成！")
     print(f"输出文件: {output_file}")
@@ -62,6 +83,7 @@ def merge_fasta_files(input_dir, output_file):
     print("各样本序列数:")
     for sample, count in sample_counts.items():
         print(f"  {sample}: {count}")
+    return sample_counts
 
 def main():
     if len(sys.argv) != 3:
@@ -80,7 +102,8 @@ def main():
     # 创建输出目录
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
-    merge_fasta_files(input_dir, output_file)
+    with profiling.Profiler('2-merge-fasta.py') as prof:
+        merge_fasta_files(input_dir, output_file, prof)
 
 if __name__ == "__main__":
     main()
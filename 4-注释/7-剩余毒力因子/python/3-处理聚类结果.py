@@ -2,13 +2,46 @@
 """
 解析VSEARCH聚类结果，生成样本和基因的追踪表
 输出聚类统计信息和详细的基因-样本对应关系
+
+.uc 文件按列直接读入带类型的 DataFrame（聚类编号为整数、相似度为浮点、样本ID为分类类型），
+序列ID只做一次向量化拆分，聚类统计全部用 groupby 聚合完成，
+百万行级别的 .uc 文件也不需要为每条记录构造 dict。
+
+另外输出 聚类 × 样本 的稀疏计数矩阵（cluster_sample_matrix.npz）以及
+core/soft_core/shell/cloud 频率分类（cluster_frequency_classes.tsv），
+队列层面的附属基因分析可直接加载，无需再解析 sample_distribution 字符串。
+
+设置环境变量 AB_PROFILE=<文件.jsonl> 时记录 parse / annotate / tracking / statistics / matrix 各阶段耗时。
 """
 
 import os
 import sys
+import csv
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from collections import defaultdict
+
+
+# 共用的模块加载函数和 CSR 写出（8-流程调度/python/模块加载.py、稀疏矩阵.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+from 稀疏矩阵 import save_csr
+
+profiling = load_module('8-流程调度/python/3-性能记录.py')
+
+# .uc 文件的10列（VSEARCH 手册中的字段顺序）
+UC_COLUMNS = ['type', 'cluster', 'size', 'identity', 'strand',
+              'query_start', 'seed_start', 'alignment', 'query', 'target']
+
+# 泛基因组频率分类阈值（与 Roary 的约定一致）：
+# core >= 99%，soft_core 95%-99%，shell 15%-95%，cloud < 15%
+CORE_FREQ = 0.99
+SOFT_CORE_FREQ = 0.95
+SHELL_FREQ = 0.15
+
 
 def parse_uc_file(uc_file):
     """
@@ -20,145 +53,211 @@ def parse_uc_file(uc_file):
     C: Cluster record
     
     字段: Type, Cluster, Size, %Identity, Strand, QueryStart, SeedStart, Alignment, Query, Target
+
+    返回:
+        members: 每行一个聚类成员（S/H 行），列为
+                 cluster_id, full_sequence_id, role_in_cluster, identity_to_centroid, centroid
+        cluster_info: 每行一个聚类，列为 cluster_id, centroid, size
     """
-    clusters = defaultdict(list)
-    cluster_info = {}
-    
-    with open(uc_file, 'r') as f:
-        for line in f:
-            if line.startswith('#'):
-                continue
-            
-            fields = line.strip().split('\t')
-            record_type = fields[0]
-            
-            if record_type == 'S':  # Centroid/Seed
-                cluster_id = int(fields[1]) # 第二列是聚类编号
-                query_id = fields[8] # 第九列是序列ID
-                clusters[cluster_id].append({
-                    'sequence_id': query_id,
-                    'role': 'centroid',
-                    'identity': 100.0
-                })
-                cluster_info[cluster_id] = {
-                    'centroid': query_id,
-                    'size': 1
-                }
-            
-            elif record_type == 'H':  # Hit/Member
-                cluster_id = int(fields[1])
-                identity = float(fields[3])
-                query_id = fields[8] # hit 序列ID
-                target_id = fields[9] # 对应的 seed 序列
-                
-                clusters[cluster_id].append({
-                    'sequence_id': query_id,
-                    'role': 'member',
-                    'identity': identity,
-                    'centroid': target_id
-                })
-                cluster_info[cluster_id]['size'] += 1
-            
-            elif record_type == 'C':  # Cluster summary
-                cluster_id = int(fields[1])
-                size = int(fields[2])
-                centroid = fields[8]
-                
-                if cluster_id not in cluster_info:
-                    cluster_info[cluster_id] = {
-                        'centroid': centroid,
-                        'size': size
-                    }
-    
-    return clusters, cluster_info
+    df = pd.read_csv(
+        uc_file,
+        sep='\t',
+        header=None,
+        names=UC_COLUMNS,
+        usecols=['type', 'cluster', 'size', 'identity', 'query', 'target'],
+        dtype={'type': 'category', 'cluster': str, 'size': str,
+               'identity': str, 'query': str, 'target': str},
+        quoting=csv.QUOTE_NONE,
+        keep_default_na=False,
+        engine='c',
+    )
+
+    # 跳过以 # 开头的注释行以及其它记录类型
+    is_member = df['type'].isin(['S', 'H'])
+    is_cluster = df['type'] == 'C'
+
+    members = df.loc[is_member, ['type', 'cluster', 'identity', 'query', 'target']]
+    members = pd.DataFrame({
+        'cluster_id': members['cluster'].astype('int64'),
+        'full_sequence_id': members['query'],
+        'role_in_cluster': (members['type'] == 'S').map({True: 'centroid', False: 'member'}),
+        # S 行相似度为 '*'，按原逻辑记为 100.0
+        'identity_to_centroid': pd.to_numeric(members['identity'], errors='coerce').fillna(100.0),
+        'centroid': members['target'].where(members['type'] == 'H', members['query']),
+    })
+    members['role_in_cluster'] = members['role_in_cluster'].astype('category')
+    # 按聚类首次出现的顺序稳定排序：同一聚类内保持文件中的出现顺序
+    first_seen = pd.Series(pd.factorize(members['cluster_id'])[0], index=members.index)
+    members = members.loc[first_seen.sort_values(kind='stable').index].reset_index(drop=True)
+
+    seeds = members.loc[members['role_in_cluster'] == 'centroid', ['cluster_id', 'full_sequence_id']]
+    seeds = seeds.drop_duplicates('cluster_id').rename(columns={'full_sequence_id': 'centroid'})
+    sizes = members.groupby('cluster_id', sort=False).size().rename('size').reset_index()
+    cluster_info = sizes.merge(seeds, on='cluster_id', how='left')
 
-def extract_sample_and_gene_info(sequence_id):
+    # 如果某个 cluster 没有 S 行（文件被截断等），用 C 行补齐中心序列
+    c_rows = df.loc[is_cluster, ['cluster', 'size', 'query']]
+    if not c_rows.empty and cluster_info['centroid'].isna().any():
+        c_centroid = pd.Series(c_rows['query'].values, index=c_rows['cluster'].astype('int64').values)
+        c_centroid = c_centroid[~c_centroid.index.duplicated()]
+        missing = cluster_info['centroid'].isna()
+        cluster_info.loc[missing, 'centroid'] = cluster_info.loc[missing, 'cluster_id'].map(c_centroid)
+
+    return members, cluster_info[['cluster_id', 'centroid', 'size']]
+
+
+def split_sequence_ids(sequence_ids):
     """
-    从序列ID中提取样本信息和基因信息
+    从序列ID中提取样本信息和基因信息，对整列序列ID只拆分一次
     输入格式: SAMPLE_ERR1946991|INDDICEB_00001 hypothetical protein
+    没有 '|'（没有样本信息）时样本记为 Unknown，整个ID作为基因ID，描述为空
+
+    返回 (sample_id, gene_id, gene_description) 三个 Series，sample_id 为分类类型
     """
-    if '|' in sequence_id:
-        sample_part, gene_part = sequence_id.split('|', 1)
-        sample_id = sample_part.replace('SAMPLE_', '')
-        
-        # 分离基因ID和描述
-        gene_parts = gene_part.split(' ', 1)
-        gene_id = gene_parts[0]
-        gene_description = gene_parts[1] if len(gene_parts) > 1 else ""
-        
-        return sample_id, gene_id, gene_description
-    else:
-        # 如果没有样本信息，假设整个就是基因ID
-        return "Unknown", sequence_id, ""
-
-def generate_tracking_table(clusters, output_dir):
+    sequence_ids = sequence_ids.astype(str)
+    has_sample = sequence_ids.str.contains('|', regex=False)
+
+    parts = sequence_ids.str.split('|', n=1, expand=True)
+    if parts.shape[1] == 1:
+        parts[1] = None
+    sample_id = parts[0].str.replace('SAMPLE_', '', regex=False).where(has_sample, 'Unknown')
+    gene_part = parts[1].where(has_sample, sequence_ids)
+
+    gene_parts = gene_part.str.split(' ', n=1, expand=True)
+    if gene_parts.shape[1] == 1:
+        gene_parts[1] = None
+    gene_id = gene_parts[0]
+    # 没有样本信息时描述置空
+    gene_description = gene_parts[1].fillna('').where(has_sample, '')
+
+    return sample_id.astype('category'), gene_id, gene_description
+
+
+def annotate_members(members):
+    """为成员表添加 sample_id / gene_id / gene_description 三列（只拆分一次）"""
+    sample_id, gene_id, gene_description = split_sequence_ids(members['full_sequence_id'])
+    members = members.copy()
+    members['sample_id'] = sample_id
+    members['gene_id'] = gene_id
+    members['gene_description'] = gene_description
+    return members
+
+
+def generate_tracking_table(members, output_dir):
     """生成基因-样本追踪表"""
-    tracking_data = []
-    
-    for cluster_id, members in clusters.items():
-        for member in members:
-            sequence_id = member['sequence_id']
-            sample_id, gene_id, gene_description = extract_sample_and_gene_info(sequence_id)
-            
-            tracking_data.append({
-                'cluster_id': cluster_id,
-                'sample_id': sample_id,
-                'gene_id': gene_id,
-                'gene_description': gene_description,
-                'full_sequence_id': sequence_id,
-                'role_in_cluster': member['role'],
-                'identity_to_centroid': member['identity']
-            })
-    
-    # 转换为DataFrame并保存
-    df = pd.DataFrame(tracking_data)
+    df = members.loc[:, ['cluster_id', 'sample_id', 'gene_id', 'gene_description',
+                         'full_sequence_id', 'role_in_cluster', 'identity_to_centroid']]
     tracking_file = os.path.join(output_dir, 'gene_sample_tracking.tsv')
     df.to_csv(tracking_file, sep='\t', index=False)
     
     print(f"基因-样本追踪表已保存: {tracking_file}")
     return df
 
-def generate_cluster_statistics(clusters, cluster_info, output_dir):
+
+def generate_cluster_statistics(members, cluster_info, output_dir):
     """生成聚类统计信息"""
-    stats_data = []
-    
-    for cluster_id, members in clusters.items():
-        # 统计每个样本在该聚类中的基因数
-        sample_counts = defaultdict(int)
-        for member in members:
-            sample_id, _, _ = extract_sample_and_gene_info(member['sequence_id'])
-            sample_counts[sample_id] += 1
-        
-        # 计算身份认同度统计
-        identities = [m['identity'] for m in members if m['role'] == 'member']
-        min_identity = min(identities) if identities else 100.0
-        max_identity = max(identities) if identities else 100.0
-        avg_identity = sum(identities) / len(identities) if identities else 100.0
-        
-        stats_data.append({
-            'cluster_id': cluster_id,
-            'cluster_size': len(members),
-            'centroid_sequence': cluster_info[cluster_id]['centroid'],
-            'samples_involved': len(sample_counts),
-            'sample_distribution': ';'.join([f"{k}:{v}" for k, v in sample_counts.items()]),
-            'min_identity': round(min_identity, 2),
-            'max_identity': round(max_identity, 2),
-            'avg_identity': round(avg_identity, 2)
-        })
-    
-    # 转换为DataFrame并保存
-    df_stats = pd.DataFrame(stats_data)
+    grouped = members.groupby('cluster_id', sort=False)
+
+    # 统计每个样本在该聚类中的基因数（保持样本在聚类中首次出现的顺序）
+    sample_counts = (members.groupby(['cluster_id', 'sample_id'], sort=False, observed=True)
+                     .size().rename('n').reset_index())
+    sample_counts['pair'] = sample_counts['sample_id'].astype(str) + ':' + sample_counts['n'].astype(str)
+    distribution = sample_counts.groupby('cluster_id', sort=False)['pair'].agg(';'.join)
+
+    # 计算身份认同度统计（只统计 H 行；没有成员的聚类记为 100.0）
+    # 平均值按成员顺序 sum / len、取整用 Python round，与逐个聚类计算的结果逐位相同
+    # （pandas 的 mean 用补偿求和，Series.round 与 round 在末位上可能不同）
+    hits = members.loc[members['role_in_cluster'] == 'member']
+    identity = hits.groupby('cluster_id')['identity_to_centroid'].agg(
+        min='min', max='max', mean=lambda v: sum(v.tolist()) / len(v))
+
+    df_stats = pd.DataFrame({
+        'cluster_size': grouped.size(),
+        'centroid_sequence': cluster_info.set_index('cluster_id')['centroid'],
+        'samples_involved': grouped['sample_id'].nunique(),
+        'sample_distribution': distribution,
+    })
+    for col in ('min', 'max', 'avg'):
+        values = identity['mean' if col == 'avg' else col].reindex(df_stats.index).fillna(100.0)
+        df_stats[f'{col}_identity'] = [round(x, 2) for x in values.tolist()]
+    df_stats = df_stats.rename_axis('cluster_id').reset_index()
+
     stats_file = os.path.join(output_dir, 'cluster_statistics.tsv')
     df_stats.to_csv(stats_file, sep='\t', index=False)
     
     print(f"聚类统计信息已保存: {stats_file}")
     return df_stats
 
-def print_summary(clusters, df_tracking):
+
+def build_cluster_sample_matrix(members):
+    """
+    由成员表构建 聚类 × 样本 的 CSR 稀疏计数矩阵
+
+    返回 (data, indices, indptr, shape, cluster_ids, sample_ids)，
+    cluster_ids 按聚类首次出现顺序排列，sample_ids 为样本分类的类别顺序
+    """
+    row_codes, cluster_ids = pd.factorize(members['cluster_id'])
+    sample_cat = members['sample_id'].astype('category').cat.remove_unused_categories()
+    col_codes = sample_cat.cat.codes.to_numpy(dtype=np.int64)
+    sample_ids = np.array([str(s) for s in sample_cat.cat.categories], dtype=str)
+
+    n_rows, n_cols = len(cluster_ids), len(sample_ids)
+    # 每个 (聚类, 样本) 组合编码为一个整数，np.unique 一次完成计数并按 CSR 顺序排好
+    keys = row_codes.astype(np.int64) * max(n_cols, 1) + col_codes
+    uniq, counts = np.unique(keys, return_counts=True)
+    rows = uniq // max(n_cols, 1)
+    indices = (uniq % max(n_cols, 1)).astype(np.int32)
+    indptr = np.searchsorted(rows, np.arange(n_rows + 1)).astype(np.int64)
+
+    return (counts.astype(np.int32), indices, indptr, (n_rows, n_cols),
+            np.asarray(cluster_ids, dtype=np.int64), sample_ids)
+
+
+def classify_frequency(n_samples, total_samples):
+    """按样本出现频率把聚类划分为 core / soft_core / shell / cloud"""
+    freq = n_samples / total_samples if total_samples else np.zeros(len(n_samples))
+    classes = np.select(
+        [freq >= CORE_FREQ, freq >= SOFT_CORE_FREQ, freq >= SHELL_FREQ],
+        ['core', 'soft_core', 'shell'],
+        default='cloud',
+    )
+    return freq, classes
+
+
+def generate_presence_matrix(members, output_dir):
+    """
+    生成 聚类 × 样本 稀疏计数矩阵和频率分类表
+
+    cluster_sample_matrix.npz 与 scipy.sparse.save_npz 的格式兼容，
+    可直接 scipy.sparse.load_npz 读取；行列标签保存在同一文件的 clusters / samples 数组中：
+        m = scipy.sparse.load_npz(path)
+        labels = np.load(path); labels['clusters'], labels['samples']
+    """
+    data, indices, indptr, shape, cluster_ids, sample_ids = build_cluster_sample_matrix(members)
+
+    matrix_file = os.path.join(output_dir, 'cluster_sample_matrix.npz')
+    save_csr(matrix_file, data, indices, indptr, shape, clusters=cluster_ids, samples=sample_ids)
+    print(f"聚类×样本稀疏矩阵已保存: {matrix_file} ({shape[0]} × {shape[1]}, 非零 {len(data)})")
+
+    n_samples = np.diff(indptr)
+    freq, classes = classify_frequency(n_samples, shape[1])
+    df_classes = pd.DataFrame({
+        'cluster_id': cluster_ids,
+        'samples_present': n_samples,
+        'sample_frequency': np.round(freq, 4),
+        'frequency_class': classes,
+    })
+    classes_file = os.path.join(output_dir, 'cluster_frequency_classes.tsv')
+    df_classes.to_csv(classes_file, sep='\t', index=False)
+    print(f"聚类频率分类已保存: {classes_file}")
+    return df_classes
+
+
+def print_summary(df_stats, df_tracking, df_classes=None):
     """打印总结信息"""
-    total_clusters = len(clusters)
+    total_clusters = len(df_stats)
     total_genes = len(df_tracking)
-    samples = df_tracking['sample_id'].unique()
+    samples = [str(s) for s in df_tracking['sample_id'].unique()]
     
     print(f"\n=== 聚类结果总结 ===")
     print(f"总聚类数: {total_clusters}")
@@ -167,13 +266,22 @@ def print_summary(clusters, df_tracking):
     print(f"样本列表: {', '.join(samples)}")
     
     # 聚类大小分布
-    cluster_sizes = [len(members) for members in clusters.values()]
+    cluster_sizes = df_stats['cluster_size']
     print(f"\n聚类大小分布:")
-    print(f"  单基因聚类 (size=1): {sum(1 for s in cluster_sizes if s == 1)}")
-    print(f"  小聚类 (size=2-5): {sum(1 for s in cluster_sizes if 2 <= s <= 5)}")
-    print(f"  中聚类 (size=6-10): {sum(1 for s in cluster_sizes if 6 <= s <= 10)}")
-    print(f"  大聚类 (size>10): {sum(1 for s in cluster_sizes if s > 10)}")
-    print(f"  最大聚类大小: {max(cluster_sizes)}")
+    print(f"  单基因聚类 (size=1): {int((cluster_sizes == 1).sum())}")
+    print(f"  小聚类 (size=2-5): {int(cluster_sizes.between(2, 5).sum())}")
+    print(f"  中聚类 (size=6-10): {int(cluster_sizes.between(6, 10).sum())}")
+    print(f"  大聚类 (size>10): {int((cluster_sizes > 10).sum())}")
+    print(f"  最大聚类大小: {int(cluster_sizes.max()) if total_clusters else 0}")
+
+    if df_classes is not None:
+        class_counts = df_classes['frequency_class'].value_counts()
+        print(f"\n频率分类 (共 {len(samples)} 个样本):")
+        print(f"  core (>={CORE_FREQ:.0%}): {int(class_counts.get('core', 0))}")
+        print(f"  soft_core ({SOFT_CORE_FREQ:.0%}-{CORE_FREQ:.0%}): {int(class_counts.get('soft_core', 0))}")
+        print(f"  shell ({SHELL_FREQ:.0%}-{SOFT_CORE_FREQ:.0%}): {int(class_counts.get('shell', 0))}")
+        print(f"  cloud (<{SHELL_FREQ:.0%}): {int(class_counts.get('cloud', 0))}")
+
 
 def main():
     if len(sys.argv) != 3:
@@ -196,17 +304,32 @@ def main():
     print(f"输入文件: {uc_file}")
     print(f"输出目录: {output_dir}")
     
-    # 解析UC文件
-    clusters, cluster_info = parse_uc_file(uc_file)
-    
-    # 生成追踪表
-    df_tracking = generate_tracking_table(clusters, output_dir)
-    
-    # 生成统计信息
-    df_stats = generate_cluster_statistics(clusters, cluster_info, output_dir)
+    with profiling.Profiler('3-处理聚类结果.py') as prof:
+        # 解析UC文件，并一次性拆分序列ID
+        with prof.phase('parse') as ph:
+            members, cluster_info = parse_uc_file(uc_file)
+            ph.items = len(members)
+        with prof.phase('annotate') as ph:
+            members = annotate_members(members)
+            ph.items = len(members)
+
+        # 生成追踪表
+        with prof.phase('tracking') as ph:
+            df_tracking = generate_tracking_table(members, output_dir)
+            ph.items = len(df_tracking)
+
+        # 生成统计信息
+        with prof.phase('statistics') as ph:
+            df_stats = generate_cluster_statistics(members, cluster_info, output_dir)
+            ph.items = len(df_stats)
+
+        # 生成聚类×样本矩阵和频率分类
+        with prof.phase('matrix') as ph:
+            df_classes = generate_presence_matrix(members, output_dir)
+            ph.items = len(df_classes)
     
     # 打印总结
-    print_summary(clusters, df_tracking)
+    print_summary(df_stats, df_tracking, df_classes)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+增量聚类：新样本到达时，只把新样本的基因比对到已有聚类中心，不再对全部序列重新聚类
+
+流程（由 2-vsearch.sh 的 MODE=incremental 调用）：
+  1. prepare: 对比 FINAL_DIR/gene_sample_tracking.tsv 和 merged_samples.txt 中已有的样本，
+     用 2-merge-fasta.py 只合并 INPUT_DIR 下新样本的 .ffn 为一个 FASTA，新样本列表写入 <FASTA 去扩展名>.samples.txt
+  2. vsearch --usearch_global 新基因 vs centroids.fasta，未命中的基因写入 unassigned.fasta
+  3. vsearch --cluster_fast unassigned.fasta，为未命中的基因建立新聚类
+  4. update: 把命中结果归入已有聚类、新聚类顺延编号，
+     原地更新 cluster_statistics.tsv / cluster_sample_matrix.npz / cluster_frequency_classes.tsv /
+     centroids.fasta，最后写 gene_sample_tracking.tsv 并把本次样本（包括没有基因的样本）记入 merged_samples.txt；
+     中途失败时追踪表仍是旧的，重跑会重新处理这批样本
+
+用法:
+  python3 4-增量聚类.py prepare <input_dir> <final_dir> <new_genes.fasta>
+  python3 4-增量聚类.py update <final_dir> <hits.uc> <new_clusters.uc> <new_centroids.fasta> [--samples <new_genes.samples.txt>]
+"""
+
+import os
+import sys
+import csv
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+# 共用的模块加载函数（8-流程调度/python/模块加载.py）
+_REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+if _REPO is None:
+    sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+from 模块加载 import load_module
+
+uc_parser = load_module(SCRIPT_DIR / '3-处理聚类结果.py')
+merge_fasta = load_module(SCRIPT_DIR / '2-merge-fasta.py')
+
+# 已合并过的全部样本（追踪表只含有基因的样本，没有基因的样本记在这里，避免每次都被当成新样本）
+MERGED_SAMPLES = 'merged_samples.txt'
+
+
+def read_tracking_table(final_dir):
+    """读取已有的基因-样本追踪表"""
+    tracking_file = os.path.join(final_dir, 'gene_sample_tracking.tsv')
+    # 与 generate_tracking_table 的 to_csv 相同使用默认引号规则（QUOTE_MINIMAL），
+    # 描述中含引号或制表符时才能原样读回
+    df = pd.read_csv(tracking_file, sep='\t', dtype={'cluster_id': 'int64', 'sample_id': str},
+                     keep_default_na=False)
+    df['identity_to_centroid'] = pd.to_numeric(df['identity_to_centroid'])
+    return df
+
+
+def read_merged_samples(final_dir):
+    """读取 merged_samples.txt（不存在时为空）"""
+    path = os.path.join(final_dir, MERGED_SAMPLES)
+    if not os.path.isfile(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def record_merged_samples(final_dir, samples):
+    """把本次处理的样本并入 merged_samples.txt（先写临时文件再替换）"""
+    path = os.path.join(final_dir, MERGED_SAMPLES)
+    merged = read_merged_samples(final_dir) | set(samples)
+    with open(f"{path}.tmp", 'w') as f:
+        f.writelines(f"{sample}\n" for sample in sorted(merged))
+    os.replace(f"{path}.tmp", path)
+
+
+def samples_list_path(output_fasta):
+    """prepare 写出的新样本列表：<FASTA 去扩展名>.samples.txt"""
+    return os.path.splitext(output_fasta)[0] + '.samples.txt'
+
+
+def prepare_new_samples(input_dir, final_dir, output_fasta):
+    """
+    只合并尚未出现在追踪表和 merged_samples.txt 中的样本
+
+    返回新样本列表；若没有新样本，不写出 FASTA
+    """
+    known_samples = set(read_tracking_table(final_dir)['sample_id'].unique()) | read_merged_samples(final_dir)
+    fasta_files = sorted(Path(input_dir).glob("*.ffn"))
+    new_files = [f for f in fasta_files if merge_fasta.extract_sample_id(f.name) not in known_samples]
+
+    if not new_files:
+        print(f"[INFO] {input_dir} 中没有新样本（已有 {len(known_samples)} 个样本）")
+        return []
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_fasta)), exist_ok=True)
+    sample_counts = merge_fasta.merge_fasta_files(input_dir, output_fasta, fasta_files=new_files)
+    with open(samples_list_path(output_fasta), 'w') as f:
+        f.writelines(f"{sample}\n" for sample in sample_counts)
+
+    print(f"[INFO] 新样本 {len(sample_counts)} 个，共 {sum(sample_counts.values())} 条序列 -> {output_fasta}")
+    return list(sample_counts)
+
+
+def parse_global_hits(hits_uc):
+    """
+    解析 vsearch --usearch_global 的 .uc 输出，只保留命中（H）行
+
+    返回列: full_sequence_id, centroid, identity_to_centroid
+    """
+    df = pd.read_csv(hits_uc, sep='\t', header=None, names=uc_parser.UC_COLUMNS,
+                     usecols=['type', 'identity', 'query', 'target'],
+                     dtype=str, quoting=csv.QUOTE_NONE, keep_default_na=False)
+    hits = df.loc[df['type'] == 'H']
+    # --maxaccepts 1 时每个 query 只有一行，这里仍按首行去重以防万一
+    hits = hits.drop_duplicates('query')
+    return pd.DataFrame({
+        'full_sequence_id': hits['query'].values,
+        'centroid': hits['target'].values,
+        'identity_to_centroid': pd.to_numeric(hits['identity'], errors='coerce').fillna(100.0).values,
+    })
+
+
+def atomic_write_fasta_append(centroids_file, new_centroids_fasta):
+    """把新聚类中心追加到 centroids.fasta（先写临时文件再替换）"""
+    tmp = f"{centroids_file}.tmp"
+    with open(tmp, 'wb') as out:
+        with open(centroids_file, 'rb') as old:
+            data = old.read()
+            out.write(data)
+            if data and not data.endswith(b'\n'):
+                out.write(b'\n')
+        with open(new_centroids_fasta, 'rb') as new:
+            out.write(new.read())
+    os.replace(tmp, centroids_file)
+
+
+def update_clusters(final_dir, hits_uc, new_clusters_uc, new_centroids_fasta, samples_file=None):
+    """
+    把增量比对和新聚类的结果合并进 FINAL_DIR 下的已有结果
+
+    samples_file: prepare 写出的新样本列表，更新完成后记入 merged_samples.txt
+    """
+    new_samples = []
+    if samples_file:
+        with open(samples_file) as f:
+            new_samples = [line.strip() for line in f if line.strip()]
+    tracking = read_tracking_table(final_dir)
+
+    # 1) 命中已有聚类中心的基因：通过中心序列ID映射回聚类编号
+    centroid_to_cluster = (tracking.loc[tracking['role_in_cluster'] == 'centroid']
+                           .drop_duplicates('full_sequence_id')
+                           .set_index('full_sequence_id')['cluster_id'])
+    hits = parse_global_hits(hits_uc) if os.path.isfile(hits_uc) else pd.DataFrame(
+        columns=['full_sequence_id', 'centroid', 'identity_to_centroid'])
+    hits['cluster_id'] = hits['centroid'].map(centroid_to_cluster)
+    unmapped = hits['cluster_id'].isna()
+    if unmapped.any():
+        print(f"[WARN] {int(unmapped.sum())} 条命中的中心序列不在追踪表中，已忽略")
+        hits = hits.loc[~unmapped]
+    hits['cluster_id'] = hits['cluster_id'].astype('int64')
+    hits['role_in_cluster'] = 'member'
+
+    # 2) 未命中基因的新聚类：编号顺延到已有最大编号之后
+    if os.path.isfile(new_clusters_uc) and os.path.getsize(new_clusters_uc) > 0:
+        new_members, _ = uc_parser.parse_uc_file(new_clusters_uc)
+        offset = int(tracking['cluster_id'].max()) + 1 if len(tracking) else 0
+        new_members['cluster_id'] = new_members['cluster_id'] + offset
+        new_members['role_in_cluster'] = new_members['role_in_cluster'].astype(str)
+    else:
+        new_members = pd.DataFrame(columns=['cluster_id', 'full_sequence_id', 'role_in_cluster',
+                                            'identity_to_centroid', 'centroid'])
+
+    added = pd.concat([hits, new_members], ignore_index=True)
+    if added.empty:
+        print("[INFO] 没有需要合并的新基因")
+        record_merged_samples(final_dir, new_samples)
+        return
+
+    added = uc_parser.annotate_members(added)
+    added['sample_id'] = added['sample_id'].astype(str)
+    columns = ['cluster_id', 'sample_id', 'gene_id', 'gene_description',
+               'full_sequence_id', 'role_in_cluster', 'identity_to_centroid']
+    members = pd.concat([tracking[columns], added[columns]], ignore_index=True)
+    # 同一聚类的行放在一起（已有聚类保持原顺序，新成员排在各自聚类末尾）
+    first_seen = pd.Series(pd.factorize(members['cluster_id'])[0], index=members.index)
+    members = members.loc[first_seen.sort_values(kind='stable').index].reset_index(drop=True)
+    members['sample_id'] = members['sample_id'].astype('category')
+
+    cluster_info = (members.loc[members['role_in_cluster'] == 'centroid', ['cluster_id', 'full_sequence_id']]
+                    .drop_duplicates('cluster_id')
+                    .rename(columns={'full_sequence_id': 'centroid'}))
+
+    # 3) 原地更新所有输出；追踪表决定哪些样本已处理，放在最后写
+    df_stats = uc_parser.generate_cluster_statistics(members, cluster_info, final_dir)
+    df_classes = uc_parser.generate_presence_matrix(members, final_dir)
+
+    centroids_file = os.path.join(final_dir, 'centroids.fasta')
+    if os.path.isfile(new_centroids_fasta) and os.path.getsize(new_centroids_fasta) > 0:
+        atomic_write_fasta_append(centroids_file, new_centroids_fasta)
+        print(f"聚类中心序列已追加: {centroids_file}")
+
+    uc_parser.generate_tracking_table(members, final_dir)
+    record_merged_samples(final_dir, new_samples)
+
+    print(f"\n[INFO] 归入已有聚类的基因: {len(hits)}")
+    print(f"[INFO] 新建聚类: {new_members['cluster_id'].nunique()} (基因 {len(new_members)})")
+    uc_parser.print_summary(df_stats, members, df_classes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VSEARCH 增量聚类：新样本基因归入已有聚类")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_prepare = sub.add_parser('prepare', help='合并新样本的 .ffn')
+    p_prepare.add_argument('input_dir', help='包含 *.ffn 的输入目录')
+    p_prepare.add_argument('final_dir', help='上一次聚类的结果目录')
+    p_prepare.add_argument('output_fasta', help='新样本合并后的 FASTA')
+
+    p_update = sub.add_parser('update', help='合并增量结果并原地更新追踪表/统计表')
+    p_update.add_argument('final_dir', help='上一次聚类的结果目录（原地更新）')
+    p_update.add_argument('hits_uc', help='usearch_global 的 .uc 输出')
+    p_update.add_argument('new_clusters_uc', help='未命中基因 cluster_fast 的 .uc 输出')
+    p_update.add_argument('new_centroids', help='未命中基因的新聚类中心 FASTA')
+    p_update.add_argument('--samples', help='prepare 写出的新样本列表（<FASTA 去扩展名>.samples.txt）')
+
+    args = parser.parse_args()
+
+    final_dir = args.final_dir
+    for name in ('gene_sample_tracking.tsv', 'centroids.fasta'):
+        if not os.path.isfile(os.path.join(final_dir, name)):
+            print(f"错误: {final_dir} 中缺少 {name}，请先运行一次完整聚类")
+            sys.exit(1)
+
+    if args.command == 'prepare':
+        if not os.path.isdir(args.input_dir):
+            print(f"错误: 输入目录 {args.input_dir} 不存在")
+            sys.exit(1)
+        new_samples = prepare_new_samples(args.input_dir, final_dir, args.output_fasta)
+        # 退出码 3 表示没有新样本，供 shell 脚本判断是否跳过后续步骤
+        if not new_samples:
+            sys.exit(3)
+    else:
+        update_clusters(final_dir, args.hits_uc, args.new_clusters_uc, args.new_centroids, args.samples)
+
+
+if __name__ == "__main__":
+    main()
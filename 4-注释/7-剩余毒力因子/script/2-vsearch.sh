@@ -2,12 +2,18 @@
 # 使用vsearch对剩余毒力因子进行聚类分析
 # 阈值：<99.5% identity
 # 保留样本ID和基因ID用于后期追踪
+#
+# 运行模式（MODE 环境变量）：
+#   full        （默认）合并全部样本并从头聚类
+#   incremental 保留上一次的 centroids.fasta 和追踪表，只把新样本的基因比对到已有聚类中心
+#               （vsearch --usearch_global），未命中的基因单独聚类后顺延编号，结果原地更新到 FINAL_DIR
 
 # 设置路径
 INPUT_DIR="/mnt/d/1-鲍曼菌/毒力因子其他"
 TEMP_DIR="${INPUT_DIR}/vsearch_clustering/"
 FINAL_DIR="${INPUT_DIR}/vsearch_clustering_final/"
 SCRIPT_DIR="/mnt/f/OneDrive/文档（科研）/脚本/Download/13-A.baumannii/4-注释/7-剩余毒力因子/python"
+MODE="${MODE:-full}"
 
 # 创建输出目录
 mkdir -p "$TEMP_DIR"
@@ -19,6 +25,65 @@ if ! command -v vsearch &> /dev/null; then
     exit 1
 fi
 
+# ===== 增量模式 =====
+if [[ "$MODE" == "incremental" ]]; then
+    if [[ ! -f "$FINAL_DIR/centroids.fasta" || ! -f "$FINAL_DIR/gene_sample_tracking.tsv" ]]; then
+        echo "错误: 增量模式需要上一次的结果 ($FINAL_DIR/centroids.fasta, gene_sample_tracking.tsv)"
+        echo "请先以 MODE=full 运行一次完整聚类"
+        exit 1
+    fi
+
+    echo "开始增量聚类..."
+    echo "已有结果目录: $FINAL_DIR"
+
+    echo "步骤1: 合并新样本的FASTA文件..."
+    python3 "$SCRIPT_DIR/4-增量聚类.py" prepare "$INPUT_DIR" "$FINAL_DIR" "$TEMP_DIR/new_genes.fasta"
+    status=$?
+    if [[ $status -eq 3 ]]; then
+        echo "没有新样本，无需更新。"
+        rm -rf "${TEMP_DIR}"
+        exit 0
+    elif [[ $status -ne 0 ]]; then
+        exit $status
+    fi
+
+    echo "步骤2: 新基因比对到已有聚类中心 (identity >= 99.5%)..."
+    vsearch --usearch_global "$TEMP_DIR/new_genes.fasta" \
+            --db "$FINAL_DIR/centroids.fasta" \
+            --id 0.995 \
+            --maxaccepts 1 \
+            --uc "$TEMP_DIR/new_vs_centroids.uc" \
+            --notmatched "$TEMP_DIR/unassigned.fasta" \
+            --threads 16
+
+    echo "步骤3: 未命中的基因单独聚类..."
+    touch "$TEMP_DIR/new_clusters.uc" "$TEMP_DIR/new_centroids.fasta"
+    if [[ -s "$TEMP_DIR/unassigned.fasta" ]]; then
+        vsearch --cluster_fast "$TEMP_DIR/unassigned.fasta" \
+                --id 0.995 \
+                --centroids "$TEMP_DIR/new_centroids.fasta" \
+                --uc "$TEMP_DIR/new_clusters.uc" \
+                --threads 16
+    fi
+
+    echo "步骤4: 原地更新追踪表和统计信息..."
+    python3 "$SCRIPT_DIR/4-增量聚类.py" update "$FINAL_DIR" \
+            "$TEMP_DIR/new_vs_centroids.uc" \
+            "$TEMP_DIR/new_clusters.uc" \
+            "$TEMP_DIR/new_centroids.fasta" \
+            --samples "$TEMP_DIR/new_genes.samples.txt" || exit $?
+
+    # 保留本次增量的 .uc 以便追溯
+    STAMP="$(date +%Y%m%d_%H%M%S)"
+    mkdir -p "$FINAL_DIR/incremental"
+    mv "$TEMP_DIR/new_vs_centroids.uc" "$FINAL_DIR/incremental/${STAMP}_new_vs_centroids.uc"
+    mv "$TEMP_DIR/new_clusters.uc" "$FINAL_DIR/incremental/${STAMP}_new_clusters.uc"
+
+    rm -rf "${TEMP_DIR}"
+    echo "增量聚类完成！结果已更新到 $FINAL_DIR"
+    exit 0
+fi
+
 echo "开始处理剩余毒力因子聚类分析..."
 echo "输入目录: $INPUT_DIR"
 echo "输出目录: $TEMP_DIR"
@@ -48,10 +113,14 @@ echo "  - 聚类中心序列: $TEMP_DIR/centroids.fasta"
 echo "  - 聚类结果详情: $TEMP_DIR/clustering_results.uc"
 echo "  - 样本基因追踪表: $TEMP_DIR/gene_sample_tracking.tsv"
 echo "  - 聚类统计信息: $TEMP_DIR/cluster_statistics.tsv"
+echo "  - 聚类×样本稀疏矩阵: $TEMP_DIR/cluster_sample_matrix.npz"
+echo "  - 聚类频率分类: $TEMP_DIR/cluster_frequency_classes.tsv"
 
 mv "$TEMP_DIR/centroids.fasta" "$FINAL_DIR/"
 mv "$TEMP_DIR/clustering_results.uc" "$FINAL_DIR/"
 mv "$TEMP_DIR/gene_sample_tracking.tsv" "$FINAL_DIR/"
 mv "$TEMP_DIR/cluster_statistics.tsv" "$FINAL_DIR/"
+mv "$TEMP_DIR/cluster_sample_matrix.npz" "$FINAL_DIR/"
+mv "$TEMP_DIR/cluster_frequency_classes.tsv" "$FINAL_DIR/"
 
 rm -rf "${TEMP_DIR}"
\ No newline at end of file
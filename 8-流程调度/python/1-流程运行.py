@@ -0,0 +1,674 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全流程运行器：按样本把各阶段建成有向无环图（DAG），在统一的核心预算内调度
+
+替代依次手动运行的 shell 阶段：
+  1-质控.sh → 2-EToKi新版.sh → 3-Kraken2.sh → 3-contig-rename.sh → 2-prokka.sh
+  → 3-blastn-比对.sh → 4-分型.sh / 2-比对-diamond.sh / 1-AMRfinder.sh / 1-Kaptive.sh
+  → 1-获取剩余毒力ffn.sh → 2-vsearch.sh
+
+- 路径、数据库、每个工具的线程数都在 conf/pipeline.json 中配置，不再写死在各个脚本里
+- 同时运行的任务所占线程数之和不超过 core_budget，由 2-核心调度.py 的令牌桶分配：
+  每个任务的线程数按空闲核心和排队任务数在 [最少, 最多] 之间动态决定，
+  每个任务结束后把 CPU 时间、墙钟时间、峰值 RSS 记录到 <work_dir>/<logs>/job_usage.tsv
+- 输出文件都已存在且比输入新的任务直接跳过
+- 运行状态记录在 <work_dir>/<logs>/pipeline_state.tsv，失败或中断后重新运行即可从断点继续；
+  某个样本失败时只阻塞它的下游任务，其余样本照常运行
+
+用法:
+  python3 1-流程运行.py -c ../conf/pipeline.json                    # 运行全部阶段
+  python3 1-流程运行.py -c ../conf/pipeline.json --dry-run          # 只打印计划
+  python3 1-流程运行.py -c ../conf/pipeline.json --stages prokka diamond --samples ERR1946991
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import signal
+import argparse
+from pathlib import Path
+from collections import OrderedDict
+from datetime import datetime
+
+from 模块加载 import load_module  # 同目录的共用模块加载函数
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parents[1]
+
+FASTQ_PATTERNS = (('_1.fastq.gz', '_2.fastq.gz'), ('_R1.fastq.gz', '_R2.fastq.gz'))
+
+core_scheduler = load_module(SCRIPT_DIR / '2-核心调度.py')
+
+# 命令中的线程数占位符，启动时替换为分配到的线程数
+THREADS = core_scheduler.THREADS_PLACEHOLDER
+
+# 与 3-性能记录.py 相同的环境变量：设置后各 Python 阶段记录分阶段耗时
+PROFILE_ENV = 'AB_PROFILE'
+
+
+class Task:
+    """DAG 中的一个任务：一个阶段作用于一个样本（sample 为 None 时是全体样本的汇总阶段）"""
+
+    def __init__(self, stage, sample, command, inputs, outputs, threads, deps=(), cwd=None, env=None):
+        self.stage = stage
+        self.sample = sample
+        self.command = command          # 字符串用 bash -c 执行，列表直接执行；{threads} 为线程数
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        # threads 为 (最少, 最多) 线程数，或固定的整数
+        self.min_threads, self.threads = threads if isinstance(threads, tuple) else (threads, threads)
+        self.deps = list(deps)
+        self.cwd = cwd
+        self.env = env or {}
+
+    @property
+    def key(self):
+        return f"{self.stage}:{self.sample}" if self.sample else self.stage
+
+    def is_up_to_date(self):
+        """所有输出都存在，且不早于任何已存在的输入"""
+        if not self.outputs or not all(p.exists() for p in self.outputs):
+            return False
+        input_mtimes = [p.stat().st_mtime for p in self.inputs if p.exists()]
+        if not input_mtimes:
+            return True
+        return min(p.stat().st_mtime for p in self.outputs) >= max(input_mtimes)
+
+    def job(self, log_dir):
+        log_path = Path(log_dir) / self.stage / f"{self.sample or self.stage}.log"
+        return core_scheduler.Job(self.key, self.command, self.min_threads, self.threads,
+                                  env=self.env, cwd=self.cwd, log_path=log_path)
+
+
+class Config:
+    """读取 pipeline.json，提供各阶段用到的路径"""
+
+    def __init__(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            cfg = json.load(f)
+        self.raw = cfg
+        self.core_budget = int(cfg.get('core_budget') or os.cpu_count() or 1)
+        self.fastq_dir = Path(os.path.expanduser(cfg['fastq_dir']))
+        self.work_dir = Path(os.path.expanduser(cfg['work_dir']))
+        self.dirs = {k: self.work_dir / v for k, v in cfg.get('dirs', {}).items()}
+        self.dirs.setdefault('logs', self.work_dir / 'pipeline_logs')
+        self.threads = cfg.get('threads', {})
+        self.databases = {k: self._repo_path(v) for k, v in cfg.get('databases', {}).items()}
+
+    @staticmethod
+    def _repo_path(value):
+        """数据库路径：绝对路径（或 ~）原样使用，相对路径相对于仓库根目录"""
+        path = Path(os.path.expanduser(value))
+        return path if path.is_absolute() else REPO_DIR / path
+
+    def script(self, relative):
+        return REPO_DIR / relative
+
+    def thread_range(self, stage, default=1, scalable=True):
+        """
+        返回阶段的 (最少, 最多) 线程数
+
+        配置为整数 n 时：可调线程数的工具为 (1, n)，线程数固定的步骤为 (n, n)；
+        配置为 [最少, 最多] 时原样使用
+        """
+        value = self.threads.get(stage, default)
+        if isinstance(value, list):
+            lo, hi = int(value[0]), int(value[-1])
+            return (lo, hi) if scalable else (hi, hi)
+        value = int(value)
+        return (1, value) if scalable else (value, value)
+
+
+def discover_samples(fastq_dir):
+    """
+    按 2-EToKi新版.sh 的规则配对 FASTQ：*_1/_2 或 *_R1/_R2 为双端，其余为单端
+
+    返回 {样本名: [read1, read2] 或 [read]}
+    """
+    samples = OrderedDict()
+    files = sorted(Path(fastq_dir).glob('*.fastq.gz'))
+    names = {f.name for f in files}
+    for f in files:
+        paired = False
+        for r1_suffix, r2_suffix in FASTQ_PATTERNS:
+            if f.name.endswith(r1_suffix):
+                sample = f.name[:-len(r1_suffix)]
+                r2 = sample + r2_suffix
+                if r2 in names:
+                    samples[sample] = [f, f.with_name(r2)]
+                    paired = True
+                    break
+            if f.name.endswith(r2_suffix) and f.name[:-len(r2_suffix)] + r1_suffix in names:
+                paired = True
+                break
+        if not paired:
+            samples.setdefault(f.name[:-len('.fastq.gz')], [f])
+    return samples
+
+
+# ---------------------------------------------------------------------------
+# 各阶段：输入一个样本，返回 Task（与对应 shell 脚本中的命令一致）
+# ---------------------------------------------------------------------------
+
+def q(value):
+    return shlex.quote(str(value))
+
+
+def stage_qc(cfg, sample, reads):
+    out_dir = cfg.dirs['qc'] / sample / 'fastqc_raw_output'
+    outputs = [out_dir / (r.name[:-len('.fastq.gz')] + '_fastqc.zip') for r in reads]
+    threads = cfg.thread_range('qc', 8)
+    command = ['fastqc', *reads, '-o', out_dir, '--threads', THREADS, '--extract']
+    return Task('qc', sample, f"mkdir -p {q(out_dir)} && " + ' '.join(q(c) for c in command),
+                reads, outputs, threads)
+
+
+def stage_assemble(cfg, sample, reads):
+    out_dir = cfg.dirs['assemble']
+    work = out_dir / f"{sample}_Assembly" / 'etoki_assembly'
+    final = out_dir / f"{sample}.fasta"
+    prefix = sample
+    if len(reads) == 2:
+        prepare = f"--pe {q(reads[0])},{q(reads[1])}"
+        assemble = f"--pe {q(prefix + '_cleaned_L1_R1.fastq.gz')},{q(prefix + '_cleaned_L1_R2.fastq.gz')}"
+    else:
+        prepare = f"--se {q(reads[0])}"
+        assemble = f"--se {q(prefix + '_cleaned_L1_SE.fastq.gz')}"
+    asm = q(f"{prefix}_assembly")
+    command = (
+        f"mkdir -p {q(work)} && cd {q(work)} && "
+        f"EToKi.py prepare {prepare} --prefix {q(prefix + '_cleaned')} && "
+        f"EToKi.py assemble {assemble} --prefix {asm} --assembler spades --kraken --accurate_depth && "
+        f"if [[ -f {asm}/etoki.mapping.reference.fasta ]]; then mv {asm}/etoki.mapping.reference.fasta {q(final)}; "
+        f"else cp {asm}/spades/contigs.fasta {q(final)}; fi && "
+        # 与 2-EToKi新版.sh 相同：删除中间文件
+        f"rm -rf {asm}/spades/ {asm}/*.fastq.gz ./*.fastq.gz {asm}/*.bam {asm}/*.bai"
+    )
+    # EToKi 的线程数由其自身配置决定，这里只按 threads.assemble 预留固定数量的核心
+    return Task('assemble', sample, command, reads, [final], cfg.thread_range('assemble', 8, scalable=False))
+
+
+def stage_kraken2(cfg, sample, reads):
+    out_dir = cfg.dirs['kraken']
+    report = out_dir / f"{sample}_kraken_report.txt"
+    output = out_dir / f"{sample}_kraken_output.txt"
+    threads = cfg.thread_range('kraken2', 8)
+    mode = ['--paired', *reads] if len(reads) == 2 else list(reads)
+    command = ['kraken2', '--db', cfg.databases['kraken2'], *mode, '--threads', THREADS,
+               '--report', report, '--output', output]
+    return Task('kraken2', sample, f"mkdir -p {q(out_dir)} && " + ' '.join(q(c) for c in command),
+                reads, [report, output], threads)
+
+
+def stage_rename(cfg, sample, reads):
+    src = cfg.dirs['assemble'] / f"{sample}.fasta"
+    out_dir = cfg.dirs['assemble_rename']
+    out = out_dir / f"{sample}.fasta"
+    id_map = out_dir / 'contig_maps' / f"{sample}.tsv"
+    # 与 3-contig-rename.sh 相同：>样本名_序号，去掉 CRLF；每个样本单独一张 ID 对应表
+    command = ['python3', cfg.script('1-组装/python/5-contig重命名.py'), src, '-o', out_dir, '--map', id_map, '-j', '1']
+    return Task('rename', sample, command, [src], [out, id_map], cfg.thread_range('rename', 1, scalable=False),
+                deps=[f"assemble:{sample}"])
+
+
+def prokka_files(cfg, sample):
+    base = cfg.dirs['prokka'] / sample / sample
+    return {ext: Path(f"{base}.{ext}") for ext in ('ffn', 'faa', 'gff', 'fna')}
+
+
+def stage_prokka(cfg, sample, reads):
+    fasta = cfg.dirs['assemble_rename'] / f"{sample}.fasta"
+    threads = cfg.thread_range('prokka', 4)
+    command = ['prokka', '--outdir', cfg.dirs['prokka'] / sample, '--prefix', sample, '--force',
+               '--kingdom', 'Bacteria', '--genus', 'Acinetobacter', '--species', 'baumannii',
+               '--strain', sample, '--cpus', THREADS, fasta]
+    return Task('prokka', sample, command, [fasta], list(prokka_files(cfg, sample).values()), threads,
+                deps=[f"rename:{sample}"])
+
+
+def stage_blastn(cfg, sample, reads):
+    fasta = cfg.dirs['assemble_rename'] / f"{sample}.fasta"
+    out_dir = cfg.dirs['mlst']
+    profiles = cfg.databases['mlst_profiles']
+    threads = cfg.thread_range('blastn', 2)
+    fmt = '6 qseqid sseqid pident length qlen slen qstart qend sstart send bitscore evalue'
+    outputs, parts = [], [f"mkdir -p {q(out_dir)}"]
+    for scheme, db in (('oxford', profiles / 'Oxford' / 'blastdb' / 'oxford'),
+                       ('pasteur', profiles / 'Pasteur' / 'blastdb' / 'pasteur')):
+        out = out_dir / f"{sample}.{scheme}_vs_query.b6"
+        outputs.append(out)
+        # 先写临时文件，避免中断后留下不完整的 .b6 被误判为已完成
+        parts.append(f"blastn -query {q(fasta)} -db {q(db)} -task blastn -evalue 1e-20 -max_target_seqs 50 "
+                     f"-num_threads {THREADS} -outfmt {q(fmt)} > {q(out)}.tmp && mv {q(out)}.tmp {q(out)}")
+    return Task('blastn', sample, ' && '.join(parts), [fasta], outputs, threads, deps=[f"rename:{sample}"])
+
+
+def stage_diamond(cfg, sample, reads):
+    faa = prokka_files(cfg, sample)['faa']
+    out_dir = cfg.dirs['virulence']
+    out = out_dir / f"{sample}_vs_VFDB.tsv"
+    db = cfg.databases['vfdb']
+    db = Path(f"{db}.dmnd") if Path(f"{db}.dmnd").exists() else db
+    threads = cfg.thread_range('diamond', 1)
+    command = (f"mkdir -p {q(out_dir)} && diamond blastp -q {q(faa)} -d {q(db)} -o {q(out)}.tmp "
+               f"-e 1e-5 -p {THREADS} --outfmt 6 && mv {q(out)}.tmp {q(out)}")
+    return Task('diamond', sample, command, [faa], [out], threads, deps=[f"prokka:{sample}"])
+
+
+def stage_virulence_filter(cfg, sample, reads):
+    tsv = cfg.dirs['virulence'] / f"{sample}_vs_VFDB.tsv"
+    out_dir = cfg.dirs['virulence'] / '阈值'
+    command = ['python3', cfg.script('4-注释/4-Virulence/python/3-筛选diamond.py'), tsv, out_dir, '-j', 1]
+    return Task('virulence_filter', sample, command, [tsv], [out_dir / f"{sample}_vs_VFDB.txt"],
+                cfg.thread_range('virulence_filter', 1, scalable=False), deps=[f"diamond:{sample}"])
+
+
+def stage_virulence_annotate(cfg, samples):
+    filtered = cfg.dirs['virulence'] / '阈值'
+    catalog = cfg.dirs['prokka'] / 'gene_catalog.sqlite'
+    out = cfg.dirs['virulence'] / 'VFDB_hits_annotated.tsv'
+    command = ['python3', cfg.script('4-注释/4-Virulence/python/4-注释毒力结果.py'), filtered, '-o', out,
+               '-c', catalog]
+    # 1-构建数据库.sh 合并 setA + setB 得到的 FASTA；不存在时脚本使用 data/ 下的默认文件
+    vfdb_fasta = Path(f"{cfg.databases['vfdb']}.faa")
+    if vfdb_fasta.exists():
+        command += ['-v', vfdb_fasta]
+    inputs = [filtered / f"{s}_vs_VFDB.txt" for s in samples] + [catalog]
+    deps = [f"virulence_filter:{s}" for s in samples] + ['gene_catalog']
+    return Task('virulence_annotate', None, command, inputs, [out],
+                cfg.thread_range('virulence_annotate', 1, scalable=False), deps=deps)
+
+
+def stage_amrfinder(cfg, sample, reads):
+    files = prokka_files(cfg, sample)
+    out_dir = cfg.dirs['amr']
+    out = out_dir / f"{sample}_AMRFinder.tsv"
+    threads = cfg.thread_range('amrfinder', 8)
+    command = (f"mkdir -p {q(out_dir)} && amrfinder --plus -n {q(files['fna'])} -p {q(files['faa'])} "
+               f"-g {q(files['gff'])} --annotation_format prokka --threads {THREADS} -o {q(out)}.tmp "
+               f"&& mv {q(out)}.tmp {q(out)}")
+    return Task('amrfinder', sample, command, [files['fna'], files['faa'], files['gff']], [out], threads,
+                deps=[f"prokka:{sample}"])
+
+
+def stage_kaptive(cfg, sample, reads):
+    ffn = prokka_files(cfg, sample)['ffn']
+    base = cfg.dirs['kaptive']
+    threads = cfg.thread_range('kaptive', 2)
+    parts, outputs = [], []
+    for db, sub, tag in (('ab_o', 'OCL_results', 'OCL'), ('ab_k', 'K_locus_results', 'K_locus')):
+        out_dir = base / sub
+        tsv = out_dir / f"{sample}_{tag}_results.tsv"
+        outputs += [tsv, out_dir / f"{sample}_kaptive_results.fna"]
+        parts.append(f"mkdir -p {q(out_dir)} && kaptive assembly {db} {q(ffn)} -o {q(tsv)} "
+                     f"--plot {q(out_dir)}/ --fasta {q(out_dir)}/ --json {q(out_dir / f'{sample}_{tag}_results.json')} "
+                     f"--threads {THREADS}")
+    return Task('kaptive', sample, ' && '.join(parts), [ffn], outputs, threads, deps=[f"prokka:{sample}"])
+
+
+def stage_residual(cfg, sample, reads):
+    ffn = prokka_files(cfg, sample)['ffn']
+    kaptive = cfg.dirs['kaptive']
+    out = cfg.dirs['residual'] / f"{sample}.Remain.ffn"
+    env = {'PROKKA_DIR': str(cfg.dirs['prokka']), 'K_DIR': str(kaptive / 'K_locus_results'),
+           'OCL_DIR': str(kaptive / 'OCL_results'), 'OUTPUT_DIR': str(cfg.dirs['residual'])}
+    command = ['python3', cfg.script('4-注释/7-剩余毒力因子/python/1-获取剩余毒力ffn.py'), sample]
+    return Task('residual', sample, command, [ffn], [out], cfg.thread_range('residual', 1, scalable=False),
+                deps=[f"kaptive:{sample}"], env=env)
+
+
+def stage_mlst_typing(cfg, samples):
+    blast_dir = cfg.dirs['mlst']
+    out_dir = blast_dir / '分型结果'
+    inputs = [blast_dir / f"{s}.{scheme}_vs_query.b6" for s in samples for scheme in ('oxford', 'pasteur')]
+    command = ['python3', cfg.script('4-注释/2-MLST/python/4-分型.py'), '-i', blast_dir,
+               '-p', cfg.databases['mlst_profiles'], '-o', out_dir, '-s', *samples]
+    outputs = [out_dir / name for name in ('MLST_summary.csv', 'MLST_detailed_alleles.csv',
+                                           'MLST_detailed_report.txt')]
+    return Task('mlst_typing', None, command, inputs, outputs, cfg.thread_range('mlst_typing', 1, scalable=False),
+                deps=[f"blastn:{s}" for s in samples])
+
+
+def stage_kraken_screen(cfg, samples):
+    kraken = cfg.dirs['kraken']
+    out_dir = kraken / '汇总'
+    command = ['python3', cfg.script('1-组装/python/1-Kraken2报告汇总.py'), kraken, '-o', out_dir, '-j', THREADS]
+    inputs = [kraken / f"{s}_kraken_report.txt" for s in samples]
+    outputs = [out_dir / 'Kraken_species_matrix.npz', out_dir / 'Kraken_screening.tsv']
+    return Task('kraken_screen', None, command, inputs, outputs, cfg.thread_range('kraken_screen', 4),
+                deps=[f"kraken2:{s}" for s in samples])
+
+
+def stage_kraken_reads(cfg, samples):
+    kraken = cfg.dirs['kraken']
+    out_dir = kraken / '汇总'
+    command = ['python3', cfg.script('1-组装/python/2-Kraken2逐条结果汇总.py'), kraken, '-o', out_dir, '-j', THREADS]
+    inputs = [kraken / f"{s}{suffix}" for s in samples for suffix in ('_kraken_output.txt', '_kraken_report.txt')]
+    outputs = [out_dir / 'Kraken_read_summary.tsv'] + [out_dir / f"{s}_contaminant_reads.txt" for s in samples]
+    return Task('kraken_reads', None, command, inputs, outputs, cfg.thread_range('kraken_reads', 4),
+                deps=[f"kraken2:{s}" for s in samples])
+
+
+def stage_amr_matrix(cfg, samples):
+    amr_dir = cfg.dirs['amr']
+    out_dir = amr_dir / '汇总'
+    command = ['python3', cfg.script('4-注释/3-AntibioticGene/python/2-汇总耐药矩阵.py'), amr_dir,
+               '-o', out_dir, '-j', THREADS]
+    inputs = [amr_dir / f"{s}_AMRFinder.tsv" for s in samples]
+    outputs = [out_dir / name for name in ('AMR_gene_matrix.npz', 'AMR_class_matrix.npz', 'AMR_samples.tsv')]
+    return Task('amr_matrix', None, command, inputs, outputs, cfg.thread_range('amr_matrix', 4),
+                deps=[f"amrfinder:{s}" for s in samples])
+
+
+def stage_gene_catalog(cfg, samples):
+    prokka_dir = cfg.dirs['prokka']
+    db = prokka_dir / 'gene_catalog.sqlite'
+    inputs = [path for s in samples for ext, path in prokka_files(cfg, s).items() if ext != 'fna']
+    command = ['python3', cfg.script('4-注释/1-prokka/python/3-基因目录.py'), 'build', prokka_dir,
+               '-d', db, '-j', THREADS]
+    return Task('gene_catalog', None, command, inputs, [db], cfg.thread_range('gene_catalog', 4),
+                deps=[f"prokka:{s}" for s in samples])
+
+
+def stage_kaptive_summary(cfg, samples):
+    kaptive = cfg.dirs['kaptive']
+    inputs = [kaptive / d / f"{s}{suffix}" for s in samples
+              for d, suffix in (('K_locus_results', '_K_locus_results.tsv'), ('OCL_results', '_OCL_results.tsv'))]
+    command = ['python3', cfg.script('4-注释/6-荚膜多糖/python/2-汇总Kaptive.py'), kaptive, '-j', THREADS]
+    return Task('kaptive_summary', None, command, inputs, [kaptive / 'Kaptive_summary.tsv'],
+                cfg.thread_range('kaptive_summary', 2), deps=[f"kaptive:{s}" for s in samples])
+
+
+def stage_vsearch(cfg, samples):
+    residual = cfg.dirs['residual']
+    tmp = residual / 'vsearch_clustering'
+    scripts = cfg.script('4-注释/7-剩余毒力因子/python')
+    threads = cfg.thread_range('vsearch', 16)
+    # 与 2-vsearch.sh 的完整模式相同
+    command = (
+        f"mkdir -p {q(tmp)} && "
+        f"python3 {q(scripts / '2-merge-fasta.py')} {q(residual)} {q(tmp / 'all_genes_with_sample_info.fasta')} && "
+        f"vsearch --cluster_fast {q(tmp / 'all_genes_with_sample_info.fasta')} --id 0.995 "
+        f"--centroids {q(tmp / 'centroids.fasta')} --clusters {q(tmp)}/cluster_ "
+        f"--uc {q(tmp / 'clustering_results.uc')} --consout {q(tmp / 'consensus.fasta')} "
+        f"--msaout {q(tmp / 'alignment.fasta')} --threads {THREADS} && "
+        f"python3 {q(scripts / '3-处理聚类结果.py')} {q(tmp / 'clustering_results.uc')} {q(tmp)}"
+    )
+    inputs = [residual / f"{s}.Remain.ffn" for s in samples]
+    outputs = [tmp / 'gene_sample_tracking.tsv', tmp / 'cluster_statistics.tsv']
+    return Task('vsearch', None, command, inputs, outputs, threads, deps=[f"residual:{s}" for s in samples])
+
+
+# 阶段名 -> (构建函数, 是否按样本)；顺序即默认优先级
+STAGES = OrderedDict([
+    ('qc', (stage_qc, True)),
+    ('assemble', (stage_assemble, True)),
+    ('kraken2', (stage_kraken2, True)),
+    ('rename', (stage_rename, True)),
+    ('prokka', (stage_prokka, True)),
+    ('blastn', (stage_blastn, True)),
+    ('diamond', (stage_diamond, True)),
+    ('virulence_filter', (stage_virulence_filter, True)),
+    ('amrfinder', (stage_amrfinder, True)),
+    ('kaptive', (stage_kaptive, True)),
+    ('residual', (stage_residual, True)),
+    ('mlst_typing', (stage_mlst_typing, False)),
+    ('kraken_screen', (stage_kraken_screen, False)),
+    ('kraken_reads', (stage_kraken_reads, False)),
+    ('amr_matrix', (stage_amr_matrix, False)),
+    ('gene_catalog', (stage_gene_catalog, False)),
+    ('virulence_annotate', (stage_virulence_annotate, False)),
+    ('kaptive_summary', (stage_kaptive_summary, False)),
+    ('vsearch', (stage_vsearch, False)),
+])
+
+
+def build_tasks(cfg, samples, stages=None):
+    """
+    构建任务图
+
+    只选择部分阶段时，未选择阶段的依赖视为已满足（其输出应已存在）
+    """
+    selected = [s for s in STAGES if stages is None or s in stages]
+    tasks = OrderedDict()
+    for stage in selected:
+        builder, per_sample = STAGES[stage]
+        if per_sample:
+            for sample, reads in samples.items():
+                task = builder(cfg, sample, reads)
+                tasks[task.key] = task
+        else:
+            task = builder(cfg, list(samples))
+            tasks[task.key] = task
+    for task in tasks.values():
+        task.deps = [d for d in task.deps if d in tasks]
+    return tasks
+
+
+class StateFile:
+    """追加写入的任务状态表：task, status, time, returncode, seconds"""
+
+    COLUMNS = ['task', 'status', 'time', 'returncode', 'seconds']
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.status = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                next(f, None)
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) >= 2:
+                        self.status[fields[0]] = fields[1]
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write('\t'.join(self.COLUMNS) + '\n')
+
+    def record(self, key, status, returncode='', seconds=''):
+        self.status[key] = status
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(f"{key}\t{status}\t{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\t{returncode}\t{seconds}\n")
+
+
+class PipelineRunner:
+    """在核心预算内按依赖关系运行任务"""
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, tasks, core_budget, log_dir, state, force=False):
+        self.tasks = tasks
+        self.log_dir = Path(log_dir)
+        self.state = state
+        self.force = force
+        self.scheduler = core_scheduler.JobScheduler(core_budget, self.log_dir / 'job_usage.tsv')
+        self.order = {key: i for i, key in enumerate(self._priority_order())}
+        self.done, self.failed, self.blocked = set(), set(), set()
+        self.running = set()
+
+    @property
+    def core_budget(self):
+        return self.scheduler.capacity
+
+    def _priority_order(self):
+        """样本优先：先把一个样本推进到底，再开始下一个，汇总阶段最后"""
+        samples = OrderedDict((t.sample, None) for t in self.tasks.values() if t.sample)
+        stage_index = {s: i for i, s in enumerate(STAGES)}
+        sample_index = {s: i for i, s in enumerate(samples)}
+        return sorted(self.tasks, key=lambda k: (self.tasks[k].sample is None,
+                                                 sample_index.get(self.tasks[k].sample, 0),
+                                                 stage_index[self.tasks[k].stage]))
+
+    def _finished(self):
+        return self.done | self.failed | self.blocked
+
+    def _should_skip(self, task):
+        """输出已是最新，且上一次记录不是失败/中断"""
+        if self.force:
+            return False
+        return self.state.status.get(task.key) not in ('failed', 'running', 'interrupted') and task.is_up_to_date()
+
+    def _launch(self, task, waiting):
+        for out in task.outputs:
+            out.parent.mkdir(parents=True, exist_ok=True)
+        threads = self.scheduler.try_start(task.job(self.log_dir), waiting)
+        if threads is None:
+            return False
+        self.running.add(task.key)
+        self.state.record(task.key, 'running')
+        print(f"[RUN ] {task.key}（{threads} 核，空闲 {self.scheduler.free}/{self.core_budget}）")
+        return True
+
+    def _reap(self):
+        changed = False
+        for result in self.scheduler.poll():
+            key = result.job.key
+            self.running.discard(key)
+            seconds = f"{result.wall:.1f}"
+            usage = f"{result.threads} 核，{seconds}s，CPU {result.cpu:.1f}s，RSS {result.max_rss_mb:.0f} MB"
+            if result.returncode == 0:
+                self.done.add(key)
+                self.state.record(key, 'done', result.returncode, seconds)
+                print(f"[DONE] {key}（{usage}）")
+            else:
+                self.failed.add(key)
+                self.state.record(key, 'failed', result.returncode, seconds)
+                print(f"[FAIL] {key}（退出码 {result.returncode}，日志：{result.job.log_path}）")
+            changed = True
+        return changed
+
+    def _schedule(self):
+        changed = False
+        ready = []
+        for key in sorted(self.tasks, key=self.order.get):
+            if key in self.running or key in self._finished():
+                continue
+            task = self.tasks[key]
+            if any(d in self.failed or d in self.blocked for d in task.deps):
+                self.blocked.add(key)
+                self.state.record(key, 'blocked')
+                print(f"[SKIP] {key}（上游失败）")
+                changed = True
+                continue
+            if not all(d in self.done for d in task.deps):
+                continue
+            if self._should_skip(task):
+                self.done.add(key)
+                print(f"[OK  ] {key}（输出已是最新）")
+                changed = True
+                continue
+            ready.append(task)
+
+        # 按优先级依次尝试；线程数由空闲核心和仍在排队的任务数决定，放不下的任务留到下一轮
+        for i, task in enumerate(ready):
+            if self.scheduler.free == 0:
+                break
+            if self._launch(task, waiting=len(ready) - i):
+                changed = True
+        return changed
+
+    def terminate(self):
+        for key in self.scheduler.terminate():
+            self.state.record(key, 'interrupted')
+        self.running.clear()
+
+    def run(self):
+        try:
+            while len(self._finished()) < len(self.tasks):
+                changed = self._reap()
+                changed = self._schedule() or changed
+                if not self.running and not changed:
+                    # 剩余任务的依赖不在本次任务图中且未完成，无法继续
+                    break
+                if not changed:
+                    time.sleep(self.POLL_INTERVAL)
+        except KeyboardInterrupt:
+            print("\n[WARN] 收到中断，正在终止运行中的任务...")
+            self.terminate()
+            raise
+        return not self.failed and not self.blocked
+
+
+def print_plan(tasks, runner):
+    print(f"{'任务':<40}{'线程':>8}  状态")
+    for key in sorted(tasks, key=runner.order.get):
+        task = tasks[key]
+        status = '已最新' if runner._should_skip(task) else '待运行'
+        threads = f"{task.min_threads}-{task.threads}" if task.min_threads < task.threads else str(task.threads)
+        print(f"{key:<40}{threads:>8}  {status}")
+
+
+def raise_interrupt(signum, frame):
+    """SIGTERM 处理函数：转成 KeyboardInterrupt，由 PipelineRunner 终止子进程"""
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="鲍曼菌全流程 DAG 运行器")
+    parser.add_argument('-c', '--config', default=str(Path(__file__).resolve().parents[1] / 'conf' / 'pipeline.json'),
+                        help='流程配置文件（默认：../conf/pipeline.json）')
+    parser.add_argument('--stages', nargs='*', choices=list(STAGES), help='只运行指定阶段')
+    parser.add_argument('--samples', nargs='*', help='只运行指定样本')
+    parser.add_argument('--cores', type=int, help='覆盖配置中的 core_budget')
+    parser.add_argument('--force', action='store_true', help='忽略已有输出，全部重新运行')
+    parser.add_argument('--dry-run', action='store_true', help='只打印任务计划')
+    parser.add_argument('--profile', action='store_true',
+                        help='各 Python 阶段记录分阶段耗时到 <logs>/profile.jsonl（汇总见 3-性能记录.py summary）')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.config):
+        print(f"错误：配置文件不存在：{args.config}")
+        sys.exit(1)
+    cfg = Config(args.config)
+    if args.cores:
+        cfg.core_budget = args.cores
+
+    if not cfg.fastq_dir.is_dir():
+        print(f"错误：FASTQ 目录不存在：{cfg.fastq_dir}")
+        sys.exit(1)
+    samples = discover_samples(cfg.fastq_dir)
+    if args.samples:
+        missing = [s for s in args.samples if s not in samples]
+        if missing:
+            print(f"[WARN] 以下样本在 {cfg.fastq_dir} 中不存在：{', '.join(missing)}")
+        samples = OrderedDict((s, r) for s, r in samples.items() if s in args.samples)
+    if not samples:
+        print("错误：未找到要分析的样本")
+        sys.exit(1)
+
+    tasks = build_tasks(cfg, samples, args.stages)
+    state = StateFile(cfg.dirs['logs'] / 'pipeline_state.tsv')
+    if args.profile:
+        # 子进程继承环境变量，各 Python 脚本据此写入同一个记录文件
+        os.environ[PROFILE_ENV] = str(cfg.dirs['logs'] / 'profile.jsonl')
+    runner = PipelineRunner(tasks, cfg.core_budget, cfg.dirs['logs'], state, force=args.force)
+
+    print(f"[INFO] 样本 {len(samples)} 个，任务 {len(tasks)} 个，核心预算 {cfg.core_budget}")
+    if args.dry_run:
+        print_plan(tasks, runner)
+        return
+
+    # 让 SIGTERM 与 Ctrl-C 一样先终止子进程再退出
+    signal.signal(signal.SIGTERM, raise_interrupt)
+    try:
+        ok = runner.run()
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    print("-" * 60)
+    print(f"[INFO] 完成 {len(runner.done)}，失败 {len(runner.failed)}，因上游失败跳过 {len(runner.blocked)}")
+    print(f"[INFO] 状态记录：{state.path}")
+    print(f"[INFO] 资源使用记录：{runner.scheduler.usage_file}")
+    if args.profile:
+        print(f"[INFO] 分阶段性能记录：{os.environ[PROFILE_ENV]}")
+    if not ok:
+        for key in sorted(runner.failed):
+            print(f"  失败：{key}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全局核心预算调度器：令牌桶分配 CPU 核心，按剩余预算和排队任务数动态决定每个任务的线程数
+
+各阶段脚本各自设定并行度（2-prokka.sh parallel -j 4 × --cpus 4、1-fastANI.sh --threads 16、
+2-vsearch.sh --threads 16、1-Kaptive.sh PARALLEL_JOBS=2 × --threads 0），
+同时运行时会远超机器核心数。这里统一分配：
+
+- CoreBucket：容量为核心预算的令牌桶，任务启动时取走与线程数相同的令牌，结束时归还
+- choose_threads：线程数 = 空闲核心 / 排队任务数，限制在任务的 [最少, 最多] 线程之间；
+  队列长时每个任务少拿几个核、多跑几个任务，队列快空时剩下的任务拿满
+- 命令中的 {threads} 在启动时替换为分配到的线程数
+- 每个任务结束后用 wait4 取得资源使用情况，追加写入用量表（墙钟时间、CPU 时间、峰值 RSS）
+
+既被 1-流程运行.py 调用，也可单独运行一批互不依赖的命令：
+  python3 2-核心调度.py jobs.tsv --cores 32 --usage job_usage.tsv
+jobs.tsv 每行：任务名<TAB>最少线程<TAB>最多线程<TAB>命令（bash 执行，可含 {threads}），# 开头为注释
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+THREADS_PLACEHOLDER = '{threads}'
+
+USAGE_COLUMNS = ['job', 'threads', 'returncode', 'start', 'end', 'wall_s',
+                 'user_s', 'sys_s', 'cpu_s', 'cpu_efficiency', 'max_rss_mb']
+
+
+class CoreBucket:
+    """核心令牌桶：总量固定，取走的令牌在任务结束时归还"""
+
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self.available = self.capacity
+
+    def try_acquire(self, n):
+        if n <= self.available:
+            self.available -= n
+            return True
+        return False
+
+    def release(self, n):
+        self.available = min(self.capacity, self.available + n)
+
+
+def choose_threads(min_threads, max_threads, free, waiting):
+    """
+    按空闲核心和排队任务数决定线程数
+
+    返回值可能大于 free（此时任务需继续等待）；min_threads 超过桶容量时按容量计，避免永远等不到
+    """
+    share = free // max(1, waiting)
+    return max(min_threads, min(max_threads, share))
+
+
+def render_command(command, threads):
+    """把命令中的 {threads} 替换为线程数；字符串命令用 bash -c 执行"""
+    if isinstance(command, str):
+        return ['bash', '-c', command.replace(THREADS_PLACEHOLDER, str(threads))]
+    return [str(c).replace(THREADS_PLACEHOLDER, str(threads)) for c in command]
+
+
+class Job:
+    """一个外部命令及其线程范围"""
+
+    def __init__(self, key, command, min_threads=1, max_threads=1, env=None, cwd=None, log_path=None):
+        self.key = key
+        self.command = command
+        self.min_threads = max(1, int(min_threads))
+        self.max_threads = max(self.min_threads, int(max_threads))
+        self.env = env or {}
+        self.cwd = cwd
+        self.log_path = Path(log_path) if log_path else None
+
+
+class JobResult:
+    def __init__(self, job, threads, returncode, start, end, rusage):
+        self.job = job
+        self.threads = threads
+        self.returncode = returncode
+        self.start = start
+        self.end = end
+        self.wall = end - start
+        self.user = rusage.ru_utime
+        self.sys = rusage.ru_stime
+        # Linux 上 ru_maxrss 单位为 KB，是该任务进程树中单个进程的最大常驻内存
+        self.max_rss_mb = rusage.ru_maxrss / 1024
+
+    @property
+    def cpu(self):
+        return self.user + self.sys
+
+    def row(self):
+        efficiency = self.cpu / (self.wall * self.threads) if self.wall > 0 else 0.0
+        fmt = '%Y-%m-%d %H:%M:%S'
+        return [self.job.key, self.threads, self.returncode,
+                datetime.fromtimestamp(self.start).strftime(fmt), datetime.fromtimestamp(self.end).strftime(fmt),
+                f"{self.wall:.1f}", f"{self.user:.1f}", f"{self.sys:.1f}", f"{self.cpu:.1f}",
+                f"{efficiency:.2f}", f"{self.max_rss_mb:.1f}"]
+
+
+class JobScheduler:
+    """启动任务、回收结束的任务并记录资源使用"""
+
+    def __init__(self, capacity, usage_file=None):
+        self.bucket = CoreBucket(capacity)
+        self.usage_file = Path(usage_file) if usage_file else None
+        self.running = {}   # pid -> (job, Popen, threads, start, log handle)
+        if self.usage_file is not None and not self.usage_file.exists():
+            self.usage_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.usage_file, 'w', encoding='utf-8') as f:
+                f.write('\t'.join(USAGE_COLUMNS) + '\n')
+
+    @property
+    def capacity(self):
+        return self.bucket.capacity
+
+    @property
+    def free(self):
+        return self.bucket.available
+
+    def try_start(self, job, waiting=1):
+        """
+        按当前空闲核心和排队数为 job 分配线程并启动
+
+        waiting 为包括 job 在内、此刻可以启动的任务数；核心不足时返回 None
+        """
+        min_threads = min(job.min_threads, self.capacity)
+        max_threads = min(job.max_threads, self.capacity)
+        threads = choose_threads(min_threads, max_threads, self.free, waiting)
+        if not self.bucket.try_acquire(threads):
+            return None
+        log = None
+        if job.log_path is not None:
+            job.log_path.parent.mkdir(parents=True, exist_ok=True)
+            log = open(job.log_path, 'w', encoding='utf-8')
+        try:
+            proc = subprocess.Popen(render_command(job.command, threads), cwd=job.cwd,
+                                    env=dict(os.environ, **job.env),
+                                    stdout=log if log else subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        except OSError:
+            self.bucket.release(threads)
+            if log:
+                log.close()
+            raise
+        self.running[proc.pid] = (job, proc, threads, time.time(), log)
+        return threads
+
+    def poll(self):
+        """回收已结束的任务，返回 JobResult 列表"""
+        results = []
+        for pid in list(self.running):
+            try:
+                wpid, status, rusage = os.wait4(pid, os.WNOHANG)
+            except ChildProcessError:
+                continue
+            if wpid == 0:
+                continue
+            job, proc, threads, start, log = self.running.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            proc.returncode = code   # 已由 wait4 回收，告知 Popen 不要再等待
+            if log:
+                log.close()
+            self.bucket.release(threads)
+            result = JobResult(job, threads, code, start, time.time(), rusage)
+            self._record(result)
+            results.append(result)
+        return results
+
+    def _record(self, result):
+        if self.usage_file is None:
+            return
+        with open(self.usage_file, 'a', encoding='utf-8') as f:
+            f.write('\t'.join(map(str, result.row())) + '\n')
+
+    def terminate(self, timeout=30):
+        """终止所有运行中的任务，返回被终止的任务名"""
+        for job, proc, threads, start, log in self.running.values():
+            proc.terminate()
+        keys = []
+        for pid, (job, proc, threads, start, log) in list(self.running.items()):
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+            if log:
+                log.close()
+            self.bucket.release(threads)
+            keys.append(job.key)
+        self.running.clear()
+        return keys
+
+
+def read_jobs(path, log_dir=None):
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.split('\t', 3)
+            if len(fields) != 4:
+                raise ValueError(f"{path} 第 {line_no} 行应为 4 列：任务名 最少线程 最多线程 命令")
+            key, lo, hi, command = fields
+            log_path = Path(log_dir) / f"{key}.log" if log_dir else None
+            jobs.append(Job(key, command, int(lo), int(hi), log_path=log_path))
+    return jobs
+
+
+def run_jobs(jobs, cores, usage_file=None, poll_interval=0.5):
+    """按顺序尽量多地启动任务，直到全部结束；返回失败的任务名"""
+    scheduler = JobScheduler(cores, usage_file)
+    queue = list(jobs)
+    failed = []
+    try:
+        while queue or scheduler.running:
+            for result in scheduler.poll():
+                status = 'DONE' if result.returncode == 0 else 'FAIL'
+                print(f"[{status}] {result.job.key}（{result.threads} 线程，{result.wall:.1f}s，"
+                      f"CPU {result.cpu:.1f}s，RSS {result.max_rss_mb:.0f} MB）")
+                if result.returncode != 0:
+                    failed.append(result.job.key)
+            while queue:
+                threads = scheduler.try_start(queue[0], waiting=len(queue))
+                if threads is None:
+                    break
+                print(f"[RUN ] {queue[0].key}（{threads} 线程，空闲 {scheduler.free}/{scheduler.capacity}）")
+                queue.pop(0)
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("\n[WARN] 收到中断，正在终止运行中的任务...")
+        scheduler.terminate()
+        raise
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在统一核心预算内并行运行一批外部命令")
+    parser.add_argument('jobs', help='任务表：任务名<TAB>最少线程<TAB>最多线程<TAB>命令（可含 {threads}）')
+    parser.add_argument('--cores', type=int, default=os.cpu_count() or 1, help='核心预算（默认：CPU 核数）')
+    parser.add_argument('--usage', help='资源使用记录表（默认：<任务表>.usage.tsv）')
+    parser.add_argument('--log-dir', help='每个任务的输出日志目录（默认不保存）')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.jobs):
+        print(f"错误：任务表不存在：{args.jobs}")
+        sys.exit(1)
+    try:
+        jobs = read_jobs(args.jobs, args.log_dir)
+    except ValueError as e:
+        print(f"错误：{e}")
+        sys.exit(1)
+
+    usage = args.usage or f"{os.path.splitext(args.jobs)[0]}.usage.tsv"
+    print(f"[INFO] 任务 {len(jobs)} 个，核心预算 {args.cores}")
+    try:
+        failed = run_jobs(jobs, args.cores, usage)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    print(f"[INFO] 资源使用记录：{usage}")
+    if failed:
+        print(f"[ERROR] {len(failed)} 个任务失败：{', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
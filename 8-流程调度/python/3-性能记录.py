@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+各 Python 阶段的分阶段性能记录（可选开启）与汇总
+
+开启方式（二选一，默认不记录，几乎没有额外开销）：
+  - 环境变量 AB_PROFILE=<记录文件.jsonl>（子进程、ProcessPoolExecutor 的 worker 会继承）
+  - 支持的脚本加 --profile <记录文件.jsonl>
+  - 1-流程运行.py --profile 会为所有任务设置 AB_PROFILE
+
+每个阶段（读取 parse、过滤 filter、写出 write 等）结束时向记录文件追加一行 JSON：
+  {"time", "script", "pid", "phase", "calls", "wall_s", "cpu_s", "peak_rss_mb", "items", ...上下文}
+- cpu_s 包括本进程和已回收子进程（如进程池 worker）的 user + sys 时间
+- peak_rss_mb 为阶段结束时本进程（及已回收子进程）的内存最高水位，随进程运行只增不减
+- 在循环中反复调用的阶段可用 accumulate=True 累加，脚本结束时合并为一行（calls 为调用次数）
+
+在脚本中使用：
+  with profiling.Profiler('4-分型.py') as prof:
+      with prof.phase('parse') as ph:
+          ...
+          ph.items = n
+
+汇总整批运行的记录：
+  python3 3-性能记录.py summary profile.jsonl [更多.jsonl ...] [-o summary.tsv]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+from datetime import datetime
+from contextlib import contextmanager
+from collections import OrderedDict
+
+PROFILE_ENV = 'AB_PROFILE'
+
+
+def enable(log_file):
+    """开启记录：写入环境变量，之后启动的子进程也会记录到同一文件"""
+    if log_file:
+        os.environ[PROFILE_ENV] = os.path.abspath(log_file)
+
+
+def _usage():
+    """(CPU 秒, 峰值 RSS MB)；Linux 上 ru_maxrss 单位为 KB"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    return cpu, max(own.ru_maxrss, children.ru_maxrss) / 1024
+
+
+class Phase:
+    """阶段内可设置的计数：items 为处理的条目数（行、序列、样本等）"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = None
+
+
+class Profiler:
+    """按阶段记录墙钟时间、CPU 时间、峰值 RSS 和条目数，写入 JSON-lines 文件"""
+
+    def __init__(self, script, log_file=None, **context):
+        self.script = script
+        self._log_file = log_file
+        self.context = context
+        self._totals = OrderedDict()
+        self._start = None
+
+    @property
+    def log_file(self):
+        # 每次读取环境变量：模块导入后再由 --profile 开启也能生效
+        return self._log_file or os.environ.get(PROFILE_ENV) or None
+
+    @property
+    def enabled(self):
+        return self.log_file is not None
+
+    @contextmanager
+    def phase(self, name, accumulate=False):
+        ph = Phase(name)
+        if not self.enabled:
+            yield ph
+            return
+        wall0 = time.perf_counter()
+        cpu0, _ = _usage()
+        try:
+            yield ph
+        finally:
+            wall = time.perf_counter() - wall0
+            cpu1, rss = _usage()
+            if accumulate:
+                total = self._totals.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                       'peak_rss_mb': 0.0, 'items': None})
+                total['calls'] += 1
+                total['wall_s'] += wall
+                total['cpu_s'] += cpu1 - cpu0
+                total['peak_rss_mb'] = max(total['peak_rss_mb'], rss)
+                if ph.items is not None:
+                    total['items'] = (total['items'] or 0) + ph.items
+            else:
+                self.write(name, 1, wall, cpu1 - cpu0, rss, ph.items)
+
+    def write(self, phase, calls, wall, cpu, rss, items=None):
+        record = OrderedDict([
+            ('time', datetime.now().isoformat(timespec='seconds')),
+            ('script', self.script),
+            ('pid', os.getpid()),
+            ('phase', phase),
+            ('calls', calls),
+            ('wall_s', round(wall, 6)),
+            ('cpu_s', round(cpu, 6)),
+            ('peak_rss_mb', round(rss, 1)),
+            ('items', items),
+        ])
+        record.update(self.context)
+        # 每条记录一次 O_APPEND 写入，多个进程同时追加同一文件时不会互相截断
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        fd = os.open(self.log_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def flush(self):
+        """写出累加的阶段"""
+        if not self.enabled:
+            self._totals.clear()
+            return
+        for name, total in self._totals.items():
+            self.write(name, total['calls'], total['wall_s'], total['cpu_s'],
+                       total['peak_rss_mb'], total['items'])
+        self._totals.clear()
+
+    def __enter__(self):
+        self._start = (time.perf_counter(), _usage()[0])
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        if self.enabled and self._start is not None:
+            wall0, cpu0 = self._start
+            cpu1, rss = _usage()
+            # 整个脚本的总计记为 total 阶段
+            self.write('total', 1, time.perf_counter() - wall0, cpu1 - cpu0, rss)
+        return False
+
+
+def read_records(paths):
+    records = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"[WARN] {path} 第 {line_no} 行不是有效的 JSON，已跳过")
+    return records
+
+
+def summarize(records):
+    """
+    按 (脚本, 阶段) 汇总，返回按总墙钟时间降序排列的 DataFrame
+
+    wall_share 为该阶段占全部非 total 阶段墙钟时间之和的比例，用来找出真正的热点
+    """
+    import pandas as pd
+
+    columns = ['script', 'phase', 'records', 'calls', 'wall_total_s', 'wall_mean_s', 'wall_max_s',
+               'cpu_total_s', 'cpu_per_wall', 'peak_rss_max_mb', 'items', 'items_per_s', 'wall_share']
+    if not records:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame.from_records(records)
+    df['items'] = pd.to_numeric(df.get('items'), errors='coerce')
+    grouped = df.groupby(['script', 'phase'], sort=False)
+    summary = pd.DataFrame({
+        'records': grouped.size(),
+        'calls': grouped['calls'].sum(),
+        'wall_total_s': grouped['wall_s'].sum(),
+        'wall_mean_s': grouped['wall_s'].mean(),
+        'wall_max_s': grouped['wall_s'].max(),
+        'cpu_total_s': grouped['cpu_s'].sum(),
+        'peak_rss_max_mb': grouped['peak_rss_mb'].max(),
+        'items': grouped['items'].sum(min_count=1),
+    }).reset_index()
+    summary['cpu_per_wall'] = summary['cpu_total_s'] / summary['wall_total_s'].where(summary['wall_total_s'] > 0)
+    summary['items_per_s'] = summary['items'] / summary['wall_total_s'].where(summary['wall_total_s'] > 0)
+    phases_wall = summary.loc[summary['phase'] != 'total', 'wall_total_s'].sum()
+    summary['wall_share'] = (summary['wall_total_s'] / phases_wall).where(summary['phase'] != 'total') \
+        if phases_wall > 0 else float('nan')
+    summary = summary.sort_values('wall_total_s', ascending=False, kind='stable')
+    return summary[columns].round(4)
+
+
+def print_summary(summary, top=20):
+    phases = summary[summary['phase'] != 'total']
+    print(f"{'脚本':<28}{'阶段':<18}{'次数':>8}{'墙钟(s)':>12}{'CPU(s)':>12}{'CPU/墙钟':>10}"
+          f"{'峰值RSS(MB)':>14}{'条目/s':>14}{'占比':>8}")
+    for row in phases.head(top).itertuples(index=False):
+        rate = '' if row.items_per_s != row.items_per_s else f"{row.items_per_s:.1f}"
+        share = '' if row.wall_share != row.wall_share else f"{row.wall_share:.1%}"
+        print(f"{row.script:<28}{row.phase:<18}{int(row.calls):>8}{row.wall_total_s:>12.2f}{row.cpu_total_s:>12.2f}"
+              f"{row.cpu_per_wall:>10.2f}{row.peak_rss_max_mb:>14.1f}{rate:>14}{share:>8}")
+    totals = summary[summary['phase'] == 'total']
+    if not totals.empty:
+        print("\n各脚本总计：")
+        for row in totals.itertuples(index=False):
+            print(f"  {row.script}: 运行 {int(row.records)} 次，墙钟 {row.wall_total_s:.2f}s，"
+                  f"CPU {row.cpu_total_s:.2f}s，峰值 RSS {row.peak_rss_max_mb:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总各 Python 阶段的性能记录（JSON-lines）")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_sum = sub.add_parser('summary', help='按 脚本 × 阶段 汇总，找出耗时最多的阶段')
+    p_sum.add_argument('logs', nargs='+', help='记录文件（AB_PROFILE / --profile 写出的 .jsonl）')
+    p_sum.add_argument('-o', '--output', help='汇总表输出路径（TSV）')
+    p_sum.add_argument('--top', type=int, default=20, help='终端显示前 N 个阶段（默认 20）')
+    args = parser.parse_args()
+
+    missing = [p for p in args.logs if not os.path.isfile(p)]
+    if missing:
+        print(f"错误：记录文件不存在：{', '.join(missing)}")
+        sys.exit(1)
+
+    records = read_records(args.logs)
+    print(f"[INFO] 共读取 {len(records)} 条记录")
+    summary = summarize(records)
+    print_summary(summary, args.top)
+    if args.output:
+        tmp = f"{args.output}.tmp"
+        summary.to_csv(tmp, sep='\t', index=False)
+        os.replace(tmp, args.output)
+        print(f"[INFO] 汇总表：{args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准：按 10 / 1,000 / 10,000 个基因组的规模生成合成输入，逐个计时各 Python 阶段，
+结果追加到结果表中，便于跟踪不同提交之间的性能变化
+
+合成数据（<工作目录>/<规模>/fixture/）：
+  mlst_b6/      {样本}.oxford_vs_query.b6 / .pasteur_vs_query.b6：从真实 profiles 表随机抽取 ST，
+                按等位基因 FASTA 的长度生成最佳命中和若干近似命中，约 5% 的位点为新等位基因（相似度 <100%）
+  diamond/      {样本}_vs_VFDB.tsv：DIAMOND outfmt 6（12 列）
+  prokka/       {样本}/{样本}.ffn 与 kaptive/{K_locus,OCL}_results/{样本}_kaptive_results.fna（按样本的阶段用）
+  remain/       {样本}.Remain.ffn（2-merge-fasta.py 的输入）
+  vsearch/      clustering_results.uc：与 remain 中的基因一致的聚类
+  fastqc/       {样本}_{1,2}_fastqc.zip 及解压后的 *_fastqc.html
+
+基因来自一个共享的泛基因组序列池（约 80% 为核心基因），所以 .uc 中的聚类和样本分布接近真实数据。
+数据量大致为 规模 × 每个基因组基因数 × 序列长度，10,000 个基因组、默认参数时约 12 GB，
+可用 --genes / --seq-len 缩小。
+
+用法:
+  python3 4-性能基准.py run --scale 10 1000 -w /mnt/d/bench          # 生成（如不存在）并计时
+  python3 4-性能基准.py run --scale 10 --stages mlst_typing uc_parse
+  python3 4-性能基准.py generate --scale 10000 -w /mnt/d/bench       # 只生成数据
+  python3 4-性能基准.py compare                                      # 各阶段历次结果对比
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import zipfile
+import platform
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from collections import OrderedDict
+
+from 模块加载 import load_module  # 同目录的共用模块加载函数
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parents[1]
+
+MLST_DIR = REPO_DIR / '4-注释' / '2-MLST'
+PROFILES_DIR = MLST_DIR / 'download'
+DEFAULT_RESULTS = SCRIPT_DIR.parent / 'output' / 'benchmark_results.tsv'
+
+SCALES = (10, 1000, 10000)
+GENES_PER_GENOME = 3700      # 鲍曼菌约 3,700 个 CDS
+SEQ_LEN = 300
+DIAMOND_HITS = 500           # 每个基因组的 DIAMOND 命中行数
+PER_SAMPLE_CAP = 100         # 按样本运行的阶段最多计时多少个样本
+REGRESSION_THRESHOLD = 0.20  # 比上一次慢 20% 以上视为性能回退
+
+RESULT_COLUMNS = ['time', 'commit', 'host', 'scale', 'stage', 'returncode', 'samples',
+                  'wall_s', 'cpu_s', 'max_rss_mb', 'samples_per_s']
+
+core_scheduler = load_module(SCRIPT_DIR / '2-核心调度.py')
+profiling = load_module(SCRIPT_DIR / '3-性能记录.py')
+
+
+def sample_names(scale):
+    return [f"BENCH{i:05d}" for i in range(1, scale + 1)]
+
+
+# ---------------------------------------------------------------------------
+# 合成数据
+# ---------------------------------------------------------------------------
+
+def read_fasta_lengths(fasta_file):
+    """{序列名: 长度}"""
+    lengths, name, n = {}, None, 0
+    with open(fasta_file, 'r') as f:
+        for line in f:
+            if line.startswith('>'):
+                if name is not None:
+                    lengths[name] = n
+                name, n = line[1:].split()[0], 0
+            else:
+                n += len(line.strip())
+    if name is not None:
+        lengths[name] = n
+    return lengths
+
+
+def read_profile_rows(profiles_file):
+    """读取 ST 配置表，返回 (位点列表, [[等位基因, ...], ...])"""
+    with open(profiles_file, 'r') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader)
+        loci = [c for c in header[1:] if c not in ('clonal_complex', 'species')]
+        rows = [row[1:1 + len(loci)] for row in reader if len(row) > len(loci)]
+    return loci, rows
+
+
+class FixtureGenerator:
+    """按固定随机种子生成某个规模的全部合成输入"""
+
+    def __init__(self, out_dir, scale, genes=GENES_PER_GENOME, seq_len=SEQ_LEN,
+                 diamond_hits=DIAMOND_HITS, per_sample_cap=PER_SAMPLE_CAP, seed=1):
+        self.out_dir = Path(out_dir)
+        self.scale = scale
+        self.genes = genes
+        self.seq_len = seq_len
+        self.diamond_hits = diamond_hits
+        self.per_sample_cap = per_sample_cap
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.samples = sample_names(scale)
+
+    @property
+    def params(self):
+        return {'scale': self.scale, 'genes': self.genes, 'seq_len': self.seq_len,
+                'diamond_hits': self.diamond_hits, 'per_sample_cap': self.per_sample_cap, 'seed': self.seed}
+
+    def is_complete(self):
+        marker = self.out_dir / 'fixture.json'
+        if not marker.exists():
+            return False
+        with open(marker, 'r') as f:
+            return json.load(f) == self.params
+
+    def generate(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        start = time.time()
+        self._pangenome()
+        for name, step in (('MLST BLAST 结果', self.write_mlst_b6),
+                           ('DIAMOND 结果', self.write_diamond),
+                           ('Prokka / Kaptive', self.write_prokka),
+                           ('Remain.ffn 与 vsearch .uc', self.write_remain_and_uc),
+                           ('FastQC', self.write_fastqc)):
+            t0 = time.time()
+            step()
+            print(f"[INFO]   {name}：{time.time() - t0:.1f}s")
+        with open(self.out_dir / 'fixture.json', 'w') as f:
+            json.dump(self.params, f)
+        print(f"[INFO] 规模 {self.scale} 的合成数据已生成：{self.out_dir}（{time.time() - start:.1f}s）")
+
+    def _pangenome(self):
+        """泛基因组：核心基因所有样本都有，其余从附属基因池中随机抽取"""
+        n_core = int(self.genes * 0.8)
+        n_accessory = self.genes - n_core
+        pool_size = n_core + max(n_accessory * 4, 1)
+        bases = 'ACGT'
+        self.pool = [''.join(self.rng.choice(bases) for _ in range(self.seq_len)) for _ in range(pool_size)]
+        self.products = [f"hypothetical protein" if i % 3 else f"putative gene product {i}"
+                         for i in range(pool_size)]
+        self.n_core = n_core
+        self.accessory = list(range(n_core, pool_size))
+
+    def sample_genes(self, index):
+        """样本的基因家族编号列表（每个样本独立的随机数，结果与生成顺序无关）"""
+        rng = random.Random(self.seed * 1000003 + index)
+        return list(range(self.n_core)) + rng.sample(self.accessory, self.genes - self.n_core)
+
+    @staticmethod
+    def locus_prefix(index):
+        """Prokka 风格的 8 字母 locus_tag 前缀"""
+        letters = []
+        for _ in range(8):
+            index, r = divmod(index, 26)
+            letters.append(chr(65 + r))
+        return ''.join(letters)
+
+    def write_mlst_b6(self):
+        out = self.out_dir / 'mlst_b6'
+        out.mkdir(exist_ok=True)
+        schemes = []
+        for scheme, sub in (('oxford', 'Oxford'), ('pasteur', 'Pasteur')):
+            loci, rows = read_profile_rows(PROFILES_DIR / sub / f"profiles_{scheme}.csv")
+            lengths = read_fasta_lengths(PROFILES_DIR / sub / f"{scheme}_alleles.fasta")
+            alleles = {locus: [a.rsplit('_', 1)[1] for a in lengths if a.rsplit('_', 1)[0] == locus]
+                       for locus in loci}
+            schemes.append((scheme, loci, rows, lengths, alleles))
+
+        for sample in self.samples:
+            for scheme, loci, rows, lengths, alleles in schemes:
+                profile = self.rng.choice(rows)
+                lines = []
+                for c, (locus, allele) in enumerate(zip(loci, profile), 1):
+                    name = f"{locus}_{allele}"
+                    if name not in lengths:
+                        continue
+                    novel = self.rng.random() < 0.05
+                    lines.append(self.b6_line(f"contig{c}", name, lengths[name],
+                                              99.5 if novel else 100.0, 1e-200, 2.0))
+                    for other in self.rng.sample(alleles[locus], min(3, len(alleles[locus]))):
+                        other_name = f"{locus}_{other}"
+                        if other_name != name:
+                            lines.append(self.b6_line(f"contig{c}", other_name, lengths[other_name],
+                                                      round(self.rng.uniform(88, 99.4), 2), 1e-150, 1.6))
+                with open(out / f"{sample}.{scheme}_vs_query.b6", 'w') as f:
+                    f.write(''.join(lines))
+
+    @staticmethod
+    def b6_line(contig, subject, length, identity, evalue, score_per_base):
+        # 字段顺序与 4-分型.py 的 parse_blast_line 一致（第 11 列 E 值、第 12 列分数）
+        return (f"{contig}\t{subject}\t{identity}\t{length}\t{length}\t{length}\t100\t{99 + length}"
+                f"\t1\t{length}\t{evalue}\t{int(length * score_per_base)}\n")
+
+    def write_diamond(self):
+        out = self.out_dir / 'diamond'
+        out.mkdir(exist_ok=True)
+        n_vf = 4000
+        for index, sample in enumerate(self.samples):
+            rng = random.Random(self.seed * 7919 + index)
+            prefix = self.locus_prefix(index)
+            lines = []
+            for _ in range(self.diamond_hits):
+                q = rng.randrange(self.genes)
+                qlen = rng.randrange(80, 700)
+                length = rng.randrange(30, qlen + 1)
+                pident = round(min(100.0, rng.betavariate(5, 1.5) * 100), 1)
+                vf = rng.randrange(n_vf)
+                lines.append(f"{prefix}_{q + 1:05d}\tVFG{vf:06d}\t{pident}\t{length}\t{qlen}\t{qlen + rng.randrange(-20, 20)}"
+                             f"\t1\t{length}\t1\t{length}\t{length * 1.8:.1f}\t{rng.choice(('1e-50', '1e-20', '1e-8'))}\n")
+            with open(out / f"{sample}_vs_VFDB.tsv", 'w') as f:
+                f.write(''.join(lines))
+
+    def write_ffn(self, path, index, families, label=None):
+        prefix = self.locus_prefix(index)
+        with open(path, 'w') as f:
+            for i, fam in enumerate(families, 1):
+                f.write(f">{prefix}_{i:05d} {self.products[fam]}\n{self.pool[fam]}\n")
+
+    def write_prokka(self):
+        """按样本运行的阶段只需要前 per_sample_cap 个样本"""
+        for index, sample in enumerate(self.samples[:self.per_sample_cap]):
+            families = self.sample_genes(index)
+            sample_dir = self.out_dir / 'prokka' / sample
+            sample_dir.mkdir(parents=True, exist_ok=True)
+            self.write_ffn(sample_dir / f"{sample}.ffn", index, families)
+            prefix = self.locus_prefix(index)
+            # K 位点约 25 个基因、OCL 约 10 个基因，取 ffn 中连续的一段
+            for sub, start, n in (('K_locus_results', len(families) // 40, 25),
+                                  ('OCL_results', len(families) // 2, 10)):
+                out = self.out_dir / 'kaptive' / sub
+                out.mkdir(parents=True, exist_ok=True)
+                with open(out / f"{sample}_kaptive_results.fna", 'w') as f:
+                    for i in range(start + 1, min(start + n, len(families)) + 1):
+                        f.write(f">{prefix}_{i:05d}:1-{self.seq_len}\n{self.pool[families[i - 1]]}\n")
+
+    def write_remain_and_uc(self):
+        remain = self.out_dir / 'remain'
+        remain.mkdir(exist_ok=True)
+        uc_dir = self.out_dir / 'vsearch'
+        uc_dir.mkdir(exist_ok=True)
+        centroid = {}     # 基因家族 -> (聚类编号, 中心序列标签)
+        sizes = []
+        with open(uc_dir / 'clustering_results.uc', 'w') as uc:
+            for index, sample in enumerate(self.samples):
+                families = self.sample_genes(index)
+                self.write_ffn(remain / f"{sample}.Remain.ffn", index, families)
+                prefix = self.locus_prefix(index)
+                rng = random.Random(self.seed * 104729 + index)
+                lines = []
+                for i, fam in enumerate(families, 1):
+                    label = f"SAMPLE_{sample}|{prefix}_{i:05d} {self.products[fam]}"
+                    if fam not in centroid:
+                        centroid[fam] = (len(sizes), label)
+                        sizes.append(1)
+                        lines.append(f"S\t{centroid[fam][0]}\t{self.seq_len}\t*\t*\t*\t*\t*\t{label}\t*\n")
+                    else:
+                        cluster, target = centroid[fam]
+                        sizes[cluster] += 1
+                        identity = 100.0 if rng.random() < 0.7 else round(rng.uniform(99.5, 99.9), 1)
+                        lines.append(f"H\t{cluster}\t{self.seq_len}\t{identity}\t+\t0\t0\t{self.seq_len}M"
+                                     f"\t{label}\t{target}\n")
+                uc.write(''.join(lines))
+            for fam, (cluster, label) in centroid.items():
+                uc.write(f"C\t{cluster}\t{sizes[cluster]}\t*\t*\t*\t*\t*\t{label}\t*\n")
+
+    def write_fastqc(self):
+        out = self.out_dir / 'fastqc'
+        out.mkdir(exist_ok=True)
+        modules = ['Basic Statistics', 'Per base sequence quality', 'Per sequence quality scores',
+                   'Per base sequence content', 'Per sequence GC content', 'Per base N content',
+                   'Sequence Length Distribution', 'Sequence Duplication Levels',
+                   'Overrepresented sequences', 'Adapter Content']
+        for index, sample in enumerate(self.samples):
+            rng = random.Random(self.seed * 15485863 + index)
+            for read in ('1', '2'):
+                name = f"{sample}_{read}_fastqc"
+                total = rng.randrange(1_500_000, 6_000_000)
+                gc = rng.randrange(38, 41)
+                status = [rng.choice(('pass', 'pass', 'pass', 'warn', 'fail')) for _ in modules]
+                data = [f"##FastQC\t0.12.1\n>>Basic Statistics\tpass\n#Measure\tValue\n"
+                        f"Filename\t{sample}_{read}.fastq.gz\nFile type\tConventional base calls\n"
+                        f"Encoding\tSanger / Illumina 1.9\nTotal Sequences\t{total}\n"
+                        f"Sequences flagged as poor quality\t0\nSequence length\t35-151\n%GC\t{gc}\n>>END_MODULE\n"]
+                data += [f">>{m}\t{s}\n>>END_MODULE\n" for m, s in zip(modules[1:], status[1:])]
+                icons = {'pass': 'PASS', 'warn': 'WARNING', 'fail': 'FAIL'}
+                html = ("<html><head><title>" + name + "</title></head><body><div class=\"summary\"><ul>"
+                        + ''.join(f"<li><img alt=\"[{icons[s]}]\"/>{icons[s]} {m}</li>" for m, s in zip(modules, status))
+                        + "</ul></div><table><thead><tr><th>Measure</th><th>Value</th></tr></thead><tbody>"
+                        + f"<tr><td>Filename</td><td>{sample}_{read}.fastq.gz</td></tr>"
+                        + f"<tr><td>Total Sequences</td><td>{total}</td></tr>"
+                        + "<tr><td>Sequence length</td><td>35-151</td></tr>"
+                        + f"<tr><td>%GC</td><td>{gc}</td></tr></tbody></table></body></html>")
+                with zipfile.ZipFile(out / f"{name}.zip", 'w', zipfile.ZIP_DEFLATED) as zf:
+                    zf.writestr(f"{name}/fastqc_data.txt", ''.join(data))
+                    zf.writestr(f"{name}/fastqc_report.html", html)
+                with open(out / f"{name}.html", 'w', encoding='utf-8') as f:
+                    f.write(html)
+
+
+# ---------------------------------------------------------------------------
+# 阶段与计时
+# ---------------------------------------------------------------------------
+
+def script(relative):
+    return str(REPO_DIR / relative)
+
+
+def stage_commands(fixture, work, samples, jobs, per_sample_cap):
+    """
+    各阶段的命令：阶段名 -> (命令列表, 样本数, 额外环境变量)
+
+    命令列表中有多条命令时依次运行，计时合计（用于按样本运行的脚本）
+    """
+    py = sys.executable
+    mlst_out = work / 'mlst'
+    grapetree = work / 'grapetree'
+    capped = samples[:per_sample_cap]
+    residual_env = {'PROKKA_DIR': str(fixture / 'prokka'),
+                    'K_DIR': str(fixture / 'kaptive' / 'K_locus_results'),
+                    'OCL_DIR': str(fixture / 'kaptive' / 'OCL_results'),
+                    'OUTPUT_DIR': str(work / 'residual')}
+    html = sorted(str(p) for p in (fixture / 'fastqc').glob('*_fastqc.html'))
+    return OrderedDict([
+        ('fastqc_parse', ([[py, script('0-质控/python/1-FASTQ质控信息提取.py'), str(work / 'fastqc.csv'), *html]],
+                          len(samples), {})),
+        ('mlst_typing', ([[py, script('4-注释/2-MLST/python/4-分型.py'), '-i', str(fixture / 'mlst_b6'),
+                           '-p', str(PROFILES_DIR), '-o', str(mlst_out), '--nearest', '3']], len(samples), {})),
+        ('mlst_profiles', ([[py, script('4-注释/2-MLST/python/5-MLST→Grapetree.py'),
+                             str(mlst_out / 'MLST_detailed_alleles.csv'), str(grapetree), '--npz']],
+                           len(samples), {})),
+        ('mlst_distance', ([[py, script('4-注释/2-MLST/python/5-等位基因距离.py'), str(grapetree / 'MLST_ST_Ox.txt'),
+                             '-o', str(grapetree / 'MLST_ST_Ox.dist'), '--mst', str(grapetree / 'MLST_ST_Ox.mst.nwk'),
+                             '-j', str(jobs)]], len(samples), {})),
+        ('dist_to_csv', ([[py, script('4-注释/2-MLST/python/5-dis→csv.py'), str(grapetree / 'MLST_ST_Ox.dist'),
+                           '--npy']], len(samples), {})),
+        ('virulence_filter', ([[py, script('4-注释/4-Virulence/python/3-筛选diamond.py'), str(fixture / 'diamond'),
+                                str(work / 'virulence'), '-j', str(jobs)]], len(samples), {})),
+        ('residual', ([[py, script('4-注释/7-剩余毒力因子/python/1-获取剩余毒力ffn.py'), s] for s in capped],
+                      len(capped), residual_env)),
+        ('merge_fasta', ([[py, script('4-注释/7-剩余毒力因子/python/2-merge-fasta.py'), str(fixture / 'remain'),
+                           str(work / 'vsearch' / 'all_genes_with_sample_info.fasta')]], len(samples), {})),
+        ('uc_parse', ([[py, script('4-注释/7-剩余毒力因子/python/3-处理聚类结果.py'),
+                        str(fixture / 'vsearch' / 'clustering_results.uc'), str(work / 'vsearch')]],
+                      len(samples), {})),
+    ])
+
+
+STAGES = ('fastqc_parse', 'mlst_typing', 'mlst_profiles', 'mlst_distance', 'dist_to_csv',
+          'virulence_filter', 'residual', 'merge_fasta', 'uc_parse')
+
+
+def time_commands(key, commands, env, log_path):
+    """依次运行命令，返回 (退出码, 墙钟秒, CPU 秒, 峰值 RSS MB)；任一命令失败即停止"""
+    scheduler = core_scheduler.JobScheduler(1)
+    wall = cpu = rss = 0.0
+    code = 0
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    open(log_path, 'w').close()
+    for i, command in enumerate(commands):
+        job = core_scheduler.Job(f"{key}:{i}", command, env=env, log_path=f"{log_path}.part")
+        scheduler.try_start(job)
+        results = []
+        while not results:
+            time.sleep(0.05)
+            results = scheduler.poll()
+        result = results[0]
+        with open(f"{log_path}.part", 'r', errors='replace') as src, open(log_path, 'a') as dst:
+            dst.write(src.read())
+        os.remove(f"{log_path}.part")
+        wall += result.end - result.start
+        cpu += result.cpu
+        rss = max(rss, result.max_rss_mb)
+        code = result.returncode
+        if code != 0:
+            break
+    return code, wall, cpu, rss
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', '-C', str(REPO_DIR), 'rev-parse', '--short', 'HEAD'],
+                             capture_output=True, text=True, timeout=30)
+        return out.stdout.strip() if out.returncode == 0 else ''
+    except (OSError, subprocess.TimeoutExpired):
+        return ''
+
+
+def read_results(results_file):
+    if not Path(results_file).exists():
+        return []
+    with open(results_file, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f, delimiter='\t'))
+
+
+def append_results(results_file, rows):
+    results_file = Path(results_file)
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    new = not results_file.exists()
+    with open(results_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, delimiter='\t')
+        if new:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def previous_wall(history, scale, stage):
+    """同一规模、同一阶段上一次成功运行的墙钟时间"""
+    for row in reversed(history):
+        if row['scale'] == str(scale) and row['stage'] == stage and row['returncode'] == '0':
+            return float(row['wall_s'])
+    return None
+
+
+def run_benchmark(args):
+    work_root = Path(args.work_dir)
+    history = read_results(args.results)
+    commit, host = git_commit(), platform.node()
+    regressions = []
+
+    for scale in args.scale:
+        base = work_root / str(scale)
+        gen = FixtureGenerator(base / 'fixture', scale, args.genes, args.seq_len, args.diamond_hits,
+                               args.per_sample_cap, args.seed)
+        if not gen.is_complete():
+            print(f"[INFO] 生成规模 {scale} 的合成数据...")
+            gen.generate()
+        work = base / 'work'
+        work.mkdir(parents=True, exist_ok=True)
+        commands = stage_commands(base / 'fixture', work, gen.samples, args.jobs, args.per_sample_cap)
+
+        print(f"\n[INFO] 规模 {scale}：{len(commands) if not args.stages else len(args.stages)} 个阶段")
+        rows = []
+        for stage, (cmds, n_samples, env) in commands.items():
+            if args.stages and stage not in args.stages:
+                continue
+            # 各阶段的分阶段记录写到 work/profile.jsonl，可用 3-性能记录.py summary 查看热点
+            env = dict(env, **{profiling.PROFILE_ENV: str(work / 'profile.jsonl')})
+            code, wall, cpu, rss = time_commands(f"{scale}:{stage}", cmds, env, work / 'logs' / f"{stage}.log")
+            row = {'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'commit': commit, 'host': host,
+                   'scale': scale, 'stage': stage, 'returncode': code, 'samples': n_samples,
+                   'wall_s': f"{wall:.3f}", 'cpu_s': f"{cpu:.3f}", 'max_rss_mb': f"{rss:.1f}",
+                   'samples_per_s': f"{n_samples / wall:.2f}" if wall > 0 else ''}
+            rows.append(row)
+
+            prev = previous_wall(history, scale, stage)
+            change = ''
+            if code != 0:
+                change = f"失败（退出码 {code}，日志：{work / 'logs' / f'{stage}.log'}）"
+            elif prev:
+                ratio = wall / prev - 1
+                change = f"{ratio:+.1%} vs 上次"
+                if ratio > args.threshold:
+                    regressions.append(f"{scale}:{stage} {prev:.2f}s → {wall:.2f}s（{ratio:+.1%}）")
+                    change += "  ⚠ 回退"
+            print(f"  {stage:<18}{wall:>10.2f}s  CPU {cpu:>9.2f}s  RSS {rss:>8.1f} MB  {change}")
+        append_results(args.results, rows)
+        history.extend({k: str(v) for k, v in r.items()} for r in rows)
+
+    print(f"\n[INFO] 结果已追加到 {args.results}")
+    if regressions:
+        print(f"[WARN] {len(regressions)} 个阶段比上次慢 {args.threshold:.0%} 以上：")
+        for r in regressions:
+            print(f"  {r}")
+        return 2
+    return 0
+
+
+def compare(args):
+    history = read_results(args.results)
+    if not history:
+        print(f"错误：结果表为空或不存在：{args.results}")
+        sys.exit(1)
+    keys = OrderedDict()
+    for row in history:
+        if row['returncode'] == '0':
+            keys.setdefault((row['scale'], row['stage']), []).append(row)
+    print(f"{'规模':>8}  {'阶段':<18}{'次数':>6}{'最好(s)':>10}{'上次(s)':>10}{'本次(s)':>10}{'vs上次':>10}  本次提交")
+    for (scale, stage), rows in sorted(keys.items(), key=lambda kv: (int(kv[0][0]), STAGES.index(kv[0][1])
+                                                                       if kv[0][1] in STAGES else 99)):
+        walls = [float(r['wall_s']) for r in rows]
+        last = walls[-1]
+        prev = walls[-2] if len(walls) > 1 else None
+        change = f"{last / prev - 1:+.1%}" if prev else ''
+        prev_text = f"{prev:.2f}" if prev else '-'
+        print(f"{scale:>8}  {stage:<18}{len(rows):>6}{min(walls):>10.2f}{prev_text:>10}"
+              f"{last:>10.2f}{change:>10}  {rows[-1]['commit']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="各 Python 阶段的性能基准（合成 10 / 1,000 / 10,000 基因组数据）")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def fixture_args(p):
+        p.add_argument('--scale', type=int, nargs='+', default=[10], help=f'基因组数（常用 {SCALES}，默认 10）')
+        p.add_argument('-w', '--work-dir', default='benchmark_work', help='合成数据与输出目录（默认 ./benchmark_work）')
+        p.add_argument('--genes', type=int, default=GENES_PER_GENOME, help=f'每个基因组的基因数（默认 {GENES_PER_GENOME}）')
+        p.add_argument('--seq-len', type=int, default=SEQ_LEN, help=f'合成基因长度（默认 {SEQ_LEN}）')
+        p.add_argument('--diamond-hits', type=int, default=DIAMOND_HITS,
+                       help=f'每个基因组的 DIAMOND 命中行数（默认 {DIAMOND_HITS}）')
+        p.add_argument('--per-sample-cap', type=int, default=PER_SAMPLE_CAP,
+                       help=f'按样本运行的阶段最多计时多少个样本（默认 {PER_SAMPLE_CAP}）')
+        p.add_argument('--seed', type=int, default=1, help='随机种子（默认 1）')
+
+    p_gen = sub.add_parser('generate', help='只生成合成数据')
+    fixture_args(p_gen)
+    p_run = sub.add_parser('run', help='生成（如需要）并计时各阶段')
+    fixture_args(p_run)
+    p_run.add_argument('--stages', nargs='*', choices=STAGES, help='只运行指定阶段')
+    p_run.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='并行阶段使用的进程数')
+    p_run.add_argument('--results', default=str(DEFAULT_RESULTS), help=f'结果表（默认 {DEFAULT_RESULTS}）')
+    p_run.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                       help=f'比上次慢多少视为回退（默认 {REGRESSION_THRESHOLD}）')
+    p_cmp = sub.add_parser('compare', help='对比结果表中各阶段的历次结果')
+    p_cmp.add_argument('--results', default=str(DEFAULT_RESULTS), help=f'结果表（默认 {DEFAULT_RESULTS}）')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        for scale in args.scale:
+            FixtureGenerator(Path(args.work_dir) / str(scale) / 'fixture', scale, args.genes, args.seq_len,
+                             args.diamond_hits, args.per_sample_cap, args.seed).generate()
+    elif args.command == 'run':
+        if not PROFILES_DIR.is_dir():
+            print(f"错误：MLST 配置目录不存在：{PROFILES_DIR}")
+            sys.exit(1)
+        sys.exit(run_benchmark(args))
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按路径加载仓库内的脚本模块
+
+各阶段脚本的文件名带数字前缀、连字符和中文（如 3-性能记录.py），不能直接 import，
+互相调用时统一用这里的 load_module，不再在每个脚本里各写一份 importlib 代码和 parents[N] 层数。
+
+在其他目录的脚本中使用（向上查找仓库根目录，与脚本所在层数无关；各脚本使用同一段代码，
+脚本被单独拷出仓库时给出明确错误，而不是 StopIteration）：
+  _REPO = next((d for d in Path(__file__).resolve().parents if (d / '8-流程调度' / 'python').is_dir()), None)
+  if _REPO is None:
+      sys.exit(f"错误：找不到 8-流程调度/python，{Path(__file__).name} 需在完整的仓库目录中运行")
+  sys.path.insert(0, str(_REPO / '8-流程调度' / 'python'))
+  from 模块加载 import load_module
+
+  profiling = load_module('8-流程调度/python/3-性能记录.py')            # 相对仓库根目录
+  comparison = load_module(Path(__file__).with_name('3-组装方法比较.py'))  # 绝对路径
+"""
+
+import importlib.util
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+
+_loaded = {}
+
+
+def load_module(path):
+    """
+    加载一个脚本模块；path 为相对仓库根目录的路径或绝对路径
+
+    同一进程内同一文件只执行一次（进程池 worker 中反复调用也不会重复加载）
+    """
+    path = Path(path)
+    path = (path if path.is_absolute() else REPO_DIR / path).resolve()
+    module = _loaded.get(path)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(path.stem.replace('-', '_'), path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _loaded[path] = module
+    return module
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+各汇总脚本共用的 CSR 稀疏矩阵 .npz 写出
+
+cluster_sample_matrix.npz（3-处理聚类结果.py）、AMR_gene_matrix.npz / AMR_class_matrix.npz（2-汇总耐药矩阵.py）、
+Kraken_species_matrix.npz（1-Kraken2报告汇总.py）使用同一约定：
+  format / shape / data / indices / indptr 与 scipy.sparse.save_npz 相同（scipy.sparse.load_npz 可直接读取），
+  行列标签作为额外的数组保存在同一文件中（如 samples / clusters / genes）
+读取：
+  m = scipy.sparse.load_npz(path)
+  labels = np.load(path); labels['samples']
+
+在其他目录的脚本中按 模块加载.py 文档中的代码把 8-流程调度/python 加入 sys.path，再 from 稀疏矩阵 import save_sparse
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def coo_to_csr(rows, cols, values, n_rows):
+    """COO 三元组（同一位置不重复）-> CSR 的 (data, indices, indptr)，每行内按列号排序"""
+    rows, cols, values = np.asarray(rows), np.asarray(cols), np.asarray(values)
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.add.at(indptr, rows + 1, 1)
+    return values[order], cols[order].astype(np.int32), np.cumsum(indptr)
+
+
+def save_csr(path, data, indices, indptr, shape, **labels):
+    """写出 CSR 矩阵和行列标签（先写临时文件再替换）"""
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp.npz')
+    np.savez_compressed(
+        tmp,
+        format=np.array('csr'),
+        shape=np.array(shape, dtype=np.int64),
+        data=data,
+        indices=indices,
+        indptr=indptr,
+        **labels,
+    )
+    os.replace(tmp, path)
+
+
+def save_sparse(path, rows, cols, values, shape, **labels):
+    """由 COO 三元组写出 CSR 矩阵；values 的 dtype 即矩阵的 dtype"""
+    data, indices, indptr = coo_to_csr(rows, cols, values, shape[0])
+    save_csr(path, data, indices, indptr, shape, **labels)